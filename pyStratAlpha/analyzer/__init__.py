@@ -1,15 +1,22 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-from pyAlphaStrat.analyzer import factor
-from pyAlphaStrat.analyzer import fund
-from pyAlphaStrat.analyzer import indexComp
-from pyAlphaStrat.analyzer import performance
-from pyAlphaStrat.analyzer import portfolio
-
+_lazyAttributes = {
+    'factor': 'pyAlphaStrat.analyzer.factor',
+    'fund': 'pyAlphaStrat.analyzer.fund',
+    'indexComp': 'pyAlphaStrat.analyzer.indexComp',
+    'performance': 'pyAlphaStrat.analyzer.performance',
+    'portfolio': 'pyAlphaStrat.analyzer.portfolio',
+    'tradability': 'pyAlphaStrat.analyzer.tradability'
+}
 
 __all__ = ['factor',
            'fund',
            'indexComp',
            'performance',
-           'portfolio']
\ No newline at end of file
+           'portfolio',
+           'tradability']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
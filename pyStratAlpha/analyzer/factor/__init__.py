@@ -1,29 +1,45 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-from pyAlphaStrat.analyzer.factor.cleanData import adjust_factor_date
-from pyAlphaStrat.analyzer.factor.cleanData import get_multi_index_data
-from pyAlphaStrat.analyzer.factor.cleanData import get_report_date
-from pyAlphaStrat.analyzer.factor.cleanData import get_universe_single_factor
-from pyAlphaStrat.analyzer.factor.dynamicContext import DCAMAnalyzer
-from pyAlphaStrat.analyzer.factor.loadData import FactorLoader
-from pyAlphaStrat.analyzer.factor.loadData import get_data_div
-from pyAlphaStrat.analyzer.factor.norm import get_industry_matrix
-from pyAlphaStrat.analyzer.factor.norm import neutralize
-from pyAlphaStrat.analyzer.factor.norm import normalize
-from pyAlphaStrat.analyzer.factor.norm import standardize
-from pyAlphaStrat.analyzer.factor.norm import winsorize
-from pyAlphaStrat.analyzer.factor.selector import Selector
+_lazyAttributes = {
+    'adjust_factor_date': 'pyAlphaStrat.analyzer.factor.cleanData',
+    'get_multi_index_data': 'pyAlphaStrat.analyzer.factor.cleanData',
+    'get_report_date': 'pyAlphaStrat.analyzer.factor.cleanData',
+    'get_universe_single_factor': 'pyAlphaStrat.analyzer.factor.cleanData',
+    'DCAMAnalyzer': 'pyAlphaStrat.analyzer.factor.dynamicContext',
+    'ic_diff_permutation_test': 'pyAlphaStrat.analyzer.factor.dynamicContext',
+    'FactorLoader': 'pyAlphaStrat.analyzer.factor.loadData',
+    'get_data_div': 'pyAlphaStrat.analyzer.factor.loadData',
+    'calc_factor_return': 'pyAlphaStrat.analyzer.factor.factorReturn',
+    'get_next_period_return': 'pyAlphaStrat.analyzer.factor.factorReturn',
+    'get_industry_matrix': 'pyAlphaStrat.analyzer.factor.norm',
+    'neutralize': 'pyAlphaStrat.analyzer.factor.norm',
+    'normalize': 'pyAlphaStrat.analyzer.factor.norm',
+    'standardize': 'pyAlphaStrat.analyzer.factor.norm',
+    'winsorize': 'pyAlphaStrat.analyzer.factor.norm',
+    'SecHoldings': 'pyAlphaStrat.analyzer.factor.selector',
+    'Selector': 'pyAlphaStrat.analyzer.factor.selector',
+    'build_sec_holdings': 'pyAlphaStrat.analyzer.factor.selector'
+}
 
 __all__ = ['get_report_date',
            'adjust_factor_date',
            'get_universe_single_factor',
            'get_multi_index_data',
            'DCAMAnalyzer',
+           'ic_diff_permutation_test',
            'winsorize',
            'standardize',
            'get_industry_matrix',
            'normalize',
            'get_data_div',
            'FactorLoader',
-           'Selector']
+           'calc_factor_return',
+           'get_next_period_return',
+           'SecHoldings',
+           'Selector',
+           'build_sec_holdings']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
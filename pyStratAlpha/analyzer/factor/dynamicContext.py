@@ -3,17 +3,22 @@
 # ref https://uqer.io/community/share/57ff3f9e228e5b3658fac3ed
 
 from math import e
+from multiprocessing import Pool
+from multiprocessing import cpu_count
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import scipy.stats as st
 from PyFin.DateUtilities import Date
 from PyFin.Utilities import pyFinAssert
-from matplotlib.ticker import MultipleLocator, FormatStrFormatter
 
 from pyAlphaStrat.analyzer.factor.cleanData import get_multi_index_data
 from pyAlphaStrat.enums import FactorWeightType
+from pyAlphaStrat.utils import get_pyplot
+
+# 置换检验每个批次的置换次数, 以及超过多少次置换时默认启用进程池
+_permutationChunkSize = 10000
+_permutationPoolThreshold = 100000
 
 
 class DCAMAnalyzer(object):
@@ -157,6 +162,42 @@ class DCAMAnalyzer(object):
             ret.to_csv('analysis.csv')
         return ret
 
+    def get_permutation_analysis(self, nb_permutation=5000, seed=None, nb_process=None, save_file=False):
+        """
+        :param nb_permutation: int, optional, 置换次数
+        :param seed: int, optional, 随机数种子, 给定种子时结果与进程数无关
+        :param nb_process: int, optional, 进程数, None时仅在置换次数很大时使用全部cpu
+        :param save_file: bool, optional, save file or not
+        :return: pd.DataFrame, multi index = [layerFactor, alphaFactor], col = [mean_low, mean_high, ic_diff, p_value]
+        对所有分层因子和alpha因子的组合, 用置换检验low/high两组IC均值之差的显著性
+        """
+        rank_ic = [self.calc_rank_ic(layer_factor) for layer_factor in self._layerFactor]
+
+        # 取所有分层因子共同的有效调仓日, 使各组IC序列等长从而可以批量计算
+        common_date = rank_ic[0][0].index
+        for low, high in rank_ic:
+            common_date = common_date.intersection(low.index).intersection(high.index)
+        pyFinAssert(len(common_date) > 1, ValueError, "not enough common tiaoCangDate to run permutation test")
+
+        ic_low = np.array([low.loc[common_date].values for low, _ in rank_ic], dtype=float)
+        ic_high = np.array([high.loc[common_date].values for _, high in rank_ic], dtype=float)
+        ic_diff, p_value = ic_diff_permutation_test(ic_low, ic_high,
+                                                    nb_permutation=nb_permutation,
+                                                    seed=seed,
+                                                    nb_process=nb_process)
+
+        index = pd.MultiIndex.from_product([self._layerFactorNames, self._alphaFactorNames],
+                                           names=['layerFactor', 'alphaFactor'])
+        ret = pd.DataFrame({'mean_low': ic_low.mean(axis=1).ravel(),
+                            'mean_high': ic_high.mean(axis=1).ravel(),
+                            'ic_diff': ic_diff.ravel(),
+                            'p_value': p_value.ravel()},
+                           index=index,
+                           columns=['mean_low', 'mean_high', 'ic_diff', 'p_value'])
+        if save_file:
+            ret.to_csv('permutation_analysis.csv')
+        return ret
+
     @staticmethod
     def calc_layer_factor_distance(percentile):
         """
@@ -317,10 +358,86 @@ def sigmoid_modif(x):
     return 10 * (1 / (1 + e ** (-(10 * (x - 0.5)))) - 0.5)
 
 
+def _calc_permutation_ic_diff(pooled_ic, perm_index, nb_low):
+    """
+    :param pooled_ic: np.array, shape = [nb_layer, nb_low + nb_high, nb_alpha], low组与high组IC序列拼接
+    :param perm_index: np.array, shape = [nb_perm, nb_low + nb_high], 每一行为一次标签置换
+    :param nb_low: int, low组的样本数
+    :return: np.array, shape = [nb_perm, nb_layer, nb_alpha], 每次置换下low组与high组IC均值之差
+    置换前nb_low个位置记为low组, 其余为high组, 均值之差可以写成标签权重与IC序列的乘积
+    """
+    nb_perm, nb_obs = perm_index.shape
+    label_weight = np.empty((nb_perm, nb_obs))
+    label_weight.fill(-1.0 / (nb_obs - nb_low))
+    label_weight[np.arange(nb_perm)[:, None], perm_index[:, :nb_low]] = 1.0 / nb_low
+    return np.einsum('pt,lta->pla', label_weight, pooled_ic)
+
+
+def _count_permutation_exceedance(args):
+    """
+    :param args: tuple, (pooled_ic, nb_low, ic_diff, nb_perm, seed)
+    :return: np.array, shape = [nb_layer, nb_alpha], 置换统计量绝对值不小于实际统计量的次数
+    进程池中每个批次的计算单元, 需定义在模块层面以便pickle
+    """
+    pooled_ic, nb_low, ic_diff, nb_perm, seed = args
+    random_state = np.random.RandomState(seed)
+    # 对均匀随机数排序得到nb_perm个随机置换
+    perm_index = np.argsort(random_state.rand(nb_perm, pooled_ic.shape[1]), axis=1)
+    perm_ic_diff = _calc_permutation_ic_diff(pooled_ic, perm_index, nb_low)
+    # 容忍浮点误差, 避免恒等置换因舍入被判为不显著
+    return (np.abs(perm_ic_diff) >= np.abs(ic_diff) - 1e-12).sum(axis=0)
+
+
+def ic_diff_permutation_test(ic_low, ic_high, nb_permutation=5000, seed=None, nb_process=None):
+    """
+    :param ic_low: np.array, shape = [nb_layer, nb_date, nb_alpha], 分层后low组的IC序列
+    :param ic_high: np.array, shape = [nb_layer, nb_date, nb_alpha], 分层后high组的IC序列
+    :param nb_permutation: int, optional, 置换次数
+    :param seed: int, optional, 随机数种子
+    :param nb_process: int, optional, 进程数, None时仅在置换次数超过_permutationPoolThreshold时使用全部cpu
+    :return: tuple of np.array, shape = [nb_layer, nb_alpha], (IC均值之差 low - high, 双边置换检验p值)
+    所有(分层因子, alpha因子)组合共用同一组置换, 按批次生成置换下标并以数组运算计算统计量
+    """
+    ic_low = np.asarray(ic_low, dtype=float)
+    ic_high = np.asarray(ic_high, dtype=float)
+    pyFinAssert(ic_low.ndim == 3 and ic_high.ndim == 3, ValueError, "ic_low and ic_high must be 3-d arrays")
+    pyFinAssert(nb_permutation > 0, ValueError, "nb_permutation must be positive")
+    pyFinAssert(not (np.isnan(ic_low).any() or np.isnan(ic_high).any()), ValueError, "IC series has NaN values")
+
+    nb_low = ic_low.shape[1]
+    pooled_ic = np.concatenate([ic_low, ic_high], axis=1)
+    ic_diff = ic_low.mean(axis=1) - ic_high.mean(axis=1)
+
+    # 批次划分和每批的种子只由seed和置换次数决定, 因此结果与进程数无关
+    chunk_size = [_permutationChunkSize] * (nb_permutation // _permutationChunkSize)
+    if nb_permutation % _permutationChunkSize > 0:
+        chunk_size.append(nb_permutation % _permutationChunkSize)
+    chunk_seed = np.random.RandomState(seed).randint(0, 2 ** 31 - 1, size=len(chunk_size))
+    tasks = [(pooled_ic, nb_low, ic_diff, size, chunk_seed[i]) for i, size in enumerate(chunk_size)]
+
+    if nb_process is None:
+        nb_process = cpu_count() if nb_permutation > _permutationPoolThreshold else 1
+    nb_process = min(nb_process, len(tasks))
+    if nb_process > 1:
+        pool = Pool(nb_process)
+        try:
+            exceedance = pool.map(_count_permutation_exceedance, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        exceedance = [_count_permutation_exceedance(task) for task in tasks]
+
+    p_value = (np.sum(exceedance, axis=0) + 1.0) / (nb_permutation + 1.0)
+    return ic_diff, p_value
+
+
 def plot_layer_factor_distance():
     """
     :return: 对calcLayerFactorDistance函数绘图
     """
+    from matplotlib.ticker import MultipleLocator, FormatStrFormatter
+    plt = get_pyplot()
     x_major_locator = MultipleLocator(0.1)  # 将x主刻度标签设置为 的倍数
     x_major_formatter = FormatStrFormatter('%1.1f')  # 设置x轴标签文本的格式
     y_major_locator = MultipleLocator(1)  # 将y轴主刻度标签设置为 的倍数
@@ -6,7 +6,7 @@ from alphalens.utils import get_clean_factor_and_forward_returns
 
 from pyAlphaStrat.analyzer.indexComp import IndexComp
 from pyAlphaStrat.enums import DataSource
-from pyAlphaStrat.utils import WindMarketDataHandler
+from pyAlphaStrat.utils import get_market_data_handler
 
 _alphaLensFactorIndexName = ['date', 'asset']
 _alphaLensFactorColName = 'factor'
@@ -19,7 +19,8 @@ class FactorAnalyzer(object):
                  factor,
                  industry,
                  data_source=DataSource.WIND,
-                 calendar='China.SSE'):
+                 calendar='China.SSE',
+                 cache_path=None):
         """
         :param factor: pd.Series, multi index=[tradeDate, secID]  columns = [factor]
         :param industry: pd.Series/dict, Either A MultiIndex Series indexed by date and asset, containing the period
@@ -27,6 +28,7 @@ class FactorAnalyzer(object):
         group mappings are unchanged for the entire time period of the passed factor data.
         :param data_source: enum, DataSource type
         :param calendar: PyFin.Calendar type
+        :param cache_path: str, optional, 本地价格缓存文件夹
         :return:
         """
         self._calendar = Calendar(calendar)
@@ -35,6 +37,7 @@ class FactorAnalyzer(object):
         self._factor = factor
         self._industry = industry
         self._dataSource = data_source
+        self._marketDataHandler = get_market_data_handler(data_source, cache_path)
 
         self._factor.index = self._factor.index.rename(_alphaLensFactorIndexName)
         self._factor.name = _alphaLensFactorColName
@@ -48,10 +51,9 @@ class FactorAnalyzer(object):
         self._price = self._get_price_data()
 
     def _get_price_data(self):
-        if self._dataSource == DataSource.WIND:
-            price_data = WindMarketDataHandler.get_sec_price_on_date(self._tradeDate, self._secID)
-        else:
-            raise NotImplementedError
+        price_data = self._marketDataHandler.get_sec_price_on_date(start_date=self._tradeDate[0],
+                                                                   end_date=self._tradeDate[-1],
+                                                                   sec_ids=self._secID)
         return price_data
 
     def _get_clean_factor_and_fwd_return(self):
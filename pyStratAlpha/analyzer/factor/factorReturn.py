@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# 截面回归估计因子收益: 每个调仓日把下期收益对当期因子暴露(因子, 行业哑变量, 对数市值)做加权最小二乘
+# 所有日期的样本补齐成 [date, sec, exposure] 的3维数组, 正规方程用一次批量矩阵乘法构建并一次批量求解
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+from pyAlphaStrat.analyzer.factor.norm import get_industry_matrix
+
+
+def get_next_period_return(sec_return, dates):
+    """
+    :param sec_return: pd.Series, multi index = [tiaoCangDate, secID], value = 截至该调仓日的区间收益
+    :param dates: list/pd.Index of datetime, 排序后的调仓日
+    :return: pd.Series, multi index = [tiaoCangDate, secID], value = 下一调仓日的RETURN, 即当期持有的下期收益
+    """
+    prev_date = pd.Series(list(dates[:-1]), index=list(dates[1:]))
+    return_date = sec_return.index.get_level_values(0)
+    mapped_date = prev_date.reindex(return_date).values
+    is_valid = pd.notnull(mapped_date)
+    index = pd.MultiIndex.from_arrays([mapped_date[is_valid], sec_return.index.get_level_values(1)[is_valid]],
+                                      names=sec_return.index.names)
+    return pd.Series(sec_return.values[is_valid], index=index, name=sec_return.name)
+
+
+def _get_exposure(factors, industries, caps):
+    """
+    :return: tuple, (暴露矩阵 np.array [nb row, nb exposure], 暴露名称 list)
+    无行业时加入截距项; 缺失行业记为'other', 缺失市值用当日对数市值的中位数填充, 与neutralize一致
+    """
+    exposure = [factors.values.astype(float)]
+    names = list(factors.columns)
+    lcap = None
+    if caps is not None:
+        lcap = np.log(caps.reindex(factors.index).astype(float))
+        lcap = lcap.fillna(lcap.groupby(level=0).transform('median'))
+    if industries is not None:
+        industries = industries.reindex(factors.index).fillna('other')
+        exposure.append(get_industry_matrix(industries, lcap))
+        names += list(industries.unique())
+        if lcap is not None:
+            names.append('lncap')
+    else:
+        exposure.append(np.ones((len(factors), 1)))
+        names.append('intercept')
+        if lcap is not None:
+            exposure.append(lcap.values[:, None])
+            names.append('lncap')
+    return np.hstack(exposure), names
+
+
+def _solve_batch(xtwx, xtwy):
+    """
+    :param xtwx: np.array, [nb date, k, k], 各日的X'WX
+    :param xtwy: np.array, [nb date, k], 各日的X'Wy
+    :return: tuple, (系数 [nb date, k], (X'WX)^-1 [nb date, k, k]), 奇异时退化为伪逆
+    """
+    try:
+        coef = np.linalg.solve(xtwx, xtwy[:, :, None])[:, :, 0]
+        inv = np.linalg.inv(xtwx)
+    except np.linalg.LinAlgError:
+        inv = np.array([np.linalg.pinv(a) for a in xtwx])
+        coef = np.einsum('dkl,dl->dk', inv, xtwy)
+    return coef, inv
+
+
+def calc_factor_return(factors, sec_return, industries=None, caps=None, weights=None, next_period_return=True):
+    """
+    :param factors: pd.DataFrame, multi index = [tiaoCangDate, secID], col = 因子名称, value = 因子暴露
+    :param sec_return: pd.Series, multi index = [tiaoCangDate, secID], value = RETURN
+    :param industries: pd.Series, optional, multi index = [tiaoCangDate, secID], value = 行业名称, 转换为行业哑变量
+    :param caps: pd.Series, optional, multi index = [tiaoCangDate, secID], value = 市值, 取对数后作为暴露
+    :param weights: pd.Series, optional, multi index = [tiaoCangDate, secID], value = 回归权重(如市值平方根), 默认等权
+    :param next_period_return: bool, optional, True表示因变量取下一调仓日的RETURN; False表示sec_return已是下期收益
+    :return: tuple, (因子收益 pd.DataFrame index = tiaoCangDate, col = 暴露名称;
+                     t值 pd.DataFrame, 同上;
+                     残差 pd.Series multi index = [tiaoCangDate, secID])
+    当日没有样本的暴露(如空行业)的因子收益和t值为NaN
+    """
+    if isinstance(factors, pd.Series):
+        factors = pd.DataFrame(factors)
+    factors = factors.sort_index()
+    dates = factors.index.get_level_values(0).unique().sort_values()
+    if next_period_return:
+        sec_return = get_next_period_return(sec_return, dates)
+    y = sec_return.reindex(factors.index).values.astype(float)
+    w = np.ones(len(y)) if weights is None else weights.reindex(factors.index).values.astype(float)
+
+    x, names = _get_exposure(factors, industries, caps)
+    is_valid = ~np.isnan(y) & ~np.isnan(w) & (w > 0) & ~np.isnan(x).any(axis=1)
+    pyFinAssert(is_valid.any(), ValueError, "no valid observation for the cross-sectional regression")
+    index = factors.index[is_valid]
+    x, y, w = x[is_valid], y[is_valid], w[is_valid]
+
+    # 按日期补齐为 [date, sec, exposure], 补齐的行权重为0, 不影响回归
+    date_code, date_value = pd.factorize(index.get_level_values(0))
+    nb_row = np.bincount(date_code)
+    starts = np.append(0, np.cumsum(nb_row)[:-1])
+    position = np.arange(len(date_code)) - starts[date_code]
+    nb_date, nb_max, nb_exposure = len(date_value), nb_row.max(), x.shape[1]
+    x_pad = np.zeros((nb_date, nb_max, nb_exposure))
+    y_pad = np.zeros((nb_date, nb_max))
+    w_pad = np.zeros((nb_date, nb_max))
+    x_pad[date_code, position] = x
+    y_pad[date_code, position] = y
+    w_pad[date_code, position] = w
+
+    xw_pad = x_pad * w_pad[:, :, None]
+    xtwx = np.matmul(xw_pad.transpose(0, 2, 1), x_pad)
+    xtwy = np.einsum('dnk,dn->dk', xw_pad, y_pad)
+    # 当日不存在的暴露(对角线为0)对角线置1, 其系数解为0, 最后记为NaN
+    diag = np.arange(nb_exposure)
+    is_absent = xtwx[:, diag, diag] <= 0
+    xtwx[:, diag, diag] = np.where(is_absent, 1.0, xtwx[:, diag, diag])
+    coef, inv = _solve_batch(xtwx, xtwy)
+
+    resid_pad = y_pad - np.einsum('dnk,dk->dn', x_pad, coef)
+    dof = nb_row - (nb_exposure - is_absent.sum(axis=1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma2 = np.where(dof > 0, (w_pad * resid_pad ** 2).sum(axis=1) / dof, np.nan)
+        t_stat = coef / np.sqrt(sigma2[:, None] * inv[:, diag, diag])
+    coef[is_absent] = np.nan
+    t_stat[is_absent] = np.nan
+
+    date_index = pd.Index(date_value, name=factors.index.names[0])
+    factor_return = pd.DataFrame(coef, index=date_index, columns=names)
+    t_stat = pd.DataFrame(t_stat, index=date_index, columns=names)
+    residual = pd.Series(resid_pad[date_code, position], index=index, name='residual')
+    return factor_return, t_stat, residual
@@ -3,7 +3,6 @@
 import numpy as np
 import pandas as pd
 from PyFin.Utilities import pyFinWarning
-from sklearn.linear_model import LinearRegression
 
 
 def winsorize(factors, nb_std_or_quantile=3):
@@ -47,14 +46,12 @@ def get_industry_matrix(industries, mkt_cap=None):
     :param mkt_cap: pd.Series, index = secID, value = 市值
     :return: numpy.matrix, 行业虚拟矩阵，see alphaNote
     """
-    sec_ids = industries.index.tolist()
-    nb_sec_id = len(sec_ids)
     unique_industry = industries.unique()
-    nb_unique_industry = len(unique_industry)
-    ret = np.zeros((nb_sec_id, nb_unique_industry))
-    for i in range(len(sec_ids)):
-        col_index = np.where(unique_industry == industries[i])[0]
-        ret[i][col_index] = 1.0
+    ret = np.zeros((len(industries), len(unique_industry)))
+    # 每只股票所属行业在unique_industry中的位置, 行业缺失的行全为0
+    col_index = pd.Index(unique_industry).get_indexer(industries.values)
+    row_index = np.flatnonzero(pd.notnull(industries.values))
+    ret[row_index, col_index[row_index]] = 1.0
 
     if mkt_cap is not None:
         array_cap = mkt_cap.values.reshape(mkt_cap.values.shape[0], 1)
@@ -90,6 +87,7 @@ def neutralize(factors, industries, caps=None):
     if lcap is not None:
         lcap = lcap.fillna(lcap.median())
 
+    from sklearn.linear_model import LinearRegression
     linreg = LinearRegression(fit_intercept=False)
     y = factors
     x = get_industry_matrix(industries, lcap)
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 from PyFin.Utilities import pyFinAssert
 
-from pyAlphaStrat.analyzer.factor.cleanData import get_multi_index_data
 from pyAlphaStrat.analyzer.indexComp.indexComp import IndexComp
-from pyAlphaStrat.utils.misc import top
+
+# CSR格式的持仓: 第i个调仓日的持仓为sec_code[offsets[i]:offsets[i + 1]], 对应secID为sec_universe[sec_code]
+SecHoldings = namedtuple('SecHoldings', ['tiaocang_date', 'offsets', 'sec_code', 'sec_universe', 'weight'])
 
 
 class Selector(object):
@@ -17,7 +21,8 @@ class Selector(object):
                  save_sec_selected=False,
                  use_industry_name=True,
                  nb_sec_selected_total=100,
-                 ignore_zero_weight=False):
+                 ignore_zero_weight=False,
+                 tradability=None):
         """
         :param sec_score: pd.Series, index = [tiaoCangDate, secID], value = score
         :param industry: pd.Series, optional, index = [tiaoCangDate, secID], value = industry name
@@ -25,6 +30,9 @@ class Selector(object):
         :param index_comp: index composition class object, optional
         :param save_sec_selected: bool, optional, save result to csv or not
         :param use_industry_name: bool, optional, whether to use name instead of code in return dataframe
+        :param nb_sec_selected_total: int, optional, nb sec to be selected in total when not industry neutral
+        :param ignore_zero_weight: bool, optional, whether to skip industries with zero index weight
+        :param tradability: Tradability, optional, 给定时剔除调仓日不可交易(涨停/新股/停牌)的股票
         :return:
         """
         self._secScore = sec_score
@@ -35,11 +43,13 @@ class Selector(object):
         self._saveSecSelected = save_sec_selected
         self._secSelectedFullInfo = None
         self._secSelected = None
+        self._secSelectedHoldings = None
         self._tiaoCangDate = pd.to_datetime(sorted(set(self._secScore.index.get_level_values('tiaoCangDate'))))
         self._industryNeutral = True
         self._useIndustryName = use_industry_name
         self._nbSecSelectedTotal = nb_sec_selected_total
         self._ignoreZeroWeight = ignore_zero_weight
+        self._tradability = tradability
 
     @property
     def sec_selected(self):
@@ -58,56 +68,71 @@ class Selector(object):
         pyFinAssert(isinstance(flag, bool), TypeError, "flag must be bool type variable")
         self._industryNeutral = flag
 
+    @property
+    def sec_selected_holdings(self):
+        """
+        :return: SecHoldings, CSR格式的选股结果, see build_sec_holdings
+        """
+        if self._secSelectedHoldings is None and self._secSelectedFullInfo is not None:
+            self._secSelectedHoldings = build_sec_holdings(self._secSelectedFullInfo)
+        return self._secSelectedHoldings
+
     @staticmethod
     def _save_sec_selected_from_full_info(sec_selected_full_info):
         """
         :param sec_selected_full_info: pd.DataFrame, multi index =[tiaoCangDate, secID], value = score / industry
-        :return: pd.Series, index = tiaoCangDate, value = list of secID selected
+        :return: pd.Series, index = tiaoCangDate, value = np.array of secID selected
+        每个调仓日的secID数组都是同一个排序后数组的切片(view)
         """
-
-        date_list = sec_selected_full_info.index.get_level_values('tiaoCangDate').tolist()
-        ret = pd.Series()
-        for date in date_list:
-            sliced_data = get_multi_index_data(sec_selected_full_info, 'tiaoCangDate', date)
-            sec_ids = sliced_data.index.get_level_values('secID').tolist()
-            ret[date] = sec_ids
-
+        unique_date, order, offsets = _group_by_tiaocang_date(sec_selected_full_info.index)
+        sec_id = sec_selected_full_info.index.get_level_values('secID').values[order]
+        ret = pd.Series(np.split(sec_id, offsets[1:-1]), index=unique_date)
         return ret
 
     def sec_selection(self):
         if self._industry is not None:
             sec_score = pd.concat([self._secScore, self._industry], join_axes=[self._secScore.index], axis=1)
         else:
-            sec_score = self._secScore
-        ret = pd.DataFrame()
-        for date in self._tiaoCangDate:
-            sec_score_on_date = get_multi_index_data(sec_score, 'tiaoCangDate', date)
-            sec_score_on_date = sec_score_on_date.copy()
-            sec_score_on_date.sort_values(by='score', ascending=False, inplace=True)
-            if self._industryNeutral:
-                pyFinAssert(self._industry is not None, ValueError, "industry information missing ")
-                sec_score_on_date[self._industry.name] = sec_score_on_date[self._industry.name].fillna('other')
-                industry_weight = self._indexComp.get_industry_weight_on_date(date)
-                for name, group in sec_score_on_date.groupby(self._industry.name):
-                    if self._ignoreZeroWeight and industry_weight[name] == 0:
-                        continue
-                    else:
-                        nb_sec_selected_per_industry = max(len(group) * 0.1,
-                                                           self._nbSecSelectedPerIndustryMin)
-                        nb_sec_selected_per_industry = int(nb_sec_selected_per_industry)
-                        if len(group) > nb_sec_selected_per_industry:
-                            single_sec_weight = industry_weight[name] / nb_sec_selected_per_industry / 100.0
-                            largest_score = top(group, column='score', n=nb_sec_selected_per_industry)
-                            largest_score['weight'] = [single_sec_weight] * nb_sec_selected_per_industry
-                        else:
-                            largest_score = group.copy()
-                            largest_score['weight'] = industry_weight[name] / len(group) / 100.0
-
-                        ret = pd.concat([ret, largest_score], axis=0)
-            else:
-                sec_score_on_date = sec_score_on_date[:self._nbSecSelectedTotal + 1]
-                sec_score_on_date['weight'] = 1.0 / self._nbSecSelectedTotal
-                ret = pd.concat([ret, sec_score_on_date], axis=0)
+            sec_score = pd.DataFrame(self._secScore)
+        if self._tradability is not None:
+            # 价格表中没有的股票无法判断, 予以保留
+            filters = self._tradability.get_filter(sec_score.index.get_level_values('tiaoCangDate'),
+                                                   sec_score.index.get_level_values('secID'))
+            sec_score = sec_score.loc[filters != 1]
+
+        # 按调仓日升序、分数降序排列, 之后组内名次即为排序后的先后位置
+        date_code, _ = pd.factorize(sec_score.index.get_level_values('tiaoCangDate'), sort=True)
+        order = np.lexsort((-sec_score['score'].values, date_code))
+        sec_score = sec_score.iloc[order].copy()
+        date_code = date_code[order]
+        date = sec_score.index.get_level_values('tiaoCangDate')
+
+        if self._industryNeutral:
+            pyFinAssert(self._industry is not None, ValueError, "industry information missing ")
+            sec_score[self._industry.name] = sec_score[self._industry.name].fillna('other')
+            industry = sec_score[self._industry.name].values
+            industry_code, unique_industry = pd.factorize(industry, sort=True)
+            rank, group_size = _calc_rank_in_group(date_code * len(unique_industry) + industry_code)
+
+            industry_weight = self._indexComp.get_industry_weight(date, industry)
+            pyFinAssert(not np.isnan(industry_weight).any(), ValueError,
+                        "industry weight missing for industry {0}".format(
+                            sorted(set(industry[np.isnan(industry_weight)]))))
+            # 每个行业至少选nbSecSelectedPerIndustryMin只, 行业内股票多时选前10%
+            nb_sec_selected_per_industry = np.maximum(group_size * 0.1, self._nbSecSelectedPerIndustryMin)
+            nb_sec_selected_per_industry = np.minimum(nb_sec_selected_per_industry.astype(int), group_size)
+            is_selected = rank < nb_sec_selected_per_industry
+            if self._ignoreZeroWeight:
+                is_selected &= industry_weight != 0
+
+            ret = sec_score.iloc[is_selected].copy()
+            ret['weight'] = industry_weight[is_selected] / nb_sec_selected_per_industry[is_selected] / 100.0
+            # 与逐行业拼接时的顺序保持一致: 调仓日, 行业, 组内名次
+            ret = ret.iloc[np.lexsort((rank[is_selected], industry_code[is_selected], date_code[is_selected]))]
+        else:
+            rank, _ = _calc_rank_in_group(date_code)
+            ret = sec_score.iloc[rank < self._nbSecSelectedTotal + 1].copy()
+            ret['weight'] = 1.0 / self._nbSecSelectedTotal
 
         if self._useIndustryName:
             industry_name = IndexComp.map_industry_code_to_name(ret[self._industry.name])
@@ -116,6 +141,7 @@ class Selector(object):
 
         self._secSelectedFullInfo = ret
         self._secSelected = self._save_sec_selected_from_full_info(ret)
+        self._secSelectedHoldings = None
         if self._saveSecSelected:
             self._secSelectedFullInfo.to_csv('sec_selected.csv', date_format='%Y-%m-%d', encoding='gbk')
         return
@@ -131,3 +157,47 @@ class Selector(object):
         ret = list(set(ret))
 
         return ret
+
+
+def _calc_rank_in_group(group_key):
+    """
+    :param group_key: np.array of int, 分组编码, 同组内的先后顺序即为名次顺序
+    :return: tuple of np.array, (组内名次(从0开始), 所在组的大小)
+    """
+    order = np.argsort(group_key, kind='mergesort')
+    group_size = np.bincount(group_key)
+    group_start = np.cumsum(group_size) - group_size
+    rank = np.empty(len(group_key), dtype=int)
+    rank[order] = np.arange(len(group_key)) - group_start[group_key[order]]
+    return rank, group_size[group_key]
+
+
+def _group_by_tiaocang_date(index):
+    """
+    :param index: pd.MultiIndex, [tiaoCangDate, secID]
+    :return: tuple, (排序后的调仓日, 按调仓日稳定排序的行顺序, 每个调仓日的起止位置 长度为调仓日个数+1)
+    """
+    date_code, unique_date = pd.factorize(index.get_level_values('tiaoCangDate'), sort=True)
+    order = np.argsort(date_code, kind='mergesort')
+    offsets = np.zeros(len(unique_date) + 1, dtype=int)
+    offsets[1:] = np.cumsum(np.bincount(date_code, minlength=len(unique_date)))
+    return pd.DatetimeIndex(unique_date), order, offsets
+
+
+def build_sec_holdings(sec_selected):
+    """
+    :param sec_selected: pd.DataFrame/Series, multi index = [tiaoCangDate, secID], 可带weight列
+    :return: SecHoldings, tiaocang_date = 调仓日, offsets = 每个调仓日的起止位置, sec_code = secID编码,
+             sec_universe = 所有出现过的secID, weight = 与sec_code对齐的权重(无weight列时为None)
+    """
+    unique_date, order, offsets = _group_by_tiaocang_date(sec_selected.index)
+    sec_code, sec_universe = pd.factorize(sec_selected.index.get_level_values('secID').values[order], sort=True)
+    if isinstance(sec_selected, pd.DataFrame) and 'weight' in sec_selected.columns:
+        weight = sec_selected['weight'].values[order].astype(float)
+    else:
+        weight = None
+    return SecHoldings(tiaocang_date=unique_date,
+                       offsets=offsets,
+                       sec_code=sec_code,
+                       sec_universe=np.asarray(sec_universe),
+                       weight=weight)
@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-from pyAlphaStrat.analyzer.fund.category import get_index_open_fund
-from pyAlphaStrat.analyzer.fund.category import get_quant_open_fund
-
-from pyAlphaStrat.analyzer.fund.fundAnalyzer import FundAnalyzer
-
+_lazyAttributes = {
+    'get_index_open_fund': 'pyAlphaStrat.analyzer.fund.category',
+    'get_quant_open_fund': 'pyAlphaStrat.analyzer.fund.category',
+    'FundUniverseSnapshot': 'pyAlphaStrat.analyzer.fund.category',
+    'FundAnalyzer': 'pyAlphaStrat.analyzer.fund.fundAnalyzer'
+}
 
 __all__ = ['get_index_open_fund',
            'get_quant_open_fund',
-           'FundAnalyzer']
\ No newline at end of file
+           'FundUniverseSnapshot',
+           'FundAnalyzer']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -1,12 +1,28 @@
 # -*- coding: utf-8 -*-
 
+import re
+import time
+import warnings
+
+import numpy as np
 import pandas as pd
 import tushare as ts
 
+from pyAlphaStrat.utils.fetcher import fetch_concurrently
 from pyAlphaStrat.utils.misc import pickle_dump_data
 from pyAlphaStrat.utils.misc import pickle_load_data
+from pyAlphaStrat.utils.priceCache import PriceCache
+from pyAlphaStrat.utils.priceCache import get_missing_date_range
 
-_indexUnd = ['50', '100', '300', '500', '800', '1000']
+# 基金名称中的数字: 跟踪指数标的
+_indexUndName = {
+    '50': u'上证50',
+    '100': u'中证100',
+    '300': u'沪深300',
+    '500': u'中证500',
+    '800': u'中证800',
+    '1000': u'中证1000'
+}
 _indexIncludeKeyWord = [u'指数', u'增强']
 _indexExcludeKeyWord = [u'ETF联接']
 
@@ -17,6 +33,7 @@ _pklIndexFundNAV = 'indexFundNav.pkl'
 _pklQuantFundNAV = 'quantFundNav.pkl'
 _pkl_index_fund_id = 'indexFundID.pkl'
 _pkl_quant_fund_id = 'quantFundID.pkl'
+_fundNavCachePath = 'fundNavCache'
 
 
 def map_to_index_und(fund_name):
@@ -24,38 +41,115 @@ def map_to_index_und(fund_name):
     :param fund_name: str, name of the fund
     :return: str, 跟踪指数标的
     """
-    switcher = {
-        '50': u'上证50',
-        '100': u'中证100',
-        '300': u'沪深300',
-        '500': u'中证500',
-        '800': u'中证800',
-        '1000': u'中证1000'
-    }
-    return switcher.get(file(str.isdigit, fund_name), u'其他')
+    return _indexUndName.get(''.join(c for c in fund_name if c.isdigit()), u'其他')
 
 
-# 所有指数以及指数增强基金列表
-def get_index_open_fund(pkl_file=None):
+def _get_keyword_pattern(keywords):
     """
-    :param pkl_file:
-    :return: pd.DataFrame index= fundID, col = [fundName, indexUnd]
+    :param keywords: list of unicode, 关键词
+    :return: re pattern, 所有关键词的alternation, 一次匹配即可判断是否包含任一关键词
+    """
+    return re.compile(u'|'.join(re.escape(keyword) for keyword in keywords), re.UNICODE)
+
+
+_indexIncludePattern = _get_keyword_pattern(_indexIncludeKeyWord)
+_indexExcludePattern = _get_keyword_pattern(_indexExcludeKeyWord)
+_quantIncludePattern = _get_keyword_pattern(_quantIncludeKeyWord)
+_quantExcludePattern = _get_keyword_pattern(_quantExcludeKeyWord)
+
+# fund_type: (获取时间戳, pd.DataFrame[symbol, sname]), 同一进程内每类基金只请求一次
+_openFundListCache = {}
+
+
+def get_open_fund_list(fund_type, max_age=None, fetch_func=None):
+    """
+    :param fund_type: str, 'equity'/'mix'等, see ts.get_nav_open
+    :param max_age: float, optional, 缓存的最长有效秒数, None表示本进程内一直有效
+    :param fetch_func: callable, optional, fetch_func(fund_type=...) -> pd.DataFrame, 默认为ts.get_nav_open
+    :return: tuple, (获取时间戳, pd.DataFrame col = [symbol, sname])
     """
-    equity_fund = ts.get_nav_open(fund_type='equity')
-    equity_fund = equity_fund[['symbol', 'sname']]
-    index_fund = equity_fund[equity_fund['sname'].str.contains(_indexIncludeKeyWord[0]) |
-                             equity_fund['sname'].str.contains(_indexIncludeKeyWord[1])]
+    now = time.time()
+    if fund_type in _openFundListCache:
+        timestamp, fund_list = _openFundListCache[fund_type]
+        if max_age is None or now - timestamp <= max_age:
+            return timestamp, fund_list
+    fetch_func = ts.get_nav_open if fetch_func is None else fetch_func
+    fund_list = fetch_func(fund_type=fund_type)[['symbol', 'sname']]
+    _openFundListCache[fund_type] = (now, fund_list)
+    return now, fund_list
+
 
+def classify_open_fund(equity_fund, mix_fund):
+    """
+    :param equity_fund: pd.DataFrame, col = [symbol, sname], 股票型基金
+    :param mix_fund: pd.DataFrame, col = [symbol, sname], 混合型基金
+    :return: tuple, (指数及指数增强基金 index = fundID, col = [fundName, indexUnd];
+                     量化主动基金 index = fundID, col = [fundName])
+    对基金名称整列做一次关键词匹配, 同时得到两类基金
+    """
+    fund = pd.concat([equity_fund[['symbol', 'sname']], mix_fund[['symbol', 'sname']]], axis=0)
+    is_equity = np.arange(len(fund)) < len(equity_fund)
+    name = fund['sname']
     # 去除A类
-    index_fund = index_fund[~index_fund['sname'].str.endswith('A')]
-    # 去除ETF链接
-    index_fund = index_fund[~index_fund['sname'].str.contains(_indexExcludeKeyWord[0])]
+    not_a = ~name.str.endswith('A').fillna(False).values
+    # 指数基金只从股票型基金中选, 去除ETF联接
+    is_index = is_equity & not_a & name.str.contains(_indexIncludePattern, na=False).values & \
+        ~name.str.contains(_indexExcludePattern, na=False).values
+    # 量化基金去除指数增强
+    is_quant = not_a & name.str.contains(_quantIncludePattern, na=False).values & \
+        ~name.str.contains(_quantExcludePattern, na=False).values
+
+    index_fund = fund[is_index].copy()
     # 添加跟踪标的
-    index_fund['sname'] = index_fund['sname'].apply(lambda x: x.encode('utf-8'))
-    index_fund['indexUnd'] = index_fund['sname'].apply(map_to_index_und)
+    index_fund['indexUnd'] = index_fund['sname'].str.findall(r'\d').str.join('').map(_indexUndName).fillna(u'其他')
+    index_fund['sname'] = index_fund['sname'].str.encode('utf-8')
     index_fund.columns = ['fundID', 'fundName', 'indexUnd']
     index_fund = index_fund.set_index('fundID')
 
+    quant_fund = fund[is_quant].copy()
+    quant_fund['sname'] = quant_fund['sname'].str.encode('utf-8')
+    quant_fund.columns = ['fundID', 'fundName']
+    quant_fund = quant_fund.set_index('fundID')
+
+    return index_fund, quant_fund
+
+
+class FundUniverseSnapshot(object):
+    def __init__(self, max_age=None, fetch_func=None):
+        """
+        :param max_age: float, optional, 基金列表缓存的最长有效秒数, None表示本进程内一直有效
+        :param fetch_func: callable, optional, fetch_func(fund_type=...) -> pd.DataFrame, 默认为ts.get_nav_open
+        :return:
+        股票型和混合型基金列表各请求一次, 指数基金与量化基金均从同一份快照中分类得到
+        """
+        equity_timestamp, equity_fund = get_open_fund_list('equity', max_age, fetch_func)
+        mix_timestamp, mix_fund = get_open_fund_list('mix', max_age, fetch_func)
+        self._timestamp = min(equity_timestamp, mix_timestamp)
+        self._indexFund, self._quantFund = classify_open_fund(equity_fund, mix_fund)
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def index_fund(self):
+        return self._indexFund
+
+    @property
+    def quant_fund(self):
+        return self._quantFund
+
+
+# 所有指数以及指数增强基金列表
+def get_index_open_fund(pkl_file=None, snapshot=None):
+    """
+    :param pkl_file:
+    :param snapshot: FundUniverseSnapshot, optional, 默认使用本进程内缓存的基金列表新建
+    :return: pd.DataFrame index= fundID, col = [fundName, indexUnd]
+    """
+    snapshot = FundUniverseSnapshot() if snapshot is None else snapshot
+    index_fund = snapshot.index_fund
+
     if pkl_file is not None:
         pickle_dump_data(index_fund, pkl_file)
 
@@ -63,30 +157,14 @@ def get_index_open_fund(pkl_file=None):
 
 
 # 所有量化主动基金
-def get_quant_open_fund(pkl_file=None):
+def get_quant_open_fund(pkl_file=None, snapshot=None):
     """
     :param pkl_file:
-    :return: pd.DataFrame [fundID, fundName, indexUnd]
+    :param snapshot: FundUniverseSnapshot, optional, 默认使用本进程内缓存的基金列表新建
+    :return: pd.DataFrame index = fundID, col = [fundName]
     """
-    equity_fund = ts.get_nav_open(fund_type='equity')
-    equity_fund = equity_fund[['symbol', 'sname']]
-    quant_equity_fund = equity_fund[equity_fund['sname'].str.contains(_quantIncludeKeyWord[0]) |
-                                    equity_fund['sname'].str.contains(_quantIncludeKeyWord[1]) |
-                                    equity_fund['sname'].str.contains(_quantIncludeKeyWord[2])]
-
-    mix_fund = ts.get_nav_open(fund_type='mix')
-    mix_fund = mix_fund[['symbol', 'sname']]
-    quant_mix_fund = mix_fund[mix_fund['sname'].str.contains(_quantIncludeKeyWord[0]) |
-                              mix_fund['sname'].str.contains(_quantIncludeKeyWord[1]) |
-                              mix_fund['sname'].str.contains(_quantIncludeKeyWord[2])]
-
-    quant_fund = pd.concat([quant_equity_fund, quant_mix_fund], axis=0)
-    # 去除A类
-    quant_fund = quant_fund[~quant_fund['sname'].str.endswith('A')]
-    quant_fund = quant_fund[~quant_fund['sname'].str.contains(_quantExcludeKeyWord[0])]
-    quant_fund['sname'] = quant_fund['sname'].apply(lambda x: x.encode('utf-8'))
-    quant_fund.columns = ['fundID', 'fundName']
-    quant_fund = quant_fund.set_index(['fundID'])
+    snapshot = FundUniverseSnapshot() if snapshot is None else snapshot
+    quant_fund = snapshot.quant_fund
 
     if pkl_file is not None:
         pickle_dump_data(quant_fund, pkl_file)
@@ -94,24 +172,81 @@ def get_quant_open_fund(pkl_file=None):
     return quant_fund
 
 
-def get_fund_nav(fund_id, start_date, end_date, pkl_file=None):
+def _fetch_fund_nav(fetch_func, fund, start_date, end_date):
+    """
+    :return: pd.Series, index = date, value = cumul NAV, 无有效净值时为None
+    """
+    fund_nav = fetch_func(fund, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    if fund_nav is None or len(fund_nav) == 0:
+        return None
+    # 取累计净值数据
+    fund_nav = fund_nav['total'].astype(float).dropna()
+    if len(fund_nav) == 0:
+        return None
+    fund_nav.index = pd.to_datetime(fund_nav.index)
+    fund_nav.name = fund
+    return fund_nav
+
+
+def get_fund_nav(fund_id, start_date, end_date, pkl_file=None, cache_path=None, nb_thread=8,
+                 max_calls_per_second=None, nb_retry=2, fetch_func=None):
     """
     :param fund_id: list
     :param start_date: str, start date of query
     :param end_date: str, end date of query
     :param pkl_file:
+    :param cache_path: str, optional, 按基金分别存储的净值文件夹, 给定时只请求每只基金本地尚未覆盖的日期
+    :param nb_thread: int, optional, 并发请求的线程数
+    :param max_calls_per_second: float, optional, 每秒最多的请求次数
+    :param nb_retry: int, optional, 单个请求失败后的重试次数
+    :param fetch_func: callable, optional, fetch_func(fund_id, start_date, end_date) -> pd.DataFrame(含total列)/None,
+    默认为ts.get_nav_history, 可替换为本地stub
     :return:  pd.DataFrame, index = date, col = fund_id, values = cumul NAV
     """
-    ret = pd.DataFrame()
+    fetch_func = ts.get_nav_history if fetch_func is None else fetch_func
+    start_date = pd.to_datetime(str(start_date)).to_pydatetime()
+    end_date = pd.to_datetime(str(end_date)).to_pydatetime()
+    store = PriceCache(cache_path) if cache_path is not None else None
+
+    cached = {}
+    requests = []
     for fund in fund_id:
-        fund_nav = ts.get_nav_history(fund, start_date, end_date)
-        # 取累计净值数据
-        if fund_nav is not None:
-            fund_nav = fund_nav['total']
+        cached[fund] = store.load(fund) if store is not None else (pd.Series(name=fund, dtype=float), [])
+        requests += [(fund, missing_start, missing_end)
+                     for missing_start, missing_end in get_missing_date_range(cached[fund][1], start_date, end_date)]
+
+    fetched, errors = fetch_concurrently(requests,
+                                         lambda key: _fetch_fund_nav(fetch_func, *key),
+                                         nb_thread=nb_thread,
+                                         max_calls_per_second=max_calls_per_second,
+                                         nb_retry=nb_retry)
+
+    new_nav = {}
+    new_date_range = {}
+    for key in requests:
+        fund, missing_start, missing_end = key
+        if key in errors:
+            warnings.warn('failed to fetch nav of {0}: {1}'.format(fund, errors[key]))
+        elif fetched[key] is not None:
+            new_nav.setdefault(fund, []).append(fetched[key])
+            # 只记录到最后一个有净值的日期, 之后的日期下次运行时再请求
+            new_date_range.setdefault(fund, []).append((missing_start, min(missing_end,
+                                                                           fetched[key].index.max().to_pydatetime())))
+
+    nav_list = []
+    for fund in fund_id:
+        fund_nav, date_range = cached[fund]
+        if fund in new_nav:
+            fund_nav = pd.concat([fund_nav] + new_nav[fund])
+            fund_nav = fund_nav[~fund_nav.index.duplicated(keep='last')].sort_index()
             fund_nav.name = fund
-            ret = pd.concat([ret, fund_nav], axis=1)
-        else:
-            continue
+            if store is not None:
+                store.save(fund, fund_nav, date_range + new_date_range[fund])
+        fund_nav = fund_nav.loc[(fund_nav.index >= start_date) & (fund_nav.index <= end_date)]
+        if len(fund_nav) > 0:
+            nav_list.append(fund_nav)
+
+    ret = pd.concat(nav_list, axis=1) if len(nav_list) > 0 else pd.DataFrame()
 
     if pkl_file is not None:
         pickle_dump_data(ret, pkl_file)
@@ -122,14 +257,18 @@ def get_fund_nav(fund_id, start_date, end_date, pkl_file=None):
 def get_index_and_quant_fund_nav_main(start_date,
                                       end_date,
                                       update_index_fund_id=False,
-                                      update_quant_fund_id=False):
-    index_fund_id = get_index_open_fund(pkl_file=_pkl_index_fund_id) if update_index_fund_id else pickle_load_data(
-        _pkl_index_fund_id)
-    quant_fund_id = get_quant_open_fund(pkl_file=_pkl_quant_fund_id) if update_quant_fund_id else pickle_load_data(
-        _pkl_quant_fund_id)
-
-    index_fund_nav = get_fund_nav(index_fund_id.index.tolist(), start_date, end_date, pkl_file=_pklIndexFundNAV)
-    quant_fund_nav = get_fund_nav(quant_fund_id.index.tolist(), start_date, end_date, pkl_file=_pklQuantFundNAV)
+                                      update_quant_fund_id=False,
+                                      cache_path=_fundNavCachePath):
+    snapshot = FundUniverseSnapshot() if update_index_fund_id or update_quant_fund_id else None
+    index_fund_id = get_index_open_fund(pkl_file=_pkl_index_fund_id, snapshot=snapshot) if update_index_fund_id \
+        else pickle_load_data(_pkl_index_fund_id)
+    quant_fund_id = get_quant_open_fund(pkl_file=_pkl_quant_fund_id, snapshot=snapshot) if update_quant_fund_id \
+        else pickle_load_data(_pkl_quant_fund_id)
+
+    index_fund_nav = get_fund_nav(index_fund_id.index.tolist(), start_date, end_date, pkl_file=_pklIndexFundNAV,
+                                  cache_path=cache_path)
+    quant_fund_nav = get_fund_nav(quant_fund_id.index.tolist(), start_date, end_date, pkl_file=_pklQuantFundNAV,
+                                  cache_path=cache_path)
 
     return index_fund_nav, quant_fund_nav
 
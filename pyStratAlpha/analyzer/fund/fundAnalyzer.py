@@ -2,8 +2,7 @@
 import numpy as np
 import pandas as pd
 
-from pyAlphaStrat.analyzer.performance import perf_stat
-from pyAlphaStrat.utils import time_index_slicer
+from pyAlphaStrat.analyzer.performance import perf_stat_batch
 
 
 class FundAnalyzer(object):
@@ -19,8 +18,9 @@ class FundAnalyzer(object):
         """
         self._startDate = start_date
         self._endDate = end_date
-        self._fundReturn = fund_return
-        self._benchmarkReturn = benchmark_return
+        # 按日期排序一次, 区间行号的计算与取数都基于同一顺序
+        self._fundReturn = fund_return.sort_index()
+        self._benchmarkReturn = benchmark_return.sort_index()
         self._tiaoCangDate = tiaocang_date
 
     @staticmethod
@@ -30,30 +30,58 @@ class FundAnalyzer(object):
         :param benchmark_return: pd.Series, index = date, value = return
         :return: pd.DataFrame, index = fundID, col = perf stat
         """
-        ret = pd.DataFrame()
-        perf_sign = pd.Series()
-        for secID in fund_return.columns:
-            perf, perf_sign = perf_stat(strat_return=fund_return[secID],
-                                        benchmark_return=benchmark_return)
-            ret = pd.concat([ret, perf], axis=1)
-
-        return ret.transpose(), perf_sign
+        return perf_stat_batch(returns=fund_return, benchmark_return=benchmark_return)
 
     @staticmethod
     def _rank_perf_stat(perf_stats, perf_sign):
         """
         :param perf_stats: pd.DataFrame, index = fundID, col = perf stat
+                           或 multi index = [tiaoCangDate, fundID], 此时在每个调仓日内分别排序
         :param perf_sign: pd.Series, index = perfStatName, value = 1/-1
-        :return: pd.DataFrame, index = fundID, col = perf stat, value = rank adjusted
+        :return: pd.DataFrame, index同perf_stats, col = perf stat, value = rank adjusted
+        """
+        # 乘以符号后统一升序排序, 与按符号分别选择升/降序的排名相同
+        signed_stats = perf_stats * perf_sign.reindex(perf_stats.columns)
+        if isinstance(perf_stats.index, pd.MultiIndex):
+            return signed_stats.groupby(level=0).rank()
+        return signed_stats.rank()
+
+    def _get_interval_rows(self, tiaocang_date):
+        """
+        :param tiaocang_date: list, 调仓日
+        :return: tuple of np.array, (行号, 所属区间编号), 区间i包含[tiaocang_date[i], tiaocang_date[i+1]]两端的日期,
+                 相邻区间在调仓日重叠, 因此逐区间展开行号而不是直接切分
         """
+        date_index = pd.DatetimeIndex(self._fundReturn.index)
+        tiaocang_date = pd.to_datetime(tiaocang_date)
+        starts = date_index.searchsorted(tiaocang_date[:-1], side='left')
+        ends = date_index.searchsorted(tiaocang_date[1:], side='right')
+        lengths = np.maximum(ends - starts, 0)
+        interval = np.repeat(np.arange(len(lengths)), lengths)
+        rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        return rows, interval
 
-        ret = pd.DataFrame()
-        for stat in perf_stats.columns:
-            flag = True if perf_sign[stat] == 1 else False
-            rank = perf_stats[stat].rank(ascending=flag, axis=0)
-            ret = pd.concat([ret, rank], axis=1)
-        ret.columns = perf_stats.columns
-        return ret
+    def _calc_fund_score_on_intervals(self, tiaocang_date):
+        """
+        :param tiaocang_date: list, 调仓日, 第i个区间为[tiaocang_date[i], tiaocang_date[i+1]]
+        :return: pd.Series, multi index = [tiaoCangDate(区间结束日), secID], value = score
+        所有区间的指标通过分段归约一次算出, 再在各区间内一次性排序
+        """
+        rows, interval = self._get_interval_rows(tiaocang_date)
+        fund_return = self._fundReturn.iloc[rows]
+        benchmark_return = self._benchmarkReturn.reindex(fund_return.index)
+        fund_return.index = np.arange(len(rows))
+        benchmark_return.index = fund_return.index
+
+        fund_perf_stat, fund_perf_stat_sign = perf_stat_batch(returns=fund_return,
+                                                              benchmark_return=benchmark_return,
+                                                              group=interval)
+        end_date = np.asarray(tiaocang_date[1:])[fund_perf_stat.index.get_level_values(0)]
+        fund_perf_stat.index = pd.MultiIndex.from_arrays([end_date, fund_perf_stat.index.get_level_values(1)],
+                                                         names=['tiaoCangDate', 'secID'])
+
+        rank = self._rank_perf_stat(fund_perf_stat, fund_perf_stat_sign)
+        return rank.sum(axis=1)
 
     def calc_fund_score_on_date(self, tiaocang_start_date, tiaocang_end_date):
         """
@@ -61,32 +89,11 @@ class FundAnalyzer(object):
         :param tiaocang_end_date: str, end date of holding period
         :return: pd.Series, index = fundID, value = score
         """
-        fund_return = time_index_slicer(self._fundReturn, tiaocang_start_date, tiaocang_end_date)
-        # TODO drop out nan cols
-        benchmark_return = time_index_slicer(self._benchmarkReturn, tiaocang_start_date, tiaocang_end_date)
-
-        fund_perf_stat, fund_perf_stat_sign = self._calc_perf_stat(fund_return=fund_return,
-                                                                   benchmark_return=benchmark_return)
-
-        rank = self._rank_perf_stat(fund_perf_stat, fund_perf_stat_sign)
-        fund_score = rank.sum(axis=1)
-        return fund_score
+        fund_score = self._calc_fund_score_on_intervals([tiaocang_start_date, tiaocang_end_date])
+        return fund_score.reset_index(level='tiaoCangDate', drop=True)
 
     def calc_fund_score(self):
         """
         :return: pd.Series,  Multiindex = [tiaoCangDate, fundID]
         """
-        # TODO
-
-        ret = pd.Series()
-
-        for i in range(len(self._tiaoCangDate) - 1):
-            tiaocang_start_date = self._tiaoCangDate[i]
-            tiaocang_end_date = self._tiaoCangDate[i + 1]
-            fund_score = self.calc_fund_score_on_date(tiaocang_start_date, tiaocang_end_date)
-            np.arrays = [[tiaocang_end_date], fund_score.index.values]
-            index = pd.MultiIndex.from_tuples(zip(*np.arrays), names=['tiaoCangDate', 'secID'])
-            fund_score = pd.Series(fund_score, index=index)
-            ret = pd.concat([ret, fund_score], axis=0)
-
-        return ret
+        return self._calc_fund_score_on_intervals(self._tiaoCangDate)
@@ -1,5 +1,12 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.analyzer.indexComp.indexComp import IndexComp
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-__all__ = ['IndexComp']
\ No newline at end of file
+_lazyAttributes = {
+    'IndexComp': 'pyAlphaStrat.analyzer.indexComp.indexComp'
+}
+
+__all__ = ['IndexComp']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -1,18 +1,51 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
 from pyAlphaStrat.analyzer.factor import get_multi_index_data
 
 
 class IndexComp(object):
     def __init__(self, industry_weight):
+        """
+        :param industry_weight: pd.Series, multi index = [tiaoCangDate, secID], value = 行业权重(百分比)
+        """
         self._industryWeight = industry_weight
+        # 预先展开成 调仓日 x 行业 的稠密矩阵, 'other'列为100减去其余行业权重之和
+        weight_matrix = industry_weight.unstack(level='secID').sort_index()
+        weight_matrix['other'] = np.maximum(100 - weight_matrix.sum(axis=1), 0)
+        self._weightMatrix = weight_matrix
+        self._weightValues = weight_matrix.values.astype(float)
+
+    @property
+    def industry_weight_matrix(self):
+        """
+        :return: pd.DataFrame, index = tiaoCangDate, col = industry code (含'other'), 当日不在指数中的行业为NaN
+        """
+        return self._weightMatrix
 
     def get_industry_weight_on_date(self, date):
-        data = get_multi_index_data(self._industryWeight, 'tiaoCangDate', date)
-        data = data.reset_index().set_index('secID')
-        data = data.drop(['tiaoCangDate'], axis=1)
-        data.loc['other'] = max(100 - data[self._industryWeight.name].sum(), 0)
-        ret = data[self._industryWeight.name].to_dict()
+        pos = self._weightMatrix.index.get_indexer([date])[0]
+        pyFinAssert(pos >= 0, KeyError, "industry weight on date {0} not found".format(date))
+        weight = self._weightMatrix.iloc[pos]
+        ret = weight[weight.notnull()].to_dict()
+        return ret
+
+    def get_industry_weight(self, date, industry):
+        """
+        :param date: list/np.array/pd.DatetimeIndex, 调仓日
+        :param industry: list/np.array, 与date一一对应的行业代码
+        :return: np.array, 对应的行业权重, 找不到的(调仓日, 行业)为NaN
+        一次数组索引完成所有(调仓日, 行业)的权重查询
+        """
+        date_pos = self._weightMatrix.index.get_indexer(pd.DatetimeIndex(date))
+        industry_pos = self._weightMatrix.columns.get_indexer(np.asarray(industry))
+        is_found = (date_pos >= 0) & (industry_pos >= 0)
+        ret = np.empty(len(date_pos))
+        ret.fill(np.nan)
+        ret[is_found] = self._weightValues[date_pos[is_found], industry_pos[is_found]]
         return ret
 
     def get_industry_weight_on_name(self, industry_name):
@@ -26,10 +59,11 @@ class IndexComp(object):
         :param industry: pd.Series, index = secID, value = industry code
         :return: pd.Series, index = secID, value = industry name
         """
-        industry = industry.copy()
         industry = industry.fillna('other')
-        ret = industry.apply(lambda x: _industryDict[x])
-        ret.name = industry.name
+        # 只对不重复的行业代码查表, 再按编码展开
+        industry_code, unique_industry = pd.factorize(industry.values)
+        industry_name = np.array([_industryDict[code] for code in unique_industry], dtype=object)
+        ret = pd.Series(industry_name[industry_code], index=industry.index, name=industry.name)
         return ret
 
     @classmethod
@@ -1,15 +1,36 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.analyzer.performance.navAnalyzer import regroup_by_re_balance_freq
-from pyAlphaStrat.analyzer.performance.navAnalyzer import ptf_re_balance
-from pyAlphaStrat.analyzer.performance.navAnalyzer import perf_stat
-from pyAlphaStrat.analyzer.performance.navAnalyzer import print_perf_stat_by_year
-from pyAlphaStrat.analyzer.performance.navAnalyzer import plot_alpha_curve
-from pyAlphaStrat.analyzer.performance.navAnalyzer import strat_evaluation
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-__all__ = ['regroup_by_re_balance_freq',
+_lazyAttributes = {
+    'calc_perf_stat': 'pyAlphaStrat.analyzer.performance.perfStat',
+    'get_re_balance_period_code': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'regroup_by_re_balance_freq': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'ptf_re_balance': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'perf_stat': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'perf_stat_batch': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'print_perf_stat_by_year': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'get_alpha_curve_data': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'plot_alpha_curve': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'strat_evaluation': 'pyAlphaStrat.analyzer.performance.navAnalyzer',
+    'StratReport': 'pyAlphaStrat.analyzer.performance.report',
+    'calc_rolling_perf_stat': 'pyAlphaStrat.analyzer.performance.rollingStat',
+    'RollingPerfStat': 'pyAlphaStrat.analyzer.performance.rollingStat'
+}
+
+__all__ = ['get_re_balance_period_code',
+           'regroup_by_re_balance_freq',
            'ptf_re_balance',
            'perf_stat',
+           'perf_stat_batch',
+           'calc_perf_stat',
            'print_perf_stat_by_year',
+           'get_alpha_curve_data',
            'plot_alpha_curve',
-           'strat_evaluation']
\ No newline at end of file
+           'strat_evaluation',
+           'StratReport',
+           'calc_rolling_perf_stat',
+           'RollingPerfStat']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -2,19 +2,18 @@
 
 # 对净值曲线做分析
 import empyrical
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from PyFin.Utilities import pyFinAssert
 from empyrical import cum_returns
-from pyfolio import utils
 
+from pyAlphaStrat.analyzer.performance.perfStat import calc_perf_stat
+from pyAlphaStrat.analyzer.performance.report import StratReport
+from pyAlphaStrat.analyzer.performance.report import draw_alpha_curve
 from pyAlphaStrat.enums import FreqType
 from pyAlphaStrat.enums import ReturnType
 from pyAlphaStrat.utils import convert_to_non_cumul_return
-from pyAlphaStrat.utils import fig_style
-
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+from pyAlphaStrat.utils import get_pyplot
 
 _DictSimpleStatFuncs = {
     empyrical.annual_return: 1,
@@ -31,31 +30,53 @@ _DictBenchmarkStatFuncs = {
 }
 
 
+def get_re_balance_period_code(date_index, re_balance_freq=FreqType.EOM):
+    """
+    :param date_index: pd.DatetimeIndex/list of datetime, 已按时间升序排列
+    :param re_balance_freq: FreqType, optional, rebalance frequncy = daily/monthly/yearly
+    :return: np.array of int, 每个日期所属调仓区间的编号, 从0开始且随时间递增
+    """
+    date_index = pd.DatetimeIndex(date_index)
+    if re_balance_freq == FreqType.EOD:
+        key = date_index.year * 10000 + date_index.month * 100 + date_index.day
+    elif re_balance_freq == FreqType.EOM:
+        key = date_index.year * 12 + date_index.month
+    elif re_balance_freq == FreqType.EOY:
+        key = date_index.year
+    else:
+        raise ValueError('get_re_balance_period_code: no-recognize re-balance frequency')
+    ret, _ = pd.factorize(np.asarray(key), sort=True)
+    return ret
+
+
 def regroup_by_re_balance_freq(data, re_balance_freq=FreqType.EOM):
     """
     :param data: pd.DataFrame, index = dates
     :param re_balance_freq: str, optional, rebalance frequncy = daily/monthly/yearly
-    :return: pd.group object
+    :return: pd.group object, group key = 调仓区间的最后一天(当日/月末/年末), pd.Timestamp
     """
     if isinstance(data, pd.Series):
         data = pd.DataFrame(data)
+    data = data.sort_index()
+    date_index = pd.DatetimeIndex(data.index).normalize()
     if re_balance_freq == FreqType.EOD:
-        ret = data.groupby([lambda x: x.year, lambda x: x.month, lambda x: x.day])
+        key = date_index
     elif re_balance_freq == FreqType.EOM:
-        ret = data.groupby(pd.TimeGrouper(freq='M'))
+        key = date_index + pd.offsets.MonthEnd(0)
     elif re_balance_freq == FreqType.EOY:
-        ret = data.groupby(pd.TimeGrouper(freq='A'))
+        key = date_index + pd.offsets.YearEnd(0)
     else:
         raise ValueError('regroup_by_re_balance_freq: no-recognize re-balance frequency')
-    return ret
+    return data.groupby(key)
 
 
 def ptf_re_balance(return_dict, margin_prop=0.0, re_balance_freq=FreqType.EOM):
     """
     :param return_dict: dict, returnName: [returnData, ReturnType]
-    :param margin_prop: float, optional, proportion of the init ptf that is allocated to futures account
+    :param margin_prop: float/list of float, optional, proportion of the init ptf that is allocated to futures account
     :param re_balance_freq: str, optional, rebalance frequncy = daily/monthly/yearly
     :return: pd.Series, daily cumul returns of hedged ptf
+             若margin_prop为list, 返回pd.DataFrame, col = margin_prop, 每列为对应保证金比例下的对冲组合净值
     """
     strat_return = return_dict['stratReturn'][0]
     strat_return_type = return_dict['stratReturn'][1]
@@ -69,80 +90,104 @@ def ptf_re_balance(return_dict, margin_prop=0.0, re_balance_freq=FreqType.EOM):
                                              starting_value=1.0) if benchmark_return_type == ReturnType.NonCumul \
         else benchmark_return
 
-    pyFinAssert(0 <= margin_prop <= 1.0, ValueError, " margin prop must be between 0 and 1")
-    hedged_ptf_return = pd.Series()
+    margin = np.atleast_1d(np.asarray(margin_prop, dtype=float))
+    pyFinAssert(((0 <= margin) & (margin <= 1.0)).all(), ValueError, " margin prop must be between 0 and 1")
     # merge strat and index returns together
     return_data = pd.concat([strat_return, benchmark_return], axis=1, join_axes=[strat_return.index])
     return_data.columns = ['strategy', 'benchmark']
     return_data.index = pd.to_datetime(return_data.index)
+    return_data = return_data.sort_index()
     pyFinAssert(return_data.isnull().values.any() == False, ValueError, " returnData has NaN values")
-    regroup_total_return = regroup_by_re_balance_freq(return_data, re_balance_freq)
-
-    # first date is a balance date
-    re_balance_base_nav = 1.0
-    norm_base_return = return_data.iloc[0]
-    for name, group in regroup_total_return:
-        # compute the hedged return
-        norm_strat_return = group['strategy'] / norm_base_return['strategy']
-        norm_benchmark_return = group['benchmark'] / norm_base_return['benchmark']
-        hedged_return = (1 + (norm_strat_return - norm_benchmark_return) * (1 - margin_prop)) * re_balance_base_nav
-
-        # update the re_balance base NPV
-        re_balance_base_nav = hedged_return.iloc[-1]
-
-        # update norm base return
-        norm_base_return = group.iloc[-1]
-
-        # merge into ptfValue
-        hedged_ptf_return = pd.concat([hedged_ptf_return, hedged_return], axis=0)
 
-    hedged_ptf_return.name = 'hedgedPtfReturn'
+    period_code = get_re_balance_period_code(return_data.index, re_balance_freq)
+    # 每个区间最后一行的位置; 区间k以区间k-1的最后一行为基准归一化, first date is a balance date
+    period_end = np.append(np.flatnonzero(period_code[1:] != period_code[:-1]), len(period_code) - 1)
+    base_pos = np.append(0, period_end[:-1])[period_code]
+    values = return_data.values
+    norm_return = values / values[base_pos]
+
+    # hedged return within each period, shape = [nb dates, nb margin prop]
+    hedged_return = 1 + np.outer(norm_return[:, 0] - norm_return[:, 1], 1 - margin)
+    # 区间k的起始净值 = 之前各区间期末净值的连乘
+    base_nav = np.cumprod(np.vstack([np.ones((1, len(margin))), hedged_return[period_end[:-1]]]), axis=0)
+    hedged_return *= base_nav[period_code]
+
+    if np.ndim(margin_prop) == 0:
+        hedged_ptf_return = pd.Series(hedged_return[:, 0], index=return_data.index, name='hedgedPtfReturn')
+    else:
+        hedged_ptf_return = pd.DataFrame(hedged_return, index=return_data.index, columns=margin)
+        hedged_ptf_return.columns.name = 'marginProp'
 
     return hedged_ptf_return
 
 
 def print_perf_stat_by_year(ptf_return, ptf_return_type):
     """
-    :param ptf_return: daily cumul/non-cumul returns of ptf
+    :param ptf_return: pd.Series/pd.DataFrame, daily cumul/non-cumul returns of ptf, DataFrame的每列为一个组合,
+    例如ptf_re_balance在多个保证金比例下的对冲组合
     :param ptf_return_type:
-    :return: perf_stat by years
+    :return: perf_stat by years, index = perf stat, col = year; 多列输入时 multi col = [组合, year]
     """
     # convert cumul return into daily return
     # it is a bit stupid because empyrical only accept non-cumul return
     daily_return = convert_to_non_cumul_return(ptf_return) if ptf_return_type == ReturnType.Cumul else ptf_return
+    if isinstance(daily_return, pd.Series):
+        daily_return = pd.DataFrame(daily_return)
+    daily_return = daily_return.sort_index()
+    daily_return.index = pd.to_datetime(daily_return.index)
+
+    # 按年分段一次性计算所有年份、所有组合的指标, 结果的行按 [year, 组合] 排列
+    perf_stats, _ = perf_stat_batch(daily_return, group=daily_return.index.year)
+    nb_ptf = daily_return.shape[1]
+    if nb_ptf == 1:
+        perf_stats = perf_stats.reset_index(level=1, drop=True)
+    else:
+        # 调整为 [组合, year] 的顺序, 组合保持输入的列顺序
+        order = np.arange(len(perf_stats)).reshape(-1, nb_ptf).T.ravel()
+        perf_stats = perf_stats.iloc[order].swaplevel(0, 1)
+    perf_stats = perf_stats.transpose()
 
-    # regroup the data into years
-    daily_return_by_year = regroup_by_re_balance_freq(daily_return, re_balance_freq=FreqType.EOY)
+    return perf_stats.dropna(axis=1)
 
-    perf_stats = pd.Series()
-    for name, group in daily_return_by_year:
-        stat, stat_sign = perf_stat(group[group.columns[0]])
-        stat.name = name.year
-        perf_stats = pd.concat([perf_stats, stat], axis=1)
 
-    return perf_stats.dropna(axis=1)
+def _get_perf_stat_sign(with_benchmark):
+    """
+    :param with_benchmark: bool, 是否包含相对基准的指标
+    :return: pd.Series, index = perfStatName, value = 1/-1
+    """
+    stat_sign = dict((stat_func.__name__, sign) for stat_func, sign in _DictSimpleStatFuncs.items())
+    if with_benchmark:
+        stat_sign.update((stat_func.__name__, sign) for stat_func, sign in _DictBenchmarkStatFuncs.items())
+    return pd.Series(stat_sign)
+
+
+def perf_stat_batch(returns, benchmark_return=None, group=None):
+    """
+    :param returns: pd.DataFrame/Series, index = date, col = asset, values = non cumul return
+    :param benchmark_return: pd.Series, optional, index = date, values = non cumul return
+    :param group: array like, optional, 与returns行对齐的分组标签(如年份), 同一组的行需连续
+    :return: tuple, (pd.DataFrame, pd.Series), 指标: index = asset (或 [group, asset]), col = perf stat;
+             符号: index = perfStatName, value = 1/-1
+    """
+    stat_sign = _get_perf_stat_sign(benchmark_return is not None)
+    stat = calc_perf_stat(returns, benchmark_return=benchmark_return, group=group,
+                          stat_names=stat_sign.index.tolist())
+    return stat, stat_sign
 
 
 def perf_stat(strat_return, benchmark_return=None):
-    stat = pd.Series()
-    stat_sign = pd.Series()
-
-    for stat_func in _DictSimpleStatFuncs.keys():
-        stat[stat_func.__name__] = stat_func(strat_return)
-        stat_sign[stat_func.__name__] = _DictSimpleStatFuncs[stat_func]
-
-    if benchmark_return is not None:
-        for stat_func in _DictBenchmarkStatFuncs.keys():
-            stat[stat_func.__name__] = stat_func(strat_return,
-                                                 benchmark_return)
-            stat_sign[stat_func.__name__] = _DictBenchmarkStatFuncs[stat_func]
+    stat, stat_sign = perf_stat_batch(strat_return, benchmark_return)
+    stat = stat.iloc[0]
+    stat.name = None
     return stat, stat_sign
 
 
-def plot_alpha_curve(return_dict):
+def get_alpha_curve_data(return_dict):
     """
-    :param return_dict: dict, returnName: [returnData, ReturnType]
-    :return:
+    :param return_dict: dict, returnName: [returnData, ReturnType], 需包含stratReturn/benchmarkReturn/ptfReturn
+    ptfReturn可为pd.DataFrame, col = marginProp, 见ptf_re_balance
+    :return: pd.DataFrame, index = date, col = [策略对冲收益, 策略未对冲收益, 指数收益], 累计净值
+             ptfReturn为DataFrame时每个保证金比例一列对冲收益, 列名为 策略对冲收益_保证金比例
     """
 
     strat_return = return_dict['stratReturn'][0]
@@ -158,41 +203,54 @@ def plot_alpha_curve(return_dict):
                                    starting_value=1.0) if benchmark_return_type == ReturnType.NonCumul \
         else benchmark_return
     ptf_return = cum_returns(ptf_return, starting_value=1.0) if ptf_return_type == ReturnType.NonCumul else ptf_return
+    if isinstance(ptf_return, pd.DataFrame):
+        hedged_name = [u'策略对冲收益_{0:g}'.format(margin) for margin in ptf_return.columns]
+    else:
+        hedged_name = [u'策略对冲收益']
 
     data = pd.concat([ptf_return, strat_return, benchmark_return], join_axes=[strat_return.index], axis=1)
     # 如果缺失起始数据, 设置为1.0 （起始净值）
     data = data.fillna(1.0)
-    data.columns = [u'策略对冲收益', u'策略未对冲收益', u'指数收益']
-    ax = data.plot(figsize=(16, 6), title=u'策略收益演示图')
-    fig_style(ax, [u'策略对冲净值', u'策略未对冲净值', u'指数收益'], x_label=u'交易日', y_label=u'净值',
-              legend_loc='upper left')
+    data.columns = hedged_name + [u'策略未对冲收益', u'指数收益']
+    return data
+
+
+def plot_alpha_curve(return_dict):
+    """
+    :param return_dict: dict, returnName: [returnData, ReturnType]
+    :return:
+    """
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(16, 6))
+    draw_alpha_curve(ax, get_alpha_curve_data(return_dict))
     plt.show()
 
 
 def strat_evaluation(return_dict,
                      re_balance_freq=FreqType.EOM,
                      margin_prop=0.0,
-                     need_plot=True):
+                     need_plot=False,
+                     need_print=True):
     """
     :param return_dict: dict, returnName: [returnData, ReturnType]
-    :param margin_prop:
+    :param margin_prop: float/list of float, optional, 为list时报告包含每个保证金比例下的对冲净值和分年业绩统计
     :param re_balance_freq: str, optional, rebalance frequncy = daily/monthly/yearly
-    :param need_plot: bool, optional, whether to plot the strategy/benchmark/hedged ptf npv
-    :return: print out the perf stat table by years
+    :param need_plot: bool, optional, whether to show the strategy/benchmark/hedged ptf npv interactively
+    :param need_print: bool, optional, whether to print out the perf stat table by years
+    :return: StratReport, 净值曲线与分年业绩统计, 可再调用save_figure/to_html离屏输出
     """
 
     ptf_return = ptf_re_balance(return_dict=return_dict, margin_prop=margin_prop, re_balance_freq=re_balance_freq)
     perf_stats = print_perf_stat_by_year(ptf_return, ReturnType.Cumul)
-
-    utils.print_table(perf_stats, name='Performance statistics for hedged portfolio',
-                      fmt='{0:.4f}')
-
     perf_stats_strat = print_perf_stat_by_year(return_dict['stratReturn'][0], return_dict['stratReturn'][1])
-    utils.print_table(perf_stats_strat, name='Performance statistics for unhedged portfolio',
-                      fmt='{0:.4f}')
 
     ptf_return_dict = {'ptfReturn': [ptf_return, ReturnType.Cumul]}
     return_dict = dict(return_dict, **ptf_return_dict)
+    report = StratReport(alpha_curve=get_alpha_curve_data(return_dict),
+                         perf_stats=perf_stats,
+                         perf_stats_strat=perf_stats_strat)
+    if need_print:
+        report.print_tables()
     if need_plot:
-        plot_alpha_curve(return_dict=return_dict)
-    return
+        report.show()
+    return report
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# 对 date x asset 的收益矩阵批量计算业绩指标, 口径与empyrical(日频, 年化因子252)一致
+# 所有函数的输入为2维np.array(行=日期, 列=资产)及各分段的起止行号, 输出为 [nb segment, nb asset] 的数组
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+_annualizationFactor = 252
+
+
+def get_segment_bounds(nb_row, group=None):
+    """
+    :param nb_row: int, 收益矩阵的行数
+    :param group: array like, optional, 与行对齐的分组标签(如年份/调仓区间编号), 同一组的行需连续
+    :return: tuple, (starts, ends, keys), 每段的起始行号/结束行号(不含)/分组标签, group为None时整体为一段
+    """
+    if group is None:
+        return np.array([0]), np.array([nb_row]), None
+    group = np.asarray(group)
+    pyFinAssert(len(group) == nb_row, ValueError, "length of group must equal to the number of rows")
+    starts = np.append(0, np.flatnonzero(group[1:] != group[:-1]) + 1)
+    keys = group[starts]
+    pyFinAssert(len(pd.unique(keys)) == len(keys), ValueError, "rows of the same group must be contiguous")
+    ends = np.append(starts[1:], nb_row)
+    return starts, ends, keys
+
+
+def _segment_length(starts, ends):
+    return (ends - starts).astype(float)[:, None]
+
+
+def _segment_mean_std(returns, starts, ends):
+    """
+    :return: tuple, (非NaN个数, 均值, 标准差(ddof=1)), NaN不参与计算
+    """
+    is_valid = ~np.isnan(returns)
+    nb_valid = np.add.reduceat(is_valid.astype(float), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(is_valid, returns, 0.0), starts, axis=0) / nb_valid
+        demean = np.where(is_valid, returns - np.repeat(mean, ends - starts, axis=0), 0.0)
+        std = np.sqrt(np.add.reduceat(demean ** 2, starts, axis=0) / (nb_valid - 1))
+    std[nb_valid < 2] = np.nan
+    return nb_valid, mean, std
+
+
+def annual_return(returns, starts, ends):
+    """
+    NaN视为0收益, 年数 = 行数 / 252
+    """
+    growth = np.multiply.reduceat(1.0 + np.nan_to_num(returns), starts, axis=0)
+    nb_year = _segment_length(starts, ends) / _annualizationFactor
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return growth ** (1.0 / nb_year) - 1.0
+
+
+def max_drawdown(returns, starts, ends):
+    """
+    NaN视为0收益, 回撤从每段的起始净值1.0开始计算
+    对数净值整体累加一次后减去各段起点之前的累计值; 各段补齐成 [segment, row, asset] 后沿行累计最大值, 即段内净值高点
+    """
+    nb_row = ends - starts
+    # 亏损100%时净值取最小正数, 避免对数为-inf
+    log_growth = np.log(np.maximum(1.0 + np.nan_to_num(returns), np.finfo(float).tiny))
+    cumul = np.cumsum(log_growth, axis=0)
+    offset = np.where((starts > 0)[:, None], cumul[np.maximum(starts - 1, 0)], 0.0)
+    log_wealth = cumul - np.repeat(offset, nb_row, axis=0)
+
+    segment = np.repeat(np.arange(len(starts)), nb_row)
+    position = np.arange(len(segment)) - np.repeat(starts, nb_row)
+    padded = np.full((len(starts), nb_row.max(), returns.shape[1]), -np.inf)
+    padded[segment, position] = log_wealth
+    peak = np.maximum(np.maximum.accumulate(padded, axis=1)[segment, position], 0.0)
+    return np.minimum.reduceat(np.exp(log_wealth - peak) - 1.0, starts, axis=0)
+
+
+def calmar_ratio(returns, starts, ends):
+    mdd = max_drawdown(returns, starts, ends)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ret = np.where(mdd < 0, annual_return(returns, starts, ends) / np.abs(mdd), np.nan)
+    ret[np.isinf(ret)] = np.nan
+    return ret
+
+
+def sharpe_ratio(returns, starts, ends):
+    nb_valid, mean, std = _segment_mean_std(returns, starts, ends)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ret = mean / std * np.sqrt(_annualizationFactor)
+    ret[(std == 0) | np.isnan(std)] = np.nan
+    return ret
+
+
+def information_ratio(returns, benchmark_return, starts, ends):
+    """
+    非年化, 与empyrical一致: 跟踪误差为NaN(有效样本不足2个)时返回0, 跟踪误差为0时返回NaN
+    """
+    nb_valid, mean, std = _segment_mean_std(returns - benchmark_return[:, None], starts, ends)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ret = mean / std
+    ret[std == 0] = np.nan
+    ret[np.isnan(std)] = 0.0
+    ret[(_segment_length(starts, ends) < 2).ravel()] = np.nan
+    return ret
+
+
+def alpha_beta(returns, benchmark_return, starts, ends):
+    """
+    :return: tuple, (alpha, beta), 对基准收益做线性回归, alpha为年化截距, 只使用策略与基准都非NaN的日期
+    """
+    benchmark_return = np.repeat(benchmark_return[:, None], returns.shape[1], axis=1)
+    is_valid = ~np.isnan(returns) & ~np.isnan(benchmark_return)
+    nb_valid = np.add.reduceat(is_valid.astype(float), starts, axis=0)
+    nb_row = ends - starts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns_mean = np.add.reduceat(np.where(is_valid, returns, 0.0), starts, axis=0) / nb_valid
+        benchmark_mean = np.add.reduceat(np.where(is_valid, benchmark_return, 0.0), starts, axis=0) / nb_valid
+        returns_demean = np.where(is_valid, returns - np.repeat(returns_mean, nb_row, axis=0), 0.0)
+        benchmark_demean = np.where(is_valid, benchmark_return - np.repeat(benchmark_mean, nb_row, axis=0), 0.0)
+        cov = np.add.reduceat(returns_demean * benchmark_demean, starts, axis=0) / nb_valid
+        var = np.add.reduceat(benchmark_demean ** 2, starts, axis=0) / nb_valid
+        beta = np.where(np.abs(var) < 1.0e-30, np.nan, cov / var)
+    beta[(nb_valid < 2) | (_segment_length(starts, ends) < 2)] = np.nan
+    alpha = (returns_mean - beta * benchmark_mean) * _annualizationFactor
+    return alpha, beta
+
+
+def alpha(returns, benchmark_return, starts, ends):
+    return alpha_beta(returns, benchmark_return, starts, ends)[0]
+
+
+def beta(returns, benchmark_return, starts, ends):
+    return alpha_beta(returns, benchmark_return, starts, ends)[1]
+
+
+# 以empyrical函数名为key, 便于与navAnalyzer中的符号字典对应
+_simpleStatFuncs = {
+    'annual_return': annual_return,
+    'max_drawdown': max_drawdown,
+    'calmar_ratio': calmar_ratio,
+    'sharpe_ratio': sharpe_ratio,
+}
+
+_benchmarkStatFuncs = {
+    'information_ratio': information_ratio,
+    'alpha': alpha,
+    'beta': beta,
+}
+
+
+def calc_perf_stat(returns, benchmark_return=None, group=None, stat_names=None):
+    """
+    :param returns: pd.DataFrame/Series, index = date, col = asset, values = non cumul return
+    :param benchmark_return: pd.Series, optional, index = date, values = non cumul return, 按returns的日期对齐
+    :param group: array like, optional, 与returns行对齐的分组标签(如年份), 同一组的行需连续
+    :param stat_names: list of str, optional, 需要计算的指标, 默认为全部(无基准时只计算非基准指标)
+    :return: pd.DataFrame, index = asset (group不为None时 multi index = [group, asset]), col = stat name
+    """
+    if isinstance(returns, pd.Series):
+        returns = pd.DataFrame(returns)
+    if stat_names is None:
+        stat_names = list(_simpleStatFuncs.keys())
+        if benchmark_return is not None:
+            stat_names += list(_benchmarkStatFuncs.keys())
+
+    values = returns.values.astype(float)
+    starts, ends, keys = get_segment_bounds(len(values), group)
+    if isinstance(benchmark_return, pd.DataFrame):
+        benchmark_return = benchmark_return[benchmark_return.columns[0]]
+    benchmark = None if benchmark_return is None else benchmark_return.reindex(returns.index).values.astype(float)
+
+    stats = {}
+    if 'alpha' in stat_names or 'beta' in stat_names:
+        pyFinAssert(benchmark is not None, ValueError, "benchmark return is required for alpha / beta")
+        stats['alpha'], stats['beta'] = alpha_beta(values, benchmark, starts, ends)
+    for name in stat_names:
+        if name in stats:
+            continue
+        if name in _simpleStatFuncs:
+            stats[name] = _simpleStatFuncs[name](values, starts, ends)
+        elif name in _benchmarkStatFuncs:
+            pyFinAssert(benchmark is not None, ValueError, "benchmark return is required for {0}".format(name))
+            stats[name] = _benchmarkStatFuncs[name](values, benchmark, starts, ends)
+        else:
+            raise ValueError('calc_perf_stat: unknown perf stat {0}'.format(name))
+
+    if keys is None:
+        index = returns.columns
+    else:
+        index = pd.MultiIndex.from_product([keys, returns.columns], names=['group', returns.columns.name])
+    ret = pd.DataFrame(dict((name, stats[name].ravel()) for name in stat_names), index=index, columns=stat_names)
+    return ret
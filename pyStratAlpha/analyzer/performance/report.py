@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# 回测结果报告: 先收集净值曲线和业绩统计, 需要时再绘图/输出, matplotlib和pyfolio均在使用时才导入
+import base64
+import io
+
+from pyAlphaStrat.utils import fig_style
+from pyAlphaStrat.utils import get_pyplot
+from pyAlphaStrat.utils import new_figure
+
+_alphaCurveName = [u'策略对冲净值', u'策略未对冲净值', u'指数收益']
+
+
+def _get_alpha_curve_legend(columns):
+    """
+    :param columns: list of str, 净值曲线的列名, 最后两列为未对冲净值和指数净值, 之前为各保证金比例下的对冲净值
+    :return: list of str, 图例, 多个对冲净值时以保证金比例区分
+    """
+    nb_hedged = len(columns) - 2
+    if nb_hedged == 1:
+        return _alphaCurveName
+    return [u'{0}_{1}'.format(_alphaCurveName[0], col.rsplit(u'_', 1)[-1]) for col in columns[:nb_hedged]] \
+        + _alphaCurveName[1:]
+
+
+def draw_alpha_curve(ax, data):
+    """
+    :param ax: matplotlib Axes
+    :param data: pd.DataFrame, index = date, col = [对冲净值(可多列), 未对冲净值, 指数净值]
+    :return: matplotlib Axes
+    """
+    for col in data.columns:
+        ax.plot(data.index, data[col].values)
+    ax.set_title(u'策略收益演示图')
+    fig_style(ax, _get_alpha_curve_legend(list(data.columns)), x_label=u'交易日', y_label=u'净值',
+              legend_loc='upper left')
+    return ax
+
+
+class StratReport(object):
+    def __init__(self, alpha_curve, perf_stats, perf_stats_strat):
+        """
+        :param alpha_curve: pd.DataFrame, index = date, col = [对冲净值(可多列), 未对冲净值, 指数净值]
+        :param perf_stats: pd.DataFrame, 对冲组合的分年业绩统计, index = perf stat, col = year,
+        多个保证金比例时 multi col = [marginProp, year]
+        :param perf_stats_strat: pd.DataFrame, 未对冲组合的分年业绩统计, index = perf stat, col = year
+        :return:
+        """
+        self._alphaCurve = alpha_curve
+        self._perfStats = perf_stats
+        self._perfStatsStrat = perf_stats_strat
+
+    @property
+    def alpha_curve(self):
+        return self._alphaCurve
+
+    @property
+    def perf_stats(self):
+        return self._perfStats
+
+    @property
+    def perf_stats_strat(self):
+        return self._perfStatsStrat
+
+    def print_tables(self):
+        from pyfolio import utils
+        utils.print_table(self._perfStats, name='Performance statistics for hedged portfolio', fmt='{0:.4f}')
+        utils.print_table(self._perfStatsStrat, name='Performance statistics for unhedged portfolio', fmt='{0:.4f}')
+
+    def render_figure(self, figsize=(16, 6)):
+        """
+        :param figsize: tuple, optional, 图片尺寸(英寸)
+        :return: matplotlib.figure.Figure, 使用Agg画布离屏渲染
+        """
+        fig, ax = new_figure(figsize)
+        draw_alpha_curve(ax, self._alphaCurve)
+        return fig
+
+    def save_figure(self, file_path, figsize=(16, 6), dpi=100):
+        """
+        :param file_path: str, 输出图片路径, 格式由后缀决定, 如*.png
+        :param figsize: tuple, optional, 图片尺寸(英寸)
+        :param dpi: int, optional
+        :return:
+        """
+        self.render_figure(figsize).savefig(file_path, dpi=dpi)
+
+    def to_html(self, file_path, figsize=(16, 6), dpi=100):
+        """
+        :param file_path: str, 输出html路径, 图片以base64 png内嵌
+        :param figsize: tuple, optional, 图片尺寸(英寸)
+        :param dpi: int, optional
+        :return:
+        """
+        buf = io.BytesIO()
+        self.render_figure(figsize).savefig(buf, format='png', dpi=dpi)
+        img = base64.b64encode(buf.getvalue()).decode('ascii')
+        float_format = lambda x: '{0:.4f}'.format(x)
+        html = u'\n'.join([u'<html><head><meta charset="utf-8"></head><body>',
+                           u'<img src="data:image/png;base64,{0}"/>'.format(img),
+                           u'<h3>Performance statistics for hedged portfolio</h3>',
+                           _to_unicode(self._perfStats.to_html(float_format=float_format)),
+                           u'<h3>Performance statistics for unhedged portfolio</h3>',
+                           _to_unicode(self._perfStatsStrat.to_html(float_format=float_format)),
+                           u'</body></html>'])
+        with io.open(file_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    def show(self, figsize=(16, 6)):
+        """
+        :param figsize: tuple, optional, 图片尺寸(英寸)
+        :return: 使用交互式后端显示, 会阻塞直至窗口关闭
+        """
+        plt = get_pyplot()
+        fig, ax = plt.subplots(figsize=figsize)
+        draw_alpha_curve(ax, self._alphaCurve)
+        plt.show()
+
+
+def _to_unicode(text):
+    return text if isinstance(text, unicode) else text.decode('utf-8')
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# 滚动窗口业绩指标: 批量模式对整条净值曲线一次计算, 流式模式每日喂入一个净值, 两者结果逐位相同
+import math
+
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+from pyAlphaStrat.maths.rolling import RollingMax
+from pyAlphaStrat.maths.rolling import RollingMoments
+from pyAlphaStrat.maths.rolling import rolling_max
+from pyAlphaStrat.maths.rolling import rolling_mean
+from pyAlphaStrat.maths.rolling import rolling_std
+
+_annualizationFactor = 252
+_rollingStatNames = ['volatility', 'sharpe_ratio', 'drawdown']
+_rollingBenchmarkStatNames = ['information_ratio']
+
+
+def _nav_to_return(nav):
+    """
+    :param nav: np.array, 净值序列
+    :return: np.array, 日收益, 第一个为NaN
+    """
+    ret = np.empty(len(nav))
+    ret.fill(np.nan)
+    ret[1:] = nav[1:] / nav[:-1] - 1.0
+    return ret
+
+
+def _ratio(mean, std):
+    if math.isnan(std) or std == 0:
+        return np.nan
+    return mean / std
+
+
+def calc_rolling_perf_stat(nav, windows=(20, 60, 120), benchmark_nav=None):
+    """
+    :param nav: pd.Series, index = date, value = 净值
+    :param windows: list of int, optional, 窗口长度(交易日)
+    :param benchmark_nav: pd.Series, optional, index = date, value = 基准净值, 给定时计算information_ratio
+    :return: pd.DataFrame, index = date, multi col = [window, stat]
+    volatility/sharpe_ratio年化, information_ratio非年化(与empyrical一致), drawdown = 净值 / 窗口内最高净值 - 1
+    """
+    nav = nav.sort_index()
+    nav_values = nav.values.astype(float)
+    returns = _nav_to_return(nav_values)
+    if benchmark_nav is not None:
+        active_return = returns - _nav_to_return(benchmark_nav.reindex(nav.index).values.astype(float))
+
+    stats = {}
+    for window in windows:
+        mean, std = rolling_mean(returns, window), rolling_std(returns, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[(window, 'volatility')] = std * math.sqrt(_annualizationFactor)
+            stats[(window, 'sharpe_ratio')] = np.where(std == 0, np.nan, mean / std * math.sqrt(_annualizationFactor))
+            stats[(window, 'drawdown')] = nav_values / rolling_max(nav_values, window) - 1.0
+        if benchmark_nav is not None:
+            mean, std = rolling_mean(active_return, window), rolling_std(active_return, window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                stats[(window, 'information_ratio')] = np.where(std == 0, np.nan, mean / std)
+
+    stat_names = _rollingStatNames + (_rollingBenchmarkStatNames if benchmark_nav is not None else [])
+    columns = pd.MultiIndex.from_product([list(windows), stat_names], names=['window', 'stat'])
+    return pd.DataFrame(dict((col, stats[col]) for col in columns), index=nav.index, columns=columns)
+
+
+class RollingPerfStat(object):
+    def __init__(self, windows=(20, 60, 120), with_benchmark=False):
+        """
+        :param windows: list of int, optional, 窗口长度(交易日)
+        :param with_benchmark: bool, optional, 是否计算相对基准的information_ratio
+        :return:
+        流式版本的calc_rolling_perf_stat, 每次update为O(1)(drawdown为均摊O(1))
+        """
+        pyFinAssert(len(windows) > 0, ValueError, "at least one window is required")
+        self._windows = list(windows)
+        self._withBenchmark = with_benchmark
+        self._returnMoments = dict((w, RollingMoments(w)) for w in self._windows)
+        self._activeMoments = dict((w, RollingMoments(w)) for w in self._windows) if with_benchmark else None
+        self._navMax = dict((w, RollingMax(w)) for w in self._windows)
+        self._lastNav = None
+        self._lastBenchmarkNav = None
+        self._value = {}
+
+    @property
+    def value(self):
+        """
+        :return: dict, key = (window, stat), 最近一次update后的指标
+        """
+        return self._value
+
+    def update(self, nav, benchmark_nav=None):
+        """
+        :param nav: float, 当日净值
+        :param benchmark_nav: float, optional, 当日基准净值
+        :return: dict, key = (window, stat), 当日的滚动指标
+        """
+        pyFinAssert(not self._withBenchmark or benchmark_nav is not None, ValueError,
+                    "benchmark nav is required when with_benchmark is True")
+        ret = np.nan if self._lastNav is None else nav / self._lastNav - 1.0
+        self._lastNav = nav
+        if self._withBenchmark:
+            benchmark_ret = np.nan if self._lastBenchmarkNav is None else benchmark_nav / self._lastBenchmarkNav - 1.0
+            self._lastBenchmarkNav = benchmark_nav
+            active_ret = ret - benchmark_ret
+
+        value = {}
+        for window in self._windows:
+            moments = self._returnMoments[window].update(ret)
+            std = moments.std
+            value[(window, 'volatility')] = std * math.sqrt(_annualizationFactor)
+            sharpe = _ratio(moments.mean, std)
+            value[(window, 'sharpe_ratio')] = sharpe * math.sqrt(_annualizationFactor)
+            value[(window, 'drawdown')] = nav / self._navMax[window].update(nav).value - 1.0
+            if self._withBenchmark:
+                active_moments = self._activeMoments[window].update(active_ret)
+                value[(window, 'information_ratio')] = _ratio(active_moments.mean, active_moments.std)
+        self._value = value
+        return value
@@ -1,5 +1,12 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.analyzer.portfolio.portfolio import Portfolio
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-__all__ = ['Portfolio']
\ No newline at end of file
+_lazyAttributes = {
+    'Portfolio': 'pyAlphaStrat.analyzer.portfolio.portfolio'
+}
+
+__all__ = ['Portfolio']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -1,20 +1,21 @@
 # -*- coding: utf-8 -*-
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from PyFin.DateUtilities import Calendar
 from PyFin.DateUtilities import Date
+from PyFin.Utilities import pyFinAssert
 from PyFin.api.DateUtilities import bizDatesList
-from matplotlib.pyplot import *
+from scipy import sparse
 
-from pyAlphaStrat.analyzer.factor import get_multi_index_data
+from pyAlphaStrat.analyzer.factor import build_sec_holdings
 from pyAlphaStrat.analyzer.performance import strat_evaluation
+from pyAlphaStrat.analyzer.tradability import Tradability
 from pyAlphaStrat.enums import DataSource
 from pyAlphaStrat.enums import FreqType
 from pyAlphaStrat.enums import ReturnType
-from pyAlphaStrat.utils import WindMarketDataHandler
-
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+from pyAlphaStrat.utils import AsyncMarketDataHandler
+from pyAlphaStrat.utils import PricePrefetcher
+from pyAlphaStrat.utils import get_market_data_handler
 
 
 class Portfolio(object):
@@ -30,7 +31,10 @@ class Portfolio(object):
                  filter_return_on_tiaocang_date=0.09,
                  data_source=DataSource.WIND,
                  benchmark_sec_id='000300.SH',
-                 re_balance_freq=FreqType.EOM):
+                 re_balance_freq=FreqType.EOM,
+                 cache_path=None,
+                 prefetch_lookahead=0,
+                 prefetch_nb_thread=1):
         """
         :param sec_selected: pd.DataFrame, multi index = [tiaoCangDate, secID] value=[weight, industry]
         :param end_date: last evaludation date after last tiaoCangDate
@@ -39,9 +43,16 @@ class Portfolio(object):
         date will be filtered out
         :param data_source: enum, source to read price data
         :param benchmark_sec_id: str, benchmakr sec id used to compute alpha return
+        :param re_balance_freq: FreqType, rebalance frequency of the hedged ptf
+        :param cache_path: str, optional, 本地价格缓存文件夹, 给定时只向数据源请求缓存中缺失的区间
+        :param prefetch_lookahead: int, optional, 0表示一次性读取整个回测区间的价格; 大于0时按调仓区间异步读取价格,
+        计算当前区间持仓的同时在后台预取之后prefetch_lookahead个区间的价格
+        :param prefetch_nb_thread: int, optional, 预取使用的后台线程数, 即同时向数据源发出的区间请求数上限
         :return:
         """
-        self._secSelected = sec_selected
+        self._secSelected = sec_selected.sort_index(level='tiaoCangDate', sort_remaining=False)
+        # 按调仓日分段的持仓(offsets + secID编码), 用于直接按位置切片而不必每次扫描整张表
+        self._holdings = build_sec_holdings(self._secSelected)
         self._initialCapital = initial_capital
         self._tiaoCangDate = sorted(set(self._secSelected.index.get_level_values('tiaoCangDate')))
         self._tiaoCangDate.append(end_date)
@@ -50,132 +61,209 @@ class Portfolio(object):
         self._dataSource = data_source
         self._benchmarkSecID = benchmark_sec_id
         self._rebalanceFreq = re_balance_freq
+        self._pricePanel = None
+        self._tradability = None
+        self._marketDataHandler = get_market_data_handler(self._dataSource, cache_path)
+        self._prefetchLookahead = prefetch_lookahead
+        self._prefetchNbThread = prefetch_nb_thread
 
-    def _get_sec_price_between_tiaocang_date(self, tiaocang_start_date, tiaocang_end_date):
-        tiaocang_data = get_multi_index_data(self._secSelected, 'tiaoCangDate', tiaocang_start_date)
-        sec_ids = tiaocang_data.index.get_level_values('secID').tolist()
-        date = bizDatesList('China.SSE', tiaocang_start_date, tiaocang_end_date)
-        if self._dataSource == DataSource.WIND:
-            price_data = WindMarketDataHandler.get_sec_price_on_date(start_date=date[0],
-                                                                     end_date=date[-1],
-                                                                     sec_ids=sec_ids)
-        else:
-            raise NotImplementedError
-        return price_data
+    def _get_price_panel(self):
+        """
+        :return: pd.DataFrame, index = tradeDate, col = 所有调仓日持仓过的secID, 从第一个调仓日的前两个交易日开始
+        一次性读取整个回测区间的价格, 之后各调仓区间都从这张表中按位置取数
+        """
+        if self._pricePanel is None:
+            sec_ids = self._holdings.sec_universe.tolist()
+            # 多取第一个调仓日之前的两个交易日, 供调仓日过滤使用
+            sse_cal = Calendar('China.SSE')
+            start_date = sse_cal.advanceDate(Date.fromDateTime(self._tiaoCangDate[0]), '-2b').toDateTime()
+            date = bizDatesList('China.SSE', start_date, self._tiaoCangDate[-1])
+            price_data = self._marketDataHandler.get_sec_price_on_date(start_date=date[0],
+                                                                       end_date=date[-1],
+                                                                       sec_ids=sec_ids)
+            price_data.index = pd.to_datetime(price_data.index)
+            self._pricePanel = price_data.reindex(columns=sec_ids).sort_index()
+        return self._pricePanel
 
-    @staticmethod
-    def _get_sec_price_on_date(data, date):
-        price = data.loc[date]
-        price.name = 'price'
-        return price
-
-    def _get_weight_on_date(self, date):
-        weight = get_multi_index_data(self._secSelected, 'tiaoCangDate', date)
-        weight = weight.reset_index().set_index('secID')
-        weight = weight.drop(['tiaoCangDate'], axis=1)
-        filters = self._filter_sec_on_tiaocang_date(date, weight.index.tolist())
+    def _get_interval_price_requests(self):
+        """
+        :return: list of dict, 每个调仓区间一个get_sec_price_on_date的参数, 只包含该区间持仓的secID,
+        从调仓日的前两个交易日取到下一个调仓日
+        """
+        sse_cal = Calendar('China.SSE')
+        offsets = self._holdings.offsets
+        requests = []
+        for i in range(len(self._tiaoCangDate) - 1):
+            sec_code = np.unique(self._holdings.sec_code[offsets[i]:offsets[i + 1]])
+            start_date = sse_cal.advanceDate(Date.fromDateTime(self._tiaoCangDate[i]), '-2b').toDateTime()
+            requests.append({'start_date': start_date,
+                             'end_date': self._tiaoCangDate[i + 1],
+                             'sec_ids': self._holdings.sec_universe[sec_code].tolist()})
+        return requests
+
+    def _get_weight_on_date(self, date, tradability=None):
+        pos = self._holdings.tiaocang_date.get_loc(date)
+        weight = self._secSelected.iloc[self._holdings.offsets[pos]:self._holdings.offsets[pos + 1]]
+        weight = weight.reset_index(level='tiaoCangDate', drop=True)
+        filters = self._filter_sec_on_tiaocang_date(date, weight.index.tolist(), tradability)
         filter_weight = self._update_weight_after_filter(weight, filters)
         return filter_weight
 
-    def _filter_sec_on_tiaocang_date(self, tiaocang_date, sec_id):
-        sse_cal = Calendar('China.SSE')
-        tiaocang_date_prev = sse_cal.advanceDate(Date.strptime(str(tiaocang_date)[:10]), '-1b').toDateTime()
-        tiaocang_date_prev2 = sse_cal.advanceDate(Date.strptime(str(tiaocang_date)[:10]), '-2b').toDateTime()
-        price_data = WindMarketDataHandler.get_sec_price_on_date(start_date=tiaocang_date_prev2, end_date=tiaocang_date,
-                                                                 sec_ids=sec_id)
-        price_data = price_data.transpose()
-        price_data.index.name = 'sec_id'
-        # 去除涨幅过大可能买不到的
-        price_data['returnFilter'] = price_data[tiaocang_date] / price_data[
-            tiaocang_date_prev] > 1 + self._filterReturnOnTiaoCangDate
-        # 去除有NaN的， 新股
-        price_data['ipoFilter'] = pd.isnull(
-            price_data[tiaocang_date] * price_data[tiaocang_date_prev] * price_data[tiaocang_date_prev2])
-        # 去除停牌的，此处判断标准就是连续三天收盘价格一样
-        price_data['tingpaiFilter'] = ((price_data[tiaocang_date] == price_data[tiaocang_date_prev]) & (
-            price_data[tiaocang_date_prev] == price_data[tiaocang_date_prev2]))
-
-        price_data['filters'] = 1 - (1 - price_data['returnFilter']) * (1 - price_data['ipoFilter']) * (
-            1 - price_data['tingpaiFilter'])
-
-        return price_data['filters']
+    def _get_tradability(self):
+        if self._tradability is None:
+            self._tradability = Tradability(self._get_price_panel(), self._filterReturnOnTiaoCangDate)
+        return self._tradability
+
+    def _filter_sec_on_tiaocang_date(self, tiaocang_date, sec_id, tradability=None):
+        tradability = self._get_tradability() if tradability is None else tradability
+        return tradability.get_filter_on_date(tiaocang_date, sec_id)
 
     def _update_weight_after_filter(self, weight, filters):
         filter_weight = pd.concat([weight, filters], join_axes=[weight.index], axis=1)
-        ret = pd.DataFrame()
-        for name, group in filter_weight.groupby(self._secSelected.columns[1]):
-            group = group.copy()
-            total_weight = group['weight'].sum()
-            total_sec = group['weight'].count()
-            nb_sec_filtered = group['filters'].sum()
-            if nb_sec_filtered == 0:
-                ret = pd.concat([ret, group], axis=0)
-                continue
-            else:
-                adj_weight = total_weight / (total_sec - nb_sec_filtered) if total_sec > nb_sec_filtered else 0
-                group.loc[group['filters'] == 1, 'weight'] = 0.0
-                group.loc[group['filters'] == 0, 'weight'] = adj_weight
-                ret = pd.concat([ret, group], axis=0)
-
-        return ret
+        group = filter_weight.groupby(self._secSelected.columns[1])
+        total_weight = group['weight'].transform('sum').values
+        total_sec = group['weight'].transform('count').values
+        nb_sec_filtered = group['filters'].transform('sum').values
+        # 行业内有股票被过滤时, 被过滤股票权重置0, 其余股票平分该行业的总权重
+        nb_sec_left = total_sec - nb_sec_filtered
+        adj_weight = np.where(nb_sec_left > 0, total_weight / np.maximum(nb_sec_left, 1), 0.0)
+        is_filtered = filter_weight['filters'].values
+        weight = filter_weight['weight'].values
+        adj_weight = np.where(is_filtered == 1, 0.0, np.where(is_filtered == 0, adj_weight, weight))
+        filter_weight['weight'] = np.where(nb_sec_filtered == 0, weight, adj_weight)
+        return filter_weight
 
     @staticmethod
     def _get_quantity(init_ptf_value, weight, price):
-        # concat weight and price
-        ret = pd.concat([weight, price], join_axes=[weight.index], axis=1)
-        ret.loc[ret['weight'] > 0, 'quantity'] = init_ptf_value * ret['weight'] / ret['price']
-        ret.loc[ret['weight'] == 0, 'quantity'] = 0
-        ret['quantity'] = ret['quantity'].apply(int)
-        return ret['quantity']
-
-    def _calc_ptf_value_between_tiaocang_date(self, init_ptf_value, tiaocang_start_date, tiaocang_end_date):
-        # get price date table between tiaoCangDate
-        price_data = self._get_sec_price_between_tiaocang_date(tiaocang_start_date, tiaocang_end_date)
-
-        # get price table at tiaoCangDate
-        price = self._get_sec_price_on_date(price_data, tiaocang_start_date)
-
-        # get quantity series at tiaoCangDate
-        weight = self._get_weight_on_date(tiaocang_start_date)
-        # weight.to_csv('weight.csv', encoding='gbk')
-        quantity = self._get_quantity(init_ptf_value, weight, price)
-
-        # loop over all trade dates to calc ptf value
-        trade_date_list = price_data.index.get_level_values('tradeDate').tolist()
-        ret = pd.Series(index=trade_date_list)
-        ret.loc[trade_date_list[0]] = init_ptf_value
-        for date in trade_date_list[1:]:
-            price = self._get_sec_price_on_date(price_data, date)
-            ret[date] = np.sum(quantity * price)
-
+        """
+        :param init_ptf_value: float, 调仓日组合价值
+        :param weight: np.array, 目标权重
+        :param price: np.array, 调仓日价格
+        :return: np.array, 持仓股数(取整), 权重为0或价格缺失的为0
+        """
+        is_held = (weight > 0) & ~np.isnan(price)
+        ret = np.zeros(len(weight))
+        ret[is_held] = np.trunc(init_ptf_value * weight[is_held] / price[is_held])
         return ret
 
+    def _calc_quantity_matrix(self, price_panel):
+        """
+        :param price_panel: pd.DataFrame, see _get_price_panel
+        :return: scipy.sparse.csr_matrix, shape = [nb tiaocang interval, nb secID], 每个调仓区间的持仓股数
+        各区间的初始价值依赖上一区间结束时的价值, 因此只在区间层面顺序递推, 每步都是向量运算
+        """
+        trade_date = price_panel.index
+        price = price_panel.values
+        start_pos = trade_date.get_indexer(self._tiaoCangDate[:-1])
+        pyFinAssert((start_pos >= 0).all(), ValueError, "price data missing on some tiaoCangDate")
+        end_pos = np.append(start_pos[1:], trade_date.searchsorted(self._tiaoCangDate[-1], side='right') - 1)
+
+        quantity = np.zeros((len(start_pos), price.shape[1]))
+        ptf_value = self._initialCapital
+        for i in range(len(start_pos)):
+            weight = self._get_weight_on_date(self._tiaoCangDate[i])
+            sec_pos = price_panel.columns.get_indexer(weight.index)
+            quantity[i, sec_pos] = self._get_quantity(ptf_value, weight['weight'].values, price[start_pos[i], sec_pos])
+            # 区间结束时的组合价值即为下一区间的初始价值
+            ptf_value = np.nansum(quantity[i] * price[end_pos[i]])
+        return sparse.csr_matrix(quantity)
+
+    def _calc_quantity_matrix_with_prefetch(self):
+        """
+        :return: tuple, (scipy.sparse.csr_matrix, pd.DataFrame), 同_calc_quantity_matrix的持仓股数, 以及拼接后的价格表
+        按调仓区间读取价格, 在计算第i个区间持仓时, 之后的区间价格已在后台线程中读取
+        价格表(交易日 x 所有持仓过的secID)预先分配, 每个区间的价格按位置写入
+        """
+        sec_universe = pd.Index(self._holdings.sec_universe)
+        trade_date = pd.to_datetime(bizDatesList('China.SSE', self._tiaoCangDate[0], self._tiaoCangDate[-1]))
+        panel = np.empty((len(trade_date), len(sec_universe)))
+        panel.fill(np.nan)
+        is_filled = np.zeros(len(trade_date), dtype=bool)
+        quantity = np.zeros((len(self._tiaoCangDate) - 1, len(sec_universe)))
+        ptf_value = self._initialCapital
+        with AsyncMarketDataHandler(self._marketDataHandler, nb_thread=self._prefetchNbThread) as async_handler:
+            prefetcher = PricePrefetcher(async_handler, self._get_interval_price_requests(), self._prefetchLookahead)
+            for i, price in enumerate(prefetcher):
+                price.index = pd.to_datetime(price.index)
+                price = price.sort_index()
+                tiaocang_date = self._tiaoCangDate[i]
+                start_pos = price.index.get_indexer([tiaocang_date])[0]
+                pyFinAssert(start_pos >= 0, ValueError, "price data missing on tiaoCangDate {0}".format(tiaocang_date))
+
+                weight = self._get_weight_on_date(tiaocang_date, Tradability(price, self._filterReturnOnTiaoCangDate))
+                # 数据源缺失的secID价格为NaN, 持仓股数为0
+                interval_price = price.reindex(columns=weight.index).values
+                interval_quantity = self._get_quantity(ptf_value, weight['weight'].values, interval_price[start_pos])
+                quantity[i, sec_universe.get_indexer(weight.index)] = interval_quantity
+                # 区间结束时(下一调仓日)的组合价值即为下一区间的初始价值
+                next_tiaocang_date = self._tiaoCangDate[i + 1]
+                end_pos = price.index.get_indexer([next_tiaocang_date])[0]
+                pyFinAssert(end_pos >= 0, ValueError,
+                            "price data missing on tiaoCangDate {0}".format(next_tiaocang_date))
+                ptf_value = np.nansum(interval_quantity * interval_price[end_pos])
+
+                date_pos = trade_date.get_indexer(price.index[start_pos:])
+                pyFinAssert((date_pos >= 0).all(), ValueError,
+                            "price data of interval {0} contains non trading dates".format(tiaocang_date))
+                # 相邻区间在调仓日重叠, 已写入的(日期, secID)保留先读取的值
+                block_pos = np.ix_(date_pos, sec_universe.get_indexer(price.columns))
+                block = panel[block_pos]
+                panel[block_pos] = np.where(np.isnan(block), price.values[start_pos:], block)
+                is_filled[date_pos] = True
+
+        # 只保留数据源实际返回的交易日
+        price_panel = pd.DataFrame(panel[is_filled], index=trade_date[is_filled], columns=sec_universe)
+        return sparse.csr_matrix(quantity), price_panel
+
     def calc_ptf_value_curve(self):
-        ret = pd.Series()
-        for i in range(len(self._tiaoCangDate) - 1):
-            tiaocang_start_date = self._tiaoCangDate[i]
-            tiaocang_end_date = self._tiaoCangDate[i + 1]
-            init_ptf_value = self._initialCapital if i == 0 else ret.values[-1]
-            ptf_curve = self._calc_ptf_value_between_tiaocang_date(init_ptf_value, tiaocang_start_date,
-                                                                   tiaocang_end_date)
-            ret = pd.concat([ret, ptf_curve], axis=0)
+        if self._prefetchLookahead > 0:
+            quantity, price_panel = self._calc_quantity_matrix_with_prefetch()
+        else:
+            price_panel = self._get_price_panel()
+            price_panel = price_panel.loc[price_panel.index >= self._tiaoCangDate[0]]
+            quantity = self._calc_quantity_matrix(price_panel)
+
+        # 交易日t属于区间i当且仅当 tiaoCangDate[i] < t <= tiaoCangDate[i + 1], 第一个调仓日取初始资金, 之前没有持仓
+        trade_date = price_panel.index
+        bounds = trade_date.searchsorted(self._tiaoCangDate, side='right')
+        price = np.nan_to_num(price_panel.values)
+        ptf_value = np.zeros(len(trade_date))
+        ptf_value[trade_date == self._tiaoCangDate[0]] = self._initialCapital
+        for i in range(len(bounds) - 1):
+            # 区间内价格块只取持仓列, 与持仓股数做一次矩阵乘法
+            interval_quantity = quantity[i]
+            ptf_value[bounds[i]:bounds[i + 1]] = \
+                price[bounds[i]:bounds[i + 1], interval_quantity.indices].dot(interval_quantity.data)
 
         # normalize
-        ret = ret.drop_duplicates()
-        ret = ret / ret[0]
-        ret.index = pd.to_datetime(ret.index)
+        ret = pd.Series(ptf_value / self._initialCapital, index=trade_date)
         return ret
 
-    def evaluate_ptf_return(self):
-        strat_return = self.calc_ptf_value_curve()
-        benchmark_return = WindMarketDataHandler.get_sec_return_on_date(sec_ids=[self._benchmarkSecID],
-                                                                        start_date=strat_return.index.tolist()[0],
-                                                                        end_date=strat_return.index.tolist()[-1],
+    def evaluate_ptf_return(self, need_plot=False):
+        """
+        :param need_plot: bool, optional, 是否交互式显示净值曲线
+        :return: StratReport, 可再调用save_figure/to_html离屏输出
+        """
+        if self._prefetchLookahead > 0:
+            # 基准收益与组合净值无依赖, 在计算净值的同时后台读取
+            with AsyncMarketDataHandler(self._marketDataHandler) as async_handler:
+                benchmark_result = async_handler.get_sec_return_on_date(sec_ids=[self._benchmarkSecID],
+                                                                        start_date=self._tiaoCangDate[0],
+                                                                        end_date=self._tiaoCangDate[-1],
                                                                         is_cumul=True)
+                strat_return = self.calc_ptf_value_curve()
+                benchmark_return = benchmark_result.get()
+        else:
+            strat_return = self.calc_ptf_value_curve()
+            benchmark_return = self._marketDataHandler.get_sec_return_on_date(sec_ids=[self._benchmarkSecID],
+                                                                              start_date=strat_return.index.tolist()[0],
+                                                                              end_date=strat_return.index.tolist()[-1],
+                                                                              is_cumul=True)
         benchmark_return = benchmark_return[self._benchmarkSecID]
         benchmark_return.index = pd.to_datetime(benchmark_return.index)
-        strat_evaluation(return_dict={'stratReturn': [strat_return, ReturnType.Cumul],
-                                      'benchmarkReturn': [benchmark_return, ReturnType.Cumul]},
-                         re_balance_freq=self._rebalanceFreq)
+        report = strat_evaluation(return_dict={'stratReturn': [strat_return, ReturnType.Cumul],
+                                               'benchmarkReturn': [benchmark_return, ReturnType.Cumul]},
+                                  re_balance_freq=self._rebalanceFreq,
+                                  need_plot=need_plot)
 
-        return
+        return report
@@ -1,7 +1,26 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.analyzer.technical.llt import LLT
-from pyAlphaStrat.analyzer.technical.llt import SecurityLLT
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
+
+_lazyAttributes = {
+    'LLT': 'pyAlphaStrat.analyzer.technical.llt',
+    'SecurityLLT': 'pyAlphaStrat.analyzer.technical.llt',
+    'llt_filter': 'pyAlphaStrat.analyzer.technical.lltFilter',
+    'LLTState': 'pyAlphaStrat.analyzer.technical.lltFilter',
+    'VectorizedSecurityLLT': 'pyAlphaStrat.analyzer.technical.lltFilter',
+    'IndicatorSpec': 'pyAlphaStrat.analyzer.technical.indicator',
+    'IndicatorPipeline': 'pyAlphaStrat.analyzer.technical.indicator',
+    'calc_indicators': 'pyAlphaStrat.analyzer.technical.indicator'
+}
 
 __all__ = ['LLT',
-           'SecurityLLT']
\ No newline at end of file
+           'SecurityLLT',
+           'llt_filter',
+           'LLTState',
+           'VectorizedSecurityLLT',
+           'IndicatorSpec',
+           'IndicatorPipeline',
+           'calc_indicators']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+# 技术指标流水线: 一组指标在同一价格矩阵(date x security)上一次计算
+# 收益率/涨跌幅及其窗口和等中间量只计算一次, 供所有窗口和指标复用
+# 窗口类指标的窗口和使用maths.rolling的分块前缀/后缀和, 舍入误差不随序列长度累积, 批量与逐日计算结果逐位相同
+# 递推类指标(llt/ema)的状态存放在数组中, 批量计算按日期循环调用同一个step
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+from pyAlphaStrat.analyzer.technical.lltFilter import LLTState
+from pyAlphaStrat.maths.rolling import _BlockWindowSum
+from pyAlphaStrat.maths.rolling import _block_window_sum
+
+_annualizationFactor = 252
+
+
+def _calc_series(name, price, last_price):
+    """
+    :param name: str, 中间序列名称, price/return/gain/loss
+    :param price: np.array, 当期价格
+    :param last_price: np.array, 上期价格
+    :return: np.array, 当期的中间序列值, 任一价格为NaN时为NaN
+    """
+    if name == 'price':
+        return price
+    elif name == 'return':
+        return price / last_price - 1.0
+    elif name == 'gain':
+        return np.maximum(price - last_price, 0.0)
+    elif name == 'loss':
+        return np.maximum(last_price - price, 0.0)
+    raise ValueError('indicator: unknown intermediate series {0}'.format(name))
+
+
+def _calc_cumul_increment(values, power):
+    """
+    :param values: np.array, 中间序列值, NaN视为缺失
+    :param power: int, 0为非NaN个数, 1为和, 2为平方和
+    :return: np.array, 窗口和的累加量
+    """
+    is_valid = ~np.isnan(values)
+    if power == 0:
+        return is_valid.astype(float)
+    values = np.where(is_valid, values, 0.0)
+    return values if power == 1 else values * values
+
+
+class _BatchSource(object):
+    def __init__(self, price):
+        """
+        :param price: np.array, 2维价格矩阵, 行 = 日期, 列 = 证券
+        :return:
+        中间序列, 累加量及窗口和在首次使用时计算并缓存, 同一价格矩阵上的所有指标共用
+        """
+        self._price = price
+        self._lastPrice = np.vstack([np.full((1, price.shape[1]), np.nan), price[:-1]])
+        self._series = {}
+        self._increment = {}
+        self._windowSum = {}
+
+    def _get_series(self, name):
+        if name not in self._series:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._series[name] = _calc_series(name, self._price, self._lastPrice)
+        return self._series[name]
+
+    def window_sum(self, name, window, power=1):
+        """
+        :param power: int, optional, 0为窗口内非NaN个数, 1为和, 2为平方和
+        :return: np.array, 窗口和, 窗口未满时为NaN
+        """
+        key = (name, power, window)
+        if key not in self._windowSum:
+            if (name, power) not in self._increment:
+                self._increment[(name, power)] = _calc_cumul_increment(self._get_series(name), power)
+            self._windowSum[key] = _block_window_sum(self._increment[(name, power)], window)
+        return self._windowSum[key]
+
+
+class _StreamingSource(object):
+    def __init__(self, nb_sec, requirements):
+        """
+        :param nb_sec: int, 证券数量
+        :param requirements: list of tuple, (中间序列名称, power, window), 需要维护的窗口和
+        :return:
+        """
+        self._lastPrice = np.full(nb_sec, np.nan)
+        self._windowSum = dict((key, _BlockWindowSum(key[2])) for key in set(requirements))
+
+    def update(self, price):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series = dict((name, _calc_series(name, price, self._lastPrice))
+                          for name in set(key[0] for key in self._windowSum))
+        self._lastPrice = price
+        for (name, power, _), window_sum in self._windowSum.items():
+            window_sum.update(_calc_cumul_increment(series[name], power))
+
+    def window_sum(self, name, window, power=1):
+        value = self._windowSum[(name, power, window)].value
+        return np.full(len(self._lastPrice), np.nan) if value is None else value
+
+
+def _calc_ma(source, window):
+    total = source.window_sum('price', window)
+    count = source.window_sum('price', window, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count >= 1, total / count, np.nan)
+
+
+def _calc_volatility(source, window):
+    """
+    年化的收益率样本标准差(ddof=1), 与rollingStat的volatility口径一致
+    """
+    s1 = source.window_sum('return', window)
+    s2 = source.window_sum('return', window, 2)
+    n = source.window_sum('return', window, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.where(n >= 2, np.sqrt(np.maximum((s2 - s1 * s1 / n) / (n - 1), 0.0)), np.nan)
+    return std * np.sqrt(_annualizationFactor)
+
+
+def _calc_rsi(source, window):
+    """
+    窗口内上涨幅度之和 / 涨跌幅度之和 * 100, 窗口内价格无变化时为NaN
+    """
+    gain = source.window_sum('gain', window)
+    loss = source.window_sum('loss', window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(gain + loss > 0, 100.0 * gain / (gain + loss), np.nan)
+
+
+class EMAState(object):
+    def __init__(self, nb_sec=0, alpha=2.0 / 21.0):
+        """
+        :param nb_sec: int, optional, 证券数量
+        :param alpha: float, optional, 平滑系数, ema = alpha * price + (1 - alpha) * 上期ema
+        :return:
+        NaN不改变状态, 每只证券第一个有效价格的ema取价格本身
+        """
+        pyFinAssert(0 < alpha <= 1.0, ValueError, "alpha must be in (0.0, 1.0] however {0} received".format(alpha))
+        self._alpha = alpha
+        self._ema = np.full(nb_sec, np.nan)
+
+    def step(self, price):
+        is_valid = ~np.isnan(price)
+        ema = np.where(np.isnan(self._ema), price, self._alpha * price + (1 - self._alpha) * self._ema)
+        np.copyto(self._ema, ema, where=is_valid)
+        return np.where(is_valid, ema, np.nan)
+
+
+# 窗口类指标: 计算函数及所需的(中间序列, power)
+_windowIndicatorFuncs = {
+    'ma': _calc_ma,
+    'volatility': _calc_volatility,
+    'rsi': _calc_rsi
+}
+
+_windowIndicatorRequirements = {
+    'ma': [('price', 1), ('price', 0)],
+    'volatility': [('return', 1), ('return', 2), ('return', 0)],
+    'rsi': [('gain', 1), ('loss', 1)]
+}
+
+# 递推类指标: 由证券数量和参数构造状态, 状态提供step(price)
+_recursiveIndicatorStates = {
+    'llt': lambda nb_sec, params: LLTState(nb_sec, **params),
+    'ema': lambda nb_sec, params: EMAState(nb_sec, **params)
+}
+
+
+class IndicatorSpec(object):
+    def __init__(self, indicator_type, name=None, **params):
+        """
+        :param indicator_type: str, ma/volatility/rsi(需要参数window), llt(alpha, window), ema(alpha)
+        :param name: str, optional, 输出列名, 默认为类型和参数值拼接, 如ma_20
+        :param params: 指标参数
+        :return:
+        """
+        pyFinAssert(indicator_type in _windowIndicatorFuncs or indicator_type in _recursiveIndicatorStates,
+                    ValueError, "unknown indicator type {0}".format(indicator_type))
+        if indicator_type in _windowIndicatorFuncs:
+            pyFinAssert(sorted(params.keys()) == ['window'], ValueError,
+                        "indicator {0} requires exactly one parameter: window".format(indicator_type))
+            pyFinAssert(params['window'] >= 1, ValueError, "window ({0}) must be positive".format(params['window']))
+        self._type = indicator_type
+        self._params = params
+        self._name = name if name is not None else \
+            '_'.join([indicator_type] + ['{0}'.format(params[k]) for k in sorted(params.keys())])
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def is_recursive(self):
+        return self._type in _recursiveIndicatorStates
+
+    @property
+    def key(self):
+        """
+        :return: tuple, 类型和参数相同的指标只计算一次
+        """
+        return self._type, tuple(sorted(self._params.items()))
+
+
+def _check_specs(specs):
+    specs = list(specs)
+    pyFinAssert(len(specs) > 0, ValueError, "at least one indicator spec is required")
+    names = [spec.name for spec in specs]
+    pyFinAssert(len(set(names)) == len(names), ValueError, "indicator names must be unique")
+    return specs
+
+
+def _create_states(specs, nb_sec):
+    return dict((spec.key, _recursiveIndicatorStates[spec.type](nb_sec, spec.params))
+                for spec in specs if spec.is_recursive)
+
+
+def calc_indicators(prices, specs):
+    """
+    :param prices: pd.DataFrame, index = date, col = secID, values = price
+    :param specs: list of IndicatorSpec
+    :return: pd.DataFrame, index = date, multi col = [indicator, secID]
+    所有递推类指标在同一次日期循环中更新, 窗口类指标共用中间序列的窗口和
+    """
+    specs = _check_specs(specs)
+    price = prices.values.astype(float)
+    results = {}
+
+    states = _create_states(specs, price.shape[1])
+    if states:
+        recursive = dict((key, np.empty(price.shape)) for key in states)
+        for i in range(len(price)):
+            for key, state in states.items():
+                recursive[key][i] = state.step(price[i])
+        results.update(recursive)
+
+    source = _BatchSource(price)
+    for spec in specs:
+        if not spec.is_recursive and spec.key not in results:
+            results[spec.key] = _windowIndicatorFuncs[spec.type](source, spec.params['window'])
+
+    columns = pd.MultiIndex.from_product([[spec.name for spec in specs], prices.columns],
+                                         names=['indicator', prices.columns.name])
+    return pd.DataFrame(np.hstack([results[spec.key] for spec in specs]), index=prices.index, columns=columns)
+
+
+class IndicatorPipeline(object):
+    def __init__(self, specs, sec_ids):
+        """
+        :param specs: list of IndicatorSpec
+        :param sec_ids: list of str, 证券代码, 每次update按此顺序对齐
+        :return:
+        calc_indicators的逐日版本, 每次update对所有证券做一次向量运算, 结果与批量计算逐位相同
+        """
+        self._specs = _check_specs(specs)
+        self._secIDs = pd.Index(sec_ids)
+        self._states = _create_states(self._specs, len(self._secIDs))
+        window_specs = [spec for spec in self._specs if not spec.is_recursive]
+        requirements = [(name, power, spec.params['window']) for spec in window_specs
+                        for name, power in _windowIndicatorRequirements[spec.type]]
+        self._source = _StreamingSource(len(self._secIDs), requirements)
+        self._value = None
+
+    @property
+    def sec_ids(self):
+        return self._secIDs
+
+    @property
+    def value(self):
+        """
+        :return: pd.DataFrame, index = secID, col = indicator, 最近一次update后的指标
+        """
+        return self._value
+
+    def update(self, prices):
+        """
+        :param prices: pd.Series, index = secID, values = 当日价格, 缺失的证券视为NaN
+        :return: pd.DataFrame, index = secID, col = indicator
+        """
+        price = prices.reindex(self._secIDs).values.astype(float)
+        results = dict((key, state.step(price)) for key, state in self._states.items())
+        self._source.update(price)
+        for spec in self._specs:
+            if spec.key not in results:
+                results[spec.key] = _windowIndicatorFuncs[spec.type](self._source, spec.params['window'])
+        self._value = pd.DataFrame(dict((spec.name, results[spec.key]) for spec in self._specs),
+                                   index=self._secIDs, columns=[spec.name for spec in self._specs])
+        return self._value
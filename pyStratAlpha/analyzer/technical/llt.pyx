@@ -2,49 +2,55 @@
 # ref: Github/Finance-Python/PyFin/Analysis/TechnicalAnalysis
 
 
-cimport numpy as np
+import numpy as np
 from math import isnan
 from PyFin.Math.Accumulators.IAccumulators import StatelessSingleValueAccumulator
 from PyFin.Math.Accumulators.impl import Deque
 from PyFin.Analysis.TechnicalAnalysis.StatelessTechnicalAnalysers import SecurityStatelessSingleValueHolder
 from PyFin.Utilities.Asserts import pyFinAssert
+from pyAlphaStrat.analyzer.technical.lltFilter import llt_coefficients
 
 
 
 cdef class LLT(StatelessSingleValueAccumulator):
 
     def __init__(self, window, alpha, dependency='x', method=Deque):
-        pyFinAssert(0 <= alpha <= 1.0, ValueError, "alpha must be between 0.0 and 1.0 however {0} received".format(alpha))
+        pyFinAssert(window >= 3, ValueError, "window must be at least 3 however {0} received".format(window))
         super(LLT, self).__init__(dependency)
+        self._windowSize = window
         self._window = method(window)
         self._alpha = alpha
+        # 系数与批量版本lltFilter.llt_filter共用, 保证两者结果逐位相同
+        self._coef = llt_coefficients(alpha)
         self._llt = Deque(3)
 
     cpdef push(self, data):
         cdef double value = self._push(data)
         cdef double popout
+        cdef double llt
 
         if isnan(value):
             return np.nan
-        popout = self._deque.dump(value)
+        popout = self._window.dump(value)
         if not isnan(popout):
-            underlyingPrice = self._deque.as_list()
-            llt = (self._alpha - self._alpha**2 / 4.0) * underlyingPrice[-1] + (self._alpha^2 / 2 ) * underlyingPrice[-2] - \
-                  (self._alpha - 3 * self._alpha**2 / 4.0) * underlyingPrice[-3] + 2 * (1 - self._alpha) * self._llt[2] -\
-                  (1 - self._alpha)**2 * self._llt[1]
-            self._llt.push(llt)
+            underlyingPrice = self._window.as_list()
+            c0, c1, c2, d1, d2 = self._coef
+            llt = c0 * underlyingPrice[-1] + c1 * underlyingPrice[-2] - c2 * underlyingPrice[-3] + \
+                d1 * self._llt[2] - d2 * self._llt[1]
         else:
-            self._llt.push(value)
+            llt = value
+        self._llt.dump(llt)
+        return llt
 
     def result(self):
-        return self._llt.as_list[-1]
+        return self._llt.as_list()[-1]
 
     def __deepcopy__(self, memo):
-        return LLT(self._window, self._dependency, self._alpha)
+        return LLT(self._windowSize, self._alpha, self._dependency)
 
     def __reduce__(self):
         d = {}
-        return LLT, (self._window, self._dependency, self._alpha), d
+        return LLT, (self._windowSize, self._alpha, self._dependency), d
 
     def __setstate__(self, state):
         pass
@@ -59,16 +65,16 @@ cdef class SecurityLLT(SecurityStatelessSingleValueHolder):
 
     def __deepcopy__(self, memo):
         if self._compHolder:
-            return SecurityLLT(self._holderTemplate._window, self._holderTemplate._alpha, self._compHolder)
+            return SecurityLLT(self._holderTemplate._windowSize, self._holderTemplate._alpha, self._compHolder)
         else:
-            return SecurityLLT(self._holderTemplate._window, self._holderTemplate._alpha, self._dependency)
+            return SecurityLLT(self._holderTemplate._windowSize, self._holderTemplate._alpha, self._dependency)
 
     def __reduce__(self):
         d = {}
         if self._compHolder:
-            return SecurityLLT, (self._holderTemplate._window, self._holderTemplate._alpha, self._compHolder), d
+            return SecurityLLT, (self._holderTemplate._windowSize, self._holderTemplate._alpha, self._compHolder), d
         else:
-            return SecurityLLT, (self._holderTemplate._window, self._holderTemplate._alpha, self._dependency), d
+            return SecurityLLT, (self._holderTemplate._windowSize, self._holderTemplate._alpha, self._dependency), d
 
     def __setstate__(self, state):
         pass
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+# LLT(低延迟趋势线)的向量化计算: 批量模式对 date x security 的价格矩阵沿时间轴做二阶IIR滤波,
+# 逐日模式把全部证券的滤波状态存放在连续数组(LLTState)中, 每日一次向量运算
+# llt[t] = c0 * p[t] + c1 * p[t-1] - c2 * p[t-2] + d1 * llt[t-1] - d2 * llt[t-2]
+# 与llt.pyx中的流式LLT口径一致: NaN不改变状态, 每只证券前window个有效价格的llt取价格本身
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+
+def llt_coefficients(alpha):
+    """
+    :param alpha: float, 平滑系数, 0 <= alpha <= 1
+    :return: tuple, (c0, c1, c2, d1, d2), LLT递推式的系数, 流式与批量计算共用以保证结果逐位相同
+    """
+    pyFinAssert(0 <= alpha <= 1.0, ValueError, "alpha must be between 0.0 and 1.0 however {0} received".format(alpha))
+    return (alpha - alpha ** 2 / 4.0,
+            alpha ** 2 / 2.0,
+            alpha - 3 * alpha ** 2 / 4.0,
+            2 * (1 - alpha),
+            (1 - alpha) ** 2)
+
+
+class LLTState(object):
+    def __init__(self, nb_sec=0, window=3, alpha=2.0 / 61.0):
+        """
+        :param nb_sec: int, optional, 证券数量, 之后可用resize扩充
+        :param window: int, optional, 预热期长度, 每只证券前window个有效价格不做滤波, 需不小于3
+        :param alpha: float, optional, 平滑系数
+        :return:
+        所有证券的滤波状态存放在连续数组中, 第i列对应第i只证券
+        """
+        pyFinAssert(window >= 3, ValueError, "window must be at least 3 however {0} received".format(window))
+        self._window = window
+        self._alpha = alpha
+        self._coef = llt_coefficients(alpha)
+        self._nbValid = np.zeros(nb_sec, dtype=int)
+        # 第0行为t-1期, 第1行为t-2期
+        self._price = np.full((2, nb_sec), np.nan)
+        self._llt = np.full((2, nb_sec), np.nan)
+
+    @property
+    def nb_sec(self):
+        return len(self._nbValid)
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @property
+    def value(self):
+        """
+        :return: np.array, 每只证券最近一个有效价格对应的llt, 尚无有效价格时为NaN
+        """
+        return self._llt[0].copy()
+
+    def resize(self, nb_sec):
+        """
+        :param nb_sec: int, 新的证券数量, 新增证券的状态为空
+        :return:
+        """
+        nb_new = nb_sec - self.nb_sec
+        pyFinAssert(nb_new >= 0, ValueError, "cannot shrink llt state from {0} to {1}".format(self.nb_sec, nb_sec))
+        self._nbValid = np.append(self._nbValid, np.zeros(nb_new, dtype=int))
+        self._price = np.hstack([self._price, np.full((2, nb_new), np.nan)])
+        self._llt = np.hstack([self._llt, np.full((2, nb_new), np.nan)])
+
+    def step(self, price):
+        """
+        :param price: np.array, 长度为nb_sec, 当期价格, NaN表示该证券本期无数据
+        :return: np.array, 当期llt, price为NaN处为NaN且该证券状态不变
+        运算顺序与流式LLT.push相同
+        """
+        c0, c1, c2, d1, d2 = self._coef
+        is_valid = ~np.isnan(price)
+        self._nbValid += is_valid
+        llt = c0 * price + c1 * self._price[0] - c2 * self._price[1] + d1 * self._llt[0] - d2 * self._llt[1]
+        llt = np.where(self._nbValid > self._window, llt, price)
+        np.copyto(self._price[1], self._price[0], where=is_valid)
+        np.copyto(self._price[0], price, where=is_valid)
+        np.copyto(self._llt[1], self._llt[0], where=is_valid)
+        np.copyto(self._llt[0], llt, where=is_valid)
+        return llt
+
+    def __getstate__(self):
+        return {'window': self._window,
+                'alpha': self._alpha,
+                'nbValid': self._nbValid,
+                'price': self._price,
+                'llt': self._llt}
+
+    def __setstate__(self, state):
+        self._window = state['window']
+        self._alpha = state['alpha']
+        self._coef = llt_coefficients(self._alpha)
+        self._nbValid = state['nbValid']
+        self._price = state['price']
+        self._llt = state['llt']
+
+
+def llt_filter(prices, window=3, alpha=2.0 / 61.0):
+    """
+    :param prices: pd.DataFrame/pd.Series/np.array, index = date, col = secID, values = price
+    :param window: int, optional, 预热期长度, 每只证券前window个有效价格不做滤波, 需不小于3
+    :param alpha: float, optional, 平滑系数
+    :return: 与prices同形状, values = llt, prices为NaN处结果为NaN
+    按日期循环, 每步对所有证券做一次向量运算
+    """
+    values = np.asarray(prices, dtype=float)
+    is_vector = values.ndim == 1
+    if is_vector:
+        values = values[:, None]
+
+    nb_date, nb_sec = values.shape
+    state = LLTState(nb_sec, window, alpha)
+    ret = np.empty((nb_date, nb_sec))
+    for i in range(nb_date):
+        ret[i] = state.step(values[i])
+
+    if is_vector:
+        ret = ret[:, 0]
+    if isinstance(prices, pd.DataFrame):
+        return pd.DataFrame(ret, index=prices.index, columns=prices.columns)
+    elif isinstance(prices, pd.Series):
+        return pd.Series(ret, index=prices.index, name=prices.name)
+    return ret
+
+
+class VectorizedSecurityLLT(object):
+    def __init__(self, window=3, alpha=2.0 / 61.0, dependency='x'):
+        """
+        :param window: int, optional, 预热期长度
+        :param alpha: float, optional, 平滑系数
+        :param dependency: str, optional, push的数据为dict of dict时取用的字段名
+        :return:
+        SecurityLLT的数组版本: 所有证券的状态存放在一个LLTState中, 按证券代码索引, 每次push只做一次向量运算
+        """
+        self._dependency = dependency
+        self._secIDs = pd.Index([])
+        self._state = LLTState(0, window, alpha)
+
+    @property
+    def sec_ids(self):
+        return self._secIDs
+
+    @property
+    def value(self):
+        """
+        :return: pd.Series, index = secID, values = 每只证券最近一次的llt
+        """
+        return pd.Series(self._state.value, index=self._secIDs)
+
+    def __getitem__(self, sec_id):
+        return self._state.value[self._secIDs.get_loc(sec_id)]
+
+    def push(self, data):
+        """
+        :param data: pd.Series index = secID / dict, secID: price 或 secID: {dependency: price}
+        :return: pd.Series, index = secID, values = 当期llt, 本期未出现或价格为NaN的证券为NaN
+        """
+        if isinstance(data, pd.Series):
+            sec_ids = data.index
+            values = data.values.astype(float)
+        else:
+            sec_ids = pd.Index(list(data.keys()))
+            values = np.array([v[self._dependency] if isinstance(v, dict) else v for v in data.values()], dtype=float)
+
+        loc = self._secIDs.get_indexer(sec_ids)
+        is_new = loc < 0
+        if is_new.any():
+            self._secIDs = self._secIDs.append(sec_ids[is_new])
+            self._state.resize(len(self._secIDs))
+            loc[is_new] = np.arange(len(self._secIDs) - is_new.sum(), len(self._secIDs))
+
+        price = np.full(len(self._secIDs), np.nan)
+        price[loc] = values
+        return pd.Series(self._state.step(price), index=self._secIDs)
+
+    def __getstate__(self):
+        return {'dependency': self._dependency,
+                'secIDs': list(self._secIDs),
+                'state': self._state.__getstate__()}
+
+    def __setstate__(self, state):
+        self._dependency = state['dependency']
+        self._secIDs = pd.Index(state['secIDs'])
+        self._state = LLTState.__new__(LLTState)
+        self._state.__setstate__(state['state'])
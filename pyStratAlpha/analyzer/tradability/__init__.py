@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
+
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
+
+_lazyAttributes = {
+    'Tradability': 'pyAlphaStrat.analyzer.tradability.tradability'
+}
+
+__all__ = ['Tradability']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+
+def _shift(values, n):
+    """
+    :param values: np.array, 2-d, index = tradeDate
+    :param n: int, 向后平移的行数
+    :return: np.array, 第t行为原数组第t-n行, 前n行为NaN
+    """
+    ret = np.empty(values.shape)
+    ret.fill(np.nan)
+    ret[n:] = values[:-n]
+    return ret
+
+
+class Tradability(object):
+    def __init__(self, price, filter_return_on_tiaocang_date=0.09):
+        """
+        :param price: pd.DataFrame, index = tradeDate, col = secID, 需覆盖第一个调仓日之前至少两个交易日
+        :param filter_return_on_tiaocang_date: float, 调仓日涨幅超过该阈值的股票视为买不到
+        :return:
+        一次性在整张价格表上计算调仓日过滤条件, 前一/前两个交易日取价格表中的上一/上两行
+        """
+        price = price.sort_index()
+        price_prev = _shift(price.values, 1)
+        price_prev2 = _shift(price.values, 2)
+
+        # 去除涨幅过大可能买不到的
+        with np.errstate(invalid='ignore'):
+            return_filter = price.values / price_prev > 1 + filter_return_on_tiaocang_date
+        # 去除有NaN的， 新股
+        ipo_filter = np.isnan(price.values * price_prev * price_prev2)
+        # 去除停牌的，此处判断标准就是连续三天收盘价格一样
+        tingpai_filter = (price.values == price_prev) & (price_prev == price_prev2)
+
+        self._tradeDate = price.index
+        self._secID = price.columns
+        self._returnFilter = return_filter
+        self._ipoFilter = ipo_filter
+        self._tingpaiFilter = tingpai_filter
+        self._filters = (return_filter | ipo_filter | tingpai_filter).astype(int)
+
+    @property
+    def return_filter(self):
+        return pd.DataFrame(self._returnFilter, index=self._tradeDate, columns=self._secID)
+
+    @property
+    def ipo_filter(self):
+        return pd.DataFrame(self._ipoFilter, index=self._tradeDate, columns=self._secID)
+
+    @property
+    def tingpai_filter(self):
+        return pd.DataFrame(self._tingpaiFilter, index=self._tradeDate, columns=self._secID)
+
+    @property
+    def filters(self):
+        """
+        :return: pd.DataFrame, index = tradeDate, col = secID, value = 1(不可交易)/0(可交易)
+        """
+        return pd.DataFrame(self._filters, index=self._tradeDate, columns=self._secID)
+
+    def get_filter_on_date(self, date, sec_ids):
+        """
+        :param date: datetime, 调仓日
+        :param sec_ids: list of str, sec IDs
+        :return: pd.Series, index = sec_id, value = 1(过滤)/0(保留), 价格表中没有的股票为NaN
+        """
+        date_pos = self._tradeDate.get_indexer([date])[0]
+        pyFinAssert(date_pos >= 0, ValueError, "date {0} not found in price data".format(date))
+        ret = pd.Series(self._filters[date_pos], index=self._secID, name='filters').reindex(sec_ids)
+        ret.index.name = 'sec_id'
+        return ret
+
+    def get_filter(self, date, sec_ids):
+        """
+        :param date: list/np.array/pd.DatetimeIndex, 日期
+        :param sec_ids: list/np.array, 与date一一对应的sec ID
+        :return: np.array, 对应的过滤标志, 找不到的(日期, secID)为NaN
+        """
+        date_pos = self._tradeDate.get_indexer(pd.DatetimeIndex(date))
+        sec_pos = self._secID.get_indexer(np.asarray(sec_ids))
+        is_found = (date_pos >= 0) & (sec_pos >= 0)
+        ret = np.empty(len(date_pos))
+        ret.fill(np.nan)
+        ret[is_found] = self._filters[date_pos[is_found], sec_pos[is_found]]
+        return ret
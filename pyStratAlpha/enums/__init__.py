@@ -8,6 +8,7 @@ from pyAlphaStrat.enums.factor import DCAMFactorType
 from pyAlphaStrat.enums.factor import FactorWeightType
 from pyAlphaStrat.enums.factor import FactorICSign
 from pyAlphaStrat.enums.freq import FreqType
+from pyAlphaStrat.enums.freq import DataFreqType
 
 
 __all__ = ['DataSource',
@@ -17,4 +18,5 @@ __all__ = ['DataSource',
            'DCAMFactorType',
            'FactorICSign',
            'FreqType',
+           'DataFreqType',
            'FactorWeightType']
\ No newline at end of file
@@ -9,3 +9,5 @@ from enum import unique
 class DataSource(IntEnum):
     CSV = 0
     WIND = 1
+    TUSHARE = 2
+    LOCAL = 3
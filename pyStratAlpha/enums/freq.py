@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from enum import Enum
+from enum import IntEnum
 from enum import unique
 
 
@@ -19,3 +20,13 @@ class FreqType(StrEnum):
     EOQ = 'Q'
     EOSY = 'S'
     EOY = 'Y'
+
+
+@unique
+class DataFreqType(IntEnum):
+    """
+    行情数据源查询的K线频率, 与调仓/统计频率FreqType区分
+    """
+    MIN5 = 5
+    HOUR = 60
+    EOD = 0
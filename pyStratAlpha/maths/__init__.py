@@ -1,9 +1,44 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.maths.matrix import eig_val_pct
-from pyAlphaStrat.maths.matrix import pca_decomp
-from pyAlphaStrat.maths.stats import running_sum
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
+
+_lazyAttributes = {
+    'eig_val_pct': 'pyAlphaStrat.maths.matrix',
+    'pca_decomp': 'pyAlphaStrat.maths.matrix',
+    'randomized_svd': 'pyAlphaStrat.maths.matrix',
+    'IncrementalPCA': 'pyAlphaStrat.maths.matrix',
+    'running_sum': 'pyAlphaStrat.maths.stats',
+    'rolling_sum': 'pyAlphaStrat.maths.rolling',
+    'rolling_count': 'pyAlphaStrat.maths.rolling',
+    'rolling_mean': 'pyAlphaStrat.maths.rolling',
+    'rolling_std': 'pyAlphaStrat.maths.rolling',
+    'rolling_zscore': 'pyAlphaStrat.maths.rolling',
+    'rolling_rank': 'pyAlphaStrat.maths.rolling',
+    'rolling_max': 'pyAlphaStrat.maths.rolling',
+    'rolling_min': 'pyAlphaStrat.maths.rolling',
+    'RollingMoments': 'pyAlphaStrat.maths.rolling',
+    'RollingRank': 'pyAlphaStrat.maths.rolling',
+    'RollingMax': 'pyAlphaStrat.maths.rolling',
+    'RollingMin': 'pyAlphaStrat.maths.rolling'
+}
 
 __all__ = ['eig_val_pct',
            'pca_decomp',
-           'running_sum']
\ No newline at end of file
+           'randomized_svd',
+           'IncrementalPCA',
+           'running_sum',
+           'rolling_sum',
+           'rolling_count',
+           'rolling_mean',
+           'rolling_std',
+           'rolling_zscore',
+           'rolling_rank',
+           'rolling_max',
+           'rolling_min',
+           'RollingMoments',
+           'RollingRank',
+           'RollingMax',
+           'RollingMin']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
@@ -1,5 +1,7 @@
 # coding=utf-8
 
+from collections import deque
+
 import numpy as np
 from PyFin.Utilities import pyFinAssert
 
@@ -11,34 +13,160 @@ def eig_val_pct(eig_values, pct):
     :return: 给定百分比阈值,返回需要降低到多少维度
     """
     pyFinAssert(0.0 <= pct <= 1.0, ValueError, "pct ({0:f}) must be between 0.0 and 1.0".format(pct))
-    sort_eig_values = np.sort(eig_values)
-    sort_eig_values = sort_eig_values[-1::-1]  # 特征值从大到小排列
-    eig_values_sum = sum(sort_eig_values)
-    cum_sum = sort_eig_values.cumsum()
-    marginal_eig_val = next(x for x in cum_sum if x / eig_values_sum >= pct)
-    index = np.where(cum_sum == marginal_eig_val)[0][0]
-    return index + 1
+    sort_eig_values = np.sort(np.asarray(eig_values, dtype=float))[::-1]  # 特征值从大到小排列
+    cum_pct = np.cumsum(sort_eig_values) / np.sum(sort_eig_values)
+    # 第一个累计占比不小于pct的位置
+    index = int(np.searchsorted(cum_pct, pct, side='left'))
+    return min(index + 1, len(sort_eig_values))
 
 
-def pca_decomp(data_mat, pct=0.9):
+def _cov_eigh(cov_mat):
     """
-    :param data_mat: np.maths, 数据矩阵, 列向量为特征向量
-    :param pct: 阈值, 降维后需要达到的方差占比
-    :return: 降维后的数据集, 和 重构数据
+    :param cov_mat: np.array, 对称的协方差矩阵
+    :return: tuple, (特征值, 特征向量), 按特征值从大到小排列
+    """
+    eig_values, eig_vectors = np.linalg.eigh(cov_mat)
+    return eig_values[::-1], eig_vectors[:, ::-1]
+
+
+def randomized_svd(mat, k, nb_oversample=10, nb_iter=2, random_state=None):
     """
+    :param mat: np.array, 待分解矩阵
+    :param k: int, 需要的奇异值个数
+    :param nb_oversample: int, optional, 随机投影多取的维度, 提高精度
+    :param nb_iter: int, optional, 幂迭代次数, 奇异值衰减较慢时可适当增加
+    :param random_state: int, optional, 随机种子
+    :return: tuple, (u, s, vt), 前k个奇异值及对应的左右奇异向量
+    ref: Halko, Martinsson and Tropp (2011), Finding structure with randomness
+    """
+    pyFinAssert(1 <= k <= min(mat.shape), ValueError, "k ({0}) must be between 1 and {1}".format(k, min(mat.shape)))
+    rng = np.random.RandomState(random_state)
+    nb_proj = min(k + nb_oversample, min(mat.shape))
+    q, _ = np.linalg.qr(mat.dot(rng.normal(size=(mat.shape[1], nb_proj))))
+    for _ in range(nb_iter):
+        q, _ = np.linalg.qr(mat.T.dot(q))
+        q, _ = np.linalg.qr(mat.dot(q))
+    u, s, vt = np.linalg.svd(q.T.dot(mat), full_matrices=False)
+    return q.dot(u[:, :k]), s[:k], vt[:k]
+
 
+def pca_decomp(data_mat, pct=0.9, k=None, method='eigh', reconstruct=True, random_state=None):
+    """
+    :param data_mat: np.array, 数据矩阵, 行为样本(如日期), 列为特征
+    :param pct: 阈值, 降维后需要达到的方差占比, 给定k时忽略
+    :param k: int, optional, 主成分个数
+    :param method: str, optional, 'eigh'为协方差矩阵的对称特征分解;
+                   'svd'为随机截断SVD, 只计算前k个主成分, 需要给定k, 适用于特征数较多而只需少数主成分的情形
+    :param reconstruct: bool, optional, 是否计算重构数据, False时重构数据返回None
+    :param random_state: int, optional, method='svd'时的随机种子
+    :return: 降维后的数据集, 和 重构数据
+    """
+    data_mat = np.asarray(data_mat, dtype=float)
     mean_values = np.mean(data_mat, axis=0)  # 对每一列求均值
     mean_removed = data_mat - mean_values
-    cov_mat = np.cov(mean_removed, rowvar=0)
-    eig_values, eig_vectors = np.linalg.eig(np.mat(cov_mat))
-    k = eig_val_pct(eig_values, pct)
-    eig_val_ind = np.argsort(eig_values)
-    eig_val_ind = eig_val_ind[:-(k + 1):-1]
-    red_eig_vectors = eig_vectors[:, eig_val_ind]  # 返回排序后特征值对应的特征向量redEigVects（主成分）
-    low_d_data_mat = mean_removed * red_eig_vectors  # 将原始数据投影到主成分上得到新的低维数据lowDDataMat
-    recon_mat = low_d_data_mat * red_eig_vectors.T + mean_values  # 得到重构数据reconMat
+    if method == 'eigh':
+        cov_mat = mean_removed.T.dot(mean_removed) / (len(mean_removed) - 1)
+        eig_values, eig_vectors = _cov_eigh(cov_mat)
+        k = eig_val_pct(eig_values, pct) if k is None else k
+        red_eig_vectors = eig_vectors[:, :k]  # 前k个特征值对应的特征向量（主成分）
+    elif method == 'svd':
+        pyFinAssert(k is not None, ValueError, "k is required for truncated svd")
+        _, _, vt = randomized_svd(mean_removed, k, random_state=random_state)
+        red_eig_vectors = vt.T
+    else:
+        raise ValueError('pca_decomp: unknown method {0}'.format(method))
+    low_d_data_mat = mean_removed.dot(red_eig_vectors)  # 将原始数据投影到主成分上得到新的低维数据lowDDataMat
+    recon_mat = low_d_data_mat.dot(red_eig_vectors.T) + mean_values if reconstruct else None  # 得到重构数据reconMat
     return low_d_data_mat, recon_mat
 
 
+class IncrementalPCA(object):
+    def __init__(self, nb_feature, k=None, pct=0.9, window=None):
+        """
+        :param nb_feature: int, 特征数(数据矩阵的列数)
+        :param k: int, optional, 主成分个数, 为None时由pct决定
+        :param pct: float, optional, 阈值, 降维后需要达到的方差占比
+        :param window: int, optional, 滚动窗口长度(样本数), None表示使用全部历史样本
+        :return:
+        维护样本的一阶和与二阶矩(p x p), 新日期到来时每行O(p^2)更新, 主成分在需要时由协方差矩阵做一次eigh得到
+        """
+        pyFinAssert(window is None or window >= 2, ValueError, "window ({0}) must be at least 2".format(window))
+        self._nbFeature = nb_feature
+        self._k = k
+        self._pct = pct
+        self._window = window
+        self._rows = deque()
+        self._nbObs = 0
+        # 以第一个样本为平移量累加, 减小二阶矩相减时的精度损失
+        self._shift = None
+        self._sum = np.zeros(nb_feature)
+        self._sqSum = np.zeros((nb_feature, nb_feature))
+        self._decomp = None
+
+    @property
+    def nb_obs(self):
+        return self._nbObs
+
+    def update(self, data_mat):
+        """
+        :param data_mat: np.array, 新到样本, 1维(一个日期)或2维(行为日期)
+        :return: self
+        """
+        data_mat = np.atleast_2d(np.asarray(data_mat, dtype=float))
+        pyFinAssert(data_mat.shape[1] == self._nbFeature, ValueError,
+                    "expected {0} features however {1} received".format(self._nbFeature, data_mat.shape[1]))
+        if self._shift is None:
+            self._shift = data_mat[0].copy()
+        shifted = data_mat - self._shift
+        self._sum += shifted.sum(axis=0)
+        self._sqSum += shifted.T.dot(shifted)
+        self._nbObs += len(shifted)
+        if self._window is not None:
+            self._rows.extend(shifted)
+            while len(self._rows) > self._window:
+                row = self._rows.popleft()
+                self._sum -= row
+                self._sqSum -= np.outer(row, row)
+                self._nbObs -= 1
+        self._decomp = None
+        return self
+
+    def _decompose(self):
+        if self._decomp is None:
+            pyFinAssert(self._nbObs >= 2, ValueError, "at least 2 observations are required")
+            mean = self._sum / self._nbObs
+            cov_mat = (self._sqSum - self._nbObs * np.outer(mean, mean)) / (self._nbObs - 1)
+            eig_values, eig_vectors = _cov_eigh(cov_mat)
+            k = eig_val_pct(eig_values, self._pct) if self._k is None else self._k
+            self._decomp = (self._shift + mean, eig_values[:k], eig_vectors[:, :k])
+        return self._decomp
+
+    @property
+    def mean(self):
+        return self._decompose()[0]
+
+    @property
+    def explained_variance(self):
+        return self._decompose()[1]
+
+    @property
+    def components(self):
+        """
+        :return: np.array, nb_feature x k, 每列为一个主成分, 按方差从大到小排列
+        """
+        return self._decompose()[2]
+
+    def transform(self, data_mat, reconstruct=False):
+        """
+        :param data_mat: np.array, 数据矩阵, 行为样本
+        :param reconstruct: bool, optional, 是否计算重构数据
+        :return: 降维后的数据集, 和 重构数据(reconstruct为False时为None)
+        """
+        mean_values, _, red_eig_vectors = self._decompose()
+        low_d_data_mat = (np.asarray(data_mat, dtype=float) - mean_values).dot(red_eig_vectors)
+        recon_mat = low_d_data_mat.dot(red_eig_vectors.T) + mean_values if reconstruct else None
+        return low_d_data_mat, recon_mat
+
+
 if __name__ == "__main__":
     eig_val_pct([1, 2, 3], 0.9)
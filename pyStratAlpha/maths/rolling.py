@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+
+# 滚动窗口核函数: 批量版本对 date x security 的2维数组沿时间轴一次计算, 流式版本每次输入一行(一个日期)
+# 约定: NaN计入窗口长度但不参与计算, 窗口未满时结果为NaN
+# 和/均值/标准差: 以window行为一块, 块内重新从0累加, 窗口和 = 前一块的后缀和 + 当前块的前缀和,
+# 舍入误差只与窗口长度有关, 不随序列长度累积; 批量(np.cumsum)与流式(逐行累加)的浮点运算顺序相同;
+# 最大/最小值与排名不涉及舍入, 因此两种模式的结果逐位相同
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+
+def _to_2d(x):
+    """
+    :param x: np.array/pd.Series/pd.DataFrame, 1维或2维, 行 = 日期
+    :return: tuple, (2维float数组, 将2维结果还原为输入类型的函数)
+    """
+    values = np.asarray(x, dtype=float)
+    is_vector = values.ndim == 1
+    if is_vector:
+        values = values[:, None]
+
+    def wrap(ret):
+        if is_vector:
+            ret = ret[:, 0]
+        if isinstance(x, pd.DataFrame):
+            return pd.DataFrame(ret, index=x.index, columns=x.columns)
+        elif isinstance(x, pd.Series):
+            return pd.Series(ret, index=x.index, name=x.name)
+        return ret
+
+    return values, wrap
+
+
+def _check_window(window):
+    pyFinAssert(window >= 1, ValueError, "window ({0}) must be positive".format(window))
+
+
+def _cumul_increments(values):
+    """
+    :return: tuple, (x, x^2, 非NaN个数)的累加量, NaN处为0
+    """
+    is_valid = ~np.isnan(values)
+    values = np.where(is_valid, values, 0.0)
+    return values, values * values, is_valid.astype(float)
+
+
+def _moments_from_sums(s1, s2, n):
+    """
+    :return: tuple, (均值, 样本标准差(ddof=1)), 非NaN个数不足时为NaN
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n >= 1, s1 / n, np.nan)
+        std = np.where(n >= 2, np.sqrt(np.maximum((s2 - s1 * s1 / n) / (n - 1), 0.0)), np.nan)
+    return mean, std
+
+
+def _zscore(values, mean, std):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(std > 0, (values - mean) / std, np.nan)
+
+
+def _as_output(value):
+    """
+    :return: 流式版本输入标量时返回标量, 否则返回np.array
+    """
+    return value[()] if np.ndim(value) == 0 else value
+
+
+def _block_window_sum(increment, window):
+    """
+    :param increment: 2维np.array, 行 = 日期, 累加量
+    :param window: int, 窗口长度, 同时为分块长度
+    :return: 2维np.array, 窗口和, 窗口未满的行为NaN
+    窗口[i - window + 1, i]至多跨两块: 前一块从窗口起点开始的后缀和 + 当前块到i为止的前缀和;
+    窗口起点恰为块首时窗口即为整块, 等于当前块的前缀和
+    """
+    nb_date, nb_sec = increment.shape
+    ret = np.full(increment.shape, np.nan)
+    if nb_date < window:
+        return ret
+    nb_pad = -nb_date % window
+    blocks = np.vstack([increment, np.zeros((nb_pad, nb_sec))]).reshape(-1, window, nb_sec)
+    prefix = np.cumsum(blocks, axis=1).reshape(-1, nb_sec)[window - 1:nb_date]
+    suffix = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, nb_sec)[:nb_date - window + 1]
+    is_block_start = (np.arange(nb_date - window + 1) % window == 0)[:, None]
+    ret[window - 1:] = np.where(is_block_start, prefix, prefix + suffix)
+    return ret
+
+
+def _window_sums(values, window, need_sq_sum=True):
+    """
+    :param need_sq_sum: bool, optional, 是否计算平方和, 不需要时返回None
+    :return: tuple of 2维np.array, (和, 平方和, 非NaN个数), 窗口未满的行为NaN
+    """
+    s1, s2, n = _cumul_increments(values)
+    return [_block_window_sum(s1, window), _block_window_sum(s2, window) if need_sq_sum else None,
+            _block_window_sum(n, window)]
+
+
+def rolling_sum(x, window):
+    """
+    :param x: np.array/pd.DataFrame, 1维或2维, 行 = 日期, NaN视为缺失
+    :param window: int, 窗口长度
+    :return: 与x同形状, 窗口内非NaN值之和
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    return wrap(_window_sums(values, window, False)[0])
+
+
+def rolling_count(x, window):
+    """
+    :return: 与x同形状, 窗口内非NaN个数
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    return wrap(_window_sums(values, window, False)[2])
+
+
+def rolling_mean(x, window):
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    s1, _, n = _window_sums(values, window, False)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return wrap(np.where(n >= 1, s1 / n, np.nan))
+
+
+def rolling_std(x, window):
+    """
+    :return: 与x同形状, 窗口内样本标准差(ddof=1)
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    s1, s2, n = _window_sums(values, window)
+    return wrap(_moments_from_sums(s1, s2, n)[1])
+
+
+def rolling_zscore(x, window):
+    """
+    :return: 与x同形状, (当期值 - 窗口均值) / 窗口标准差, 标准差为0或NaN时为NaN
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    mean, std = _moments_from_sums(*_window_sums(values, window))
+    return wrap(_zscore(values, mean, std))
+
+
+def _rank_in_window(window_rows, current):
+    """
+    :param window_rows: list of np.array, 窗口内的各行(含当期)
+    :param current: np.array, 当期值
+    :return: tuple, (当期值在窗口内的平均排名(从1开始), 窗口内非NaN个数)
+    """
+    nb_less = np.zeros(current.shape)
+    nb_equal = np.zeros(current.shape)
+    nb_valid = np.zeros(current.shape)
+    for row in window_rows:
+        nb_less += row < current
+        nb_equal += row == current
+        nb_valid += ~np.isnan(row)
+    rank = np.where(np.isnan(current), np.nan, nb_less + (nb_equal + 1.0) / 2.0)
+    return rank, nb_valid
+
+
+def rolling_rank(x, window, pct=False):
+    """
+    :param x: np.array/pd.DataFrame, 1维或2维, 行 = 日期, NaN视为缺失
+    :param window: int, 窗口长度
+    :param pct: bool, optional, 是否返回百分位排名(排名 / 窗口内非NaN个数)
+    :return: 与x同形状, 当期值在窗口内的排名, 相同值取平均排名, 当期值为NaN时为NaN
+    对窗口内的每个位置做一次错位比较, 共window次向量运算
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    ret = np.full(values.shape, np.nan)
+    nb_date = len(values)
+    if nb_date >= window:
+        current = values[window - 1:]
+        rank, nb_valid = _rank_in_window([values[i:nb_date - window + 1 + i] for i in range(window)], current)
+        ret[window - 1:] = rank / nb_valid if pct else rank
+    return wrap(ret)
+
+
+def _rolling_extremum(x, window, func):
+    """
+    :param func: np.fmax/np.fmin, 忽略NaN的最大/最小
+    分块前缀/后缀极值(van Herk/Gil-Werman): 窗口[i, i + window)的极值 = func(后缀[i], 前缀[i + window - 1])
+    """
+    _check_window(window)
+    values, wrap = _to_2d(x)
+    nb_date, nb_sec = values.shape
+    ret = np.full(values.shape, np.nan)
+    if nb_date >= window:
+        nb_pad = -nb_date % window
+        blocks = np.vstack([values, np.full((nb_pad, nb_sec), np.nan)]).reshape(-1, window, nb_sec)
+        prefix = func.accumulate(blocks, axis=1).reshape(-1, nb_sec)
+        suffix = func.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, nb_sec)
+        ret[window - 1:] = func(suffix[:nb_date - window + 1], prefix[window - 1:nb_date])
+    return wrap(ret)
+
+
+def rolling_max(x, window):
+    """
+    :return: 与x同形状, 窗口内最大值, 窗口内全为NaN时为NaN
+    """
+    return _rolling_extremum(x, window, np.fmax)
+
+
+def rolling_min(x, window):
+    """
+    :return: 与x同形状, 窗口内最小值, 窗口内全为NaN时为NaN
+    """
+    return _rolling_extremum(x, window, np.fmin)
+
+
+class _BlockWindowSum(object):
+    def __init__(self, window):
+        """
+        :param window: int, 窗口长度, 同时为分块长度
+        :return:
+        _block_window_sum的流式版本: 维护当前块的前缀和; 一块结束时由块内各行算出其后缀和, 供下一块使用
+        """
+        self._window = window
+        self._nbObs = 0
+        self._prefix = None
+        self._blockRows = []
+        self._suffix = None
+
+    def update(self, increment):
+        if self._nbObs % self._window == 0:
+            if self._blockRows:
+                suffix = [None] * self._window
+                value = None
+                for i in range(self._window - 1, -1, -1):
+                    value = self._blockRows[i] if value is None else value + self._blockRows[i]
+                    suffix[i] = value
+                self._suffix = suffix
+            self._prefix = increment
+            self._blockRows = [increment]
+        else:
+            self._prefix = self._prefix + increment
+            self._blockRows.append(increment)
+        self._nbObs += 1
+
+    @property
+    def value(self):
+        """
+        :return: np.array, 最近window个观测的和, 窗口未满时为None
+        """
+        if self._nbObs < self._window:
+            return None
+        start_pos = self._nbObs % self._window
+        return self._prefix if start_pos == 0 else self._prefix + self._suffix[start_pos]
+
+
+class RollingMoments(object):
+    def __init__(self, window):
+        """
+        :param window: int, 窗口长度(观测个数, NaN也计入窗口但不参与计算)
+        :return:
+        rolling_sum/count/mean/std/zscore的流式版本, 每次update输入所有证券的一行数据(或一个标量), 均摊O(1)更新
+        """
+        _check_window(window)
+        self._window = window
+        self._sums = [_BlockWindowSum(window) for _ in range(3)]
+        self._last = None
+
+    def update(self, x):
+        """
+        :param x: np.array/float, 当期各证券的值, NaN视为缺失
+        :return: self
+        """
+        x = np.asarray(x, dtype=float)
+        for window_sum, increment in zip(self._sums, _cumul_increments(x)):
+            window_sum.update(increment)
+        self._last = x
+        return self
+
+    def _window_sums(self):
+        sums = [window_sum.value for window_sum in self._sums]
+        if sums[0] is None:
+            shape = (0,) if self._last is None else self._last.shape
+            return [np.full(shape, np.nan) for _ in range(3)]
+        return sums
+
+    @property
+    def sum(self):
+        return _as_output(self._window_sums()[0])
+
+    @property
+    def count(self):
+        return _as_output(self._window_sums()[2])
+
+    @property
+    def mean(self):
+        return _as_output(_moments_from_sums(*self._window_sums())[0])
+
+    @property
+    def std(self):
+        """
+        :return: np.array/float, 窗口内的样本标准差(ddof=1)
+        """
+        return _as_output(_moments_from_sums(*self._window_sums())[1])
+
+    @property
+    def zscore(self):
+        """
+        :return: np.array/float, 最近一次输入相对窗口均值的标准分
+        """
+        mean, std = _moments_from_sums(*self._window_sums())
+        return _as_output(_zscore(self._last, mean, std))
+
+
+class RollingRank(object):
+    def __init__(self, window, pct=False):
+        """
+        :param window: int, 窗口长度
+        :param pct: bool, optional, 是否返回百分位排名
+        :return:
+        rolling_rank的流式版本, 保存窗口内的各行, 每次update做window次向量比较
+        """
+        _check_window(window)
+        self._window = window
+        self._pct = pct
+        self._rows = deque(maxlen=window)
+
+    def update(self, x):
+        self._rows.append(np.asarray(x, dtype=float))
+        return self
+
+    @property
+    def value(self):
+        current = self._rows[-1]
+        if len(self._rows) < self._window:
+            return np.full(current.shape, np.nan)
+        rank, nb_valid = _rank_in_window(self._rows, current)
+        return rank / nb_valid if self._pct else rank
+
+
+class _RollingExtremum(object):
+    def __init__(self, window, func):
+        """
+        :param window: int, 窗口长度
+        :param func: np.fmax/np.fmin
+        :return:
+        双栈队列: 入栈保存新行及其累计极值, 出栈为空时把入栈整体倒入并计算后缀极值, 每行均摊O(1)次向量运算
+        """
+        _check_window(window)
+        self._window = window
+        self._func = func
+        self._front = []
+        self._back = []
+        self._backValue = None
+        self._nbObs = 0
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        self._back.append(x)
+        self._backValue = x if self._backValue is None else self._func(self._backValue, x)
+        self._nbObs += 1
+        if self._nbObs > self._window:
+            if not self._front:
+                value = None
+                for row in reversed(self._back):
+                    value = row if value is None else self._func(row, value)
+                    self._front.append(value)
+                self._back = []
+                self._backValue = None
+            self._front.pop()
+        return self
+
+    @property
+    def value(self):
+        """
+        :return: np.array/float, 窗口内极值, 窗口未满或窗口内全为NaN时为NaN
+        """
+        last = self._back[-1] if self._back else self._front[0]
+        if self._nbObs < self._window:
+            return _as_output(np.full(last.shape, np.nan))
+        if not self._front:
+            return _as_output(self._backValue)
+        if self._backValue is None:
+            return _as_output(self._front[-1])
+        return _as_output(self._func(self._front[-1], self._backValue))
+
+
+class RollingMax(_RollingExtremum):
+    def __init__(self, window):
+        super(RollingMax, self).__init__(window, np.fmax)
+
+
+class RollingMin(_RollingExtremum):
+    def __init__(self, window):
+        super(RollingMin, self).__init__(window, np.fmin)
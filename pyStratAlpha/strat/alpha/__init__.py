@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-from pyAlphaStrat.strat.alpha import pseudoDCAM
+_lazyAttributes = {
+    'pseudoDCAM': 'pyAlphaStrat.strat.alpha.pseudoDCAM'
+}
 
-__all__ = ['pseudoDCAM']
\ No newline at end of file
+__all__ = ['pseudoDCAM']
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
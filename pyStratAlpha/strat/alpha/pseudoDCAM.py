@@ -68,6 +68,9 @@ def dcam_strat_main(factor_loader_params,
     initial_capital = portfolio_params.get('initialCapital', 1000000000.0)
     filter_return_on_tiaocang_date = portfolio_params.get('filterReturnOnTiaoCangDate', 0.09)
     data_source = portfolio_params.get('dataSource', DataSource.WIND)
+    cache_path = portfolio_params.get('cachePath', None)
+    need_plot = portfolio_params.get('needPlot', True)
+    report_path = portfolio_params.get('reportPath', None)
 
     update_factor = update_params.get('updateFactor', False)
     update_sec_score = update_params.get('updateSecScore', False)
@@ -132,8 +135,11 @@ def dcam_strat_main(factor_loader_params,
                          filter_return_on_tiaocang_date=filter_return_on_tiaocang_date,
                          data_source=data_source,
                          benchmark_sec_id=benchmark_sec_id,
-                         re_balance_freq=re_balance_freq)
-    strategy.evaluate_ptf_return()
+                         re_balance_freq=re_balance_freq,
+                         cache_path=cache_path)
+    report = strategy.evaluate_ptf_return(need_plot=need_plot)
+    if report_path is not None:
+        report.to_html(report_path)
 
 
 if __name__ == "__main__":
@@ -1,35 +1,61 @@
 # -*- coding: utf-8 -*-
+# 公开名称在首次访问时才导入对应子模块及其依赖, see utils/lazyModule.py
 
-from pyAlphaStrat.utils.dateutils import map_to_biz_day
-from pyAlphaStrat.utils.dateutils import get_pos_adj_date
+from pyAlphaStrat.utils.lazyModule import install_lazy_module
 
-from pyAlphaStrat.utils.misc import top
-from pyAlphaStrat.utils.misc import convert_to_non_cumul_return
-from pyAlphaStrat.utils.misc import time_index_slicer
-from pyAlphaStrat.utils.misc import fig_style
-from pyAlphaStrat.utils.misc import pickle_dump_data
-from pyAlphaStrat.utils.misc import pickle_load_data
-from pyAlphaStrat.utils.misc import time_counter
-
-from pyAlphaStrat.utils.symbol import wind_convert_to_data_yes
-from pyAlphaStrat.utils.symbol import data_yes_convert_to_wind
-from pyAlphaStrat.utils.symbol import remove_suffix
-
-from pyAlphaStrat.utils.windMarketDataHandler import WindMarketDataHandler
-from pyAlphaStrat.utils.tsMarketDataHandler import TSMarketDataHandler
+_lazyAttributes = {
+    'map_to_biz_day': 'pyAlphaStrat.utils.dateutils',
+    'get_pos_adj_date': 'pyAlphaStrat.utils.dateutils',
+    'top': 'pyAlphaStrat.utils.misc',
+    'convert_to_non_cumul_return': 'pyAlphaStrat.utils.misc',
+    'time_index_slicer': 'pyAlphaStrat.utils.misc',
+    'fig_style': 'pyAlphaStrat.utils.misc',
+    'get_pyplot': 'pyAlphaStrat.utils.misc',
+    'new_figure': 'pyAlphaStrat.utils.misc',
+    'pickle_dump_data': 'pyAlphaStrat.utils.misc',
+    'pickle_load_data': 'pyAlphaStrat.utils.misc',
+    'time_counter': 'pyAlphaStrat.utils.misc',
+    'wind_convert_to_data_yes': 'pyAlphaStrat.utils.symbol',
+    'data_yes_convert_to_wind': 'pyAlphaStrat.utils.symbol',
+    'remove_suffix': 'pyAlphaStrat.utils.symbol',
+    'RateLimiter': 'pyAlphaStrat.utils.fetcher',
+    'fetch_concurrently': 'pyAlphaStrat.utils.fetcher',
+    'MarketDataHandler': 'pyAlphaStrat.utils.marketDataHandler',
+    'get_market_data_handler': 'pyAlphaStrat.utils.marketDataHandler',
+    'WindMarketDataHandler': 'pyAlphaStrat.utils.windMarketDataHandler',
+    'TSMarketDataHandler': 'pyAlphaStrat.utils.tsMarketDataHandler',
+    'LocalMarketDataHandler': 'pyAlphaStrat.utils.localMarketDataHandler',
+    'PriceCache': 'pyAlphaStrat.utils.priceCache',
+    'CachedMarketDataHandler': 'pyAlphaStrat.utils.priceCache',
+    'AsyncMarketDataHandler': 'pyAlphaStrat.utils.asyncMarketDataHandler',
+    'PricePrefetcher': 'pyAlphaStrat.utils.asyncMarketDataHandler'
+}
 
 __all__ = ['map_to_biz_day',
            'get_pos_adj_date',
            'top',
-           'timeIndexSlicer'
+           'time_index_slicer',
            'convert_to_non_cumul_return',
            'remove_suffix',
            'fig_style',
+           'get_pyplot',
+           'new_figure',
            'pickle_dump_data',
            'pickle_load_data',
            'time_counter',
            'wind_convert_to_data_yes',
            'data_yes_convert_to_wind',
+           'RateLimiter',
+           'fetch_concurrently',
+           'MarketDataHandler',
+           'get_market_data_handler',
            'WindMarketDataHandler',
-           'TSMarketDataHandler'
-           ]
\ No newline at end of file
+           'TSMarketDataHandler',
+           'LocalMarketDataHandler',
+           'PriceCache',
+           'CachedMarketDataHandler',
+           'AsyncMarketDataHandler',
+           'PricePrefetcher'
+           ]
+
+install_lazy_module(__name__, _lazyAttributes)
\ No newline at end of file
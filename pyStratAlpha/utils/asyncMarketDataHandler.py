@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# 行情数据的异步查询: 阻塞的数据源调用放在后台线程中执行, 调用方拿到AsyncResult后可以继续计算, 需要时再get()
+
+from multiprocessing.pool import ThreadPool
+
+from PyFin.Utilities import pyFinAssert
+
+
+class AsyncMarketDataHandler(object):
+    def __init__(self, market_data_handler, nb_thread=1):
+        """
+        :param market_data_handler: MarketDataHandler class/instance, 实际执行查询的阻塞数据源
+        :param nb_thread: int, optional, 后台线程数, 即同时在途的查询数量上限
+        :return:
+        """
+        pyFinAssert(nb_thread >= 1, ValueError, 'nb_thread must be at least 1')
+        self._marketDataHandler = market_data_handler
+        self._pool = ThreadPool(nb_thread)
+
+    def get_sec_price_on_date(self, *args, **kwargs):
+        """
+        :return: multiprocessing.pool.AsyncResult, get()返回值同market_data_handler.get_sec_price_on_date
+        """
+        return self._pool.apply_async(self._marketDataHandler.get_sec_price_on_date, args, kwargs)
+
+    def get_sec_return_on_date(self, *args, **kwargs):
+        """
+        :return: multiprocessing.pool.AsyncResult, get()返回值同market_data_handler.get_sec_return_on_date
+        """
+        return self._pool.apply_async(self._marketDataHandler.get_sec_return_on_date, args, kwargs)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.terminate()
+        return False
+
+
+class PricePrefetcher(object):
+    def __init__(self, async_handler, requests, lookahead=1):
+        """
+        :param async_handler: AsyncMarketDataHandler
+        :param requests: list of dict, 按顺序排列的get_sec_price_on_date参数, 例如每个调仓区间一个
+        :param lookahead: int, optional, 当前请求之外提前发出的请求数
+        :return:
+        """
+        pyFinAssert(lookahead >= 0, ValueError, 'lookahead must be non-negative')
+        self._asyncHandler = async_handler
+        self._requests = list(requests)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __iter__(self):
+        """
+        :return: generator, 按requests顺序返回查询结果; 调用方处理第i个结果时, 第i+1..i+lookahead个请求已在后台执行
+        """
+        pending = []
+        nb_submitted = 0
+        for _ in range(len(self._requests)):
+            while nb_submitted < len(self._requests) and len(pending) <= self._lookahead:
+                pending.append(self._asyncHandler.get_sec_price_on_date(**self._requests[nb_submitted]))
+                nb_submitted += 1
+            yield pending.pop(0).get()
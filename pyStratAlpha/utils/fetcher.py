@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from PyFin.Utilities import pyFinAssert
+
+
+class RateLimiter(object):
+    def __init__(self, max_calls_per_second=None):
+        """
+        :param max_calls_per_second: float, optional, 每秒最多允许的调用次数, None表示不限速
+        :return:
+        """
+        pyFinAssert(max_calls_per_second is None or max_calls_per_second > 0, ValueError,
+                    'max_calls_per_second must be positive')
+        self._interval = 0.0 if max_calls_per_second is None else 1.0 / max_calls_per_second
+        self._nextCallTime = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        :return: 阻塞直至下一次调用被允许
+        """
+        if self._interval <= 0.0:
+            return
+        with self._lock:
+            now = time.time()
+            call_time = max(now, self._nextCallTime)
+            self._nextCallTime = call_time + self._interval
+        if call_time > now:
+            time.sleep(call_time - now)
+
+
+def _fetch_with_retry(fetch_func, key, rate_limiter, nb_retry, retry_wait):
+    """
+    :param fetch_func: callable, fetch_func(key) -> result
+    :param key: 查询的key, 例如secID
+    :param rate_limiter: RateLimiter
+    :param nb_retry: int, 失败后的重试次数
+    :param retry_wait: float, 首次重试前等待的秒数, 之后每次翻倍
+    :return: tuple, (key, result, error), 成功时error为None
+    """
+    error = None
+    for attempt in range(nb_retry + 1):
+        if attempt > 0:
+            time.sleep(retry_wait * 2 ** (attempt - 1))
+        rate_limiter.wait()
+        try:
+            return key, fetch_func(key), None
+        except Exception as e:
+            error = e
+    return key, None, error
+
+
+def fetch_concurrently(keys, fetch_func, nb_thread=8, max_calls_per_second=None, nb_retry=2, retry_wait=1.0):
+    """
+    :param keys: list, 需要查询的key, 例如secID列表
+    :param fetch_func: callable, fetch_func(key) -> result, 单个key的阻塞查询函数
+    :param nb_thread: int, optional, 线程池大小
+    :param max_calls_per_second: float, optional, 所有线程合计的每秒最大调用次数
+    :param nb_retry: int, optional, 单个key失败后的重试次数
+    :param retry_wait: float, optional, 重试的初始等待秒数(指数退避)
+    :return: tuple of dict, (results, errors), results = {key: result}, errors = {key: exception}
+    单个key的失败不会影响其他key的查询
+    """
+    pyFinAssert(nb_thread >= 1, ValueError, 'nb_thread must be at least 1')
+    pyFinAssert(nb_retry >= 0, ValueError, 'nb_retry must be non-negative')
+
+    keys = list(keys)
+    results = {}
+    errors = {}
+    if len(keys) == 0:
+        return results, errors
+
+    rate_limiter = RateLimiter(max_calls_per_second)
+    pool = ThreadPool(min(nb_thread, len(keys)))
+    try:
+        outputs = pool.map(lambda k: _fetch_with_retry(fetch_func, k, rate_limiter, nb_retry, retry_wait), keys)
+    finally:
+        pool.close()
+        pool.join()
+
+    for key, result, error in outputs:
+        if error is None:
+            results[key] = result
+        else:
+            errors[key] = error
+    return results, errors
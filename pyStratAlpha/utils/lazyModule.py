@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# 包的__init__只登记"公开名称 -> 所在模块", 首次访问属性时才导入对应子模块及其第三方依赖
+
+import importlib
+import sys
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    def __init__(self, module, lazy_attributes):
+        """
+        :param module: module, 原始的包模块对象
+        :param lazy_attributes: dict, 公开名称: 所在模块的完整路径; 路径为本包的子模块且与名称相同时返回子模块本身
+        :return:
+        """
+        super(LazyModule, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # 保留原模块的引用, python 2在模块对象析构时会清空其全局变量
+        self.__dict__['_originalModule'] = module
+        self.__dict__['_lazyAttributes'] = lazy_attributes
+
+    def __getattr__(self, name):
+        # 只有常规属性查找失败时才会进入这里
+        lazy_attributes = self.__dict__['_lazyAttributes']
+        if name not in lazy_attributes:
+            raise AttributeError("module '{0}' has no attribute '{1}'".format(self.__name__, name))
+        module_name = lazy_attributes[name]
+        module = importlib.import_module(module_name)
+        value = module if module_name == self.__name__ + '.' + name else getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__.keys()) | set(self.__dict__['_lazyAttributes'].keys()))
+
+
+def install_lazy_module(module_name, lazy_attributes):
+    """
+    :param module_name: str, 包名, 一般在__init__.py中传入__name__
+    :param lazy_attributes: dict, 公开名称: 所在模块的完整路径
+    :return: LazyModule, 替换sys.modules中的原模块, 导入名称与原先的直接导入保持一致
+    """
+    module = LazyModule(sys.modules[module_name], lazy_attributes)
+    sys.modules[module_name] = module
+    return module
+
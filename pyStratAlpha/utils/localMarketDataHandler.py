@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# 基于本地文件的行情数据源, 不需要wind终端或网络
+# 每个字段一个文件夹: tradeDate.npy(日期), secID.npy(代码), values.npy(日期 x 代码 的二维数组, 以内存映射方式读取)
+
+import os
+
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+from pyAlphaStrat.enums.dfReturn import DfReturnType
+from pyAlphaStrat.enums.freq import DataFreqType
+from pyAlphaStrat.utils.marketDataHandler import MarketDataHandler
+
+
+class LocalMarketDataHandler(MarketDataHandler):
+    _dataPath = 'marketData'
+    _panelDict = {}
+
+    @classmethod
+    def set_data_path(cls, data_path):
+        """
+        :param data_path: str, 本地行情文件夹
+        :return:
+        """
+        cls._dataPath = data_path
+        cls._panelDict = {}
+
+    @classmethod
+    def _get_field_path(cls, field, data_path=None):
+        return os.path.join(cls._dataPath if data_path is None else data_path, field)
+
+    @classmethod
+    def _load_panel(cls, field):
+        """
+        :param field: str, 字段名
+        :return: tuple, (pd.DatetimeIndex, pd.Index of sec ID, np.memmap 日期 x 代码)
+        """
+        if field not in cls._panelDict:
+            field_path = cls._get_field_path(field)
+            pyFinAssert(os.path.exists(field_path), ValueError, "local data of field {0} not found".format(field))
+            trade_date = pd.DatetimeIndex(np.load(os.path.join(field_path, 'tradeDate.npy')))
+            sec_id = pd.Index(np.load(os.path.join(field_path, 'secID.npy')))
+            values = np.load(os.path.join(field_path, 'values.npy'), mmap_mode='r')
+            cls._panelDict[field] = (trade_date, sec_id, values)
+        return cls._panelDict[field]
+
+    @classmethod
+    def save_panel(cls, data, field='close', data_path=None):
+        """
+        :param data: pd.DataFrame, index = tradeDate, col = sec ID
+        :param field: str, optional, 字段名
+        :param data_path: str, optional, 本地行情文件夹, 默认为当前使用的文件夹
+        :return:
+        与已有数据合并后整体重写, 新数据覆盖重叠部分
+        """
+        field_path = cls._get_field_path(field, data_path)
+        if not os.path.exists(field_path):
+            os.makedirs(field_path)
+        data = data.copy()
+        data.index = pd.to_datetime(data.index)
+        if os.path.exists(os.path.join(field_path, 'values.npy')):
+            old_data = pd.DataFrame(np.load(os.path.join(field_path, 'values.npy')),
+                                    index=pd.DatetimeIndex(np.load(os.path.join(field_path, 'tradeDate.npy'))),
+                                    columns=np.load(os.path.join(field_path, 'secID.npy')))
+            data = data.combine_first(old_data)
+        data = data.sort_index().sort_index(axis=1)
+        np.save(os.path.join(field_path, 'tradeDate.npy'), data.index.values.astype('datetime64[D]'))
+        np.save(os.path.join(field_path, 'secID.npy'), np.array(data.columns.tolist(), dtype=str))
+        np.save(os.path.join(field_path, 'values.npy'), data.values.astype(float))
+        cls._panelDict.pop(field, None)
+
+    @classmethod
+    def _get_field_on_date(cls, start_date, end_date, sec_ids, field):
+        trade_date, sec_id, values = cls._load_panel(field)
+        start_pos = trade_date.searchsorted(pd.to_datetime(str(start_date)), side='left')
+        end_pos = trade_date.searchsorted(pd.to_datetime(str(end_date)), side='right')
+        sec_pos = sec_id.get_indexer(sec_ids)
+        # 只读取需要的行列, 本地没有的代码为NaN
+        ret = np.empty((end_pos - start_pos, len(sec_ids)))
+        ret.fill(np.nan)
+        ret[:, sec_pos >= 0] = values[start_pos:end_pos][:, sec_pos[sec_pos >= 0]]
+        ret = pd.DataFrame(ret, index=trade_date[start_pos:end_pos], columns=sec_ids)
+        ret.index.name = 'tradeDate'
+        return ret
+
+    @classmethod
+    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
+                              return_type=DfReturnType.DateIndexAndSecIDCol):
+        """
+        :param start_date: str/datetime, start date of the query period
+        :param end_date: str/datetime, end date of the query period
+        :param sec_ids: list of str, sec IDs
+        :param freq: DataFreqType
+        :param field: str, filed of data to be queried
+        :param return_type: DfReturnType
+        :return: pd.DataFrame, index = date, col = sec ID
+        """
+        pyFinAssert(freq == DataFreqType.EOD, ValueError, "for the moment the function only accepts freq type = EOD")
+        if return_type == DfReturnType.DateIndexAndSecIDCol:
+            pyFinAssert(len(field) == 1, ValueError,
+                        "length of query fields must be 1 under DateIndexAndSecIDCol return type")
+            ret = cls._get_field_on_date(start_date, end_date, sec_ids, field[0])
+        elif return_type == DfReturnType.MultiIndex:
+            ret = pd.concat([cls._get_field_on_date(start_date, end_date, sec_ids, f).stack(dropna=False)
+                             for f in field], axis=1)
+            ret.columns = field
+            ret.index.names = ['tradeDate', 'secID']
+        else:
+            raise NotImplementedError
+        return ret
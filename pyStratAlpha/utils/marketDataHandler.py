@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# 行情数据源的统一接口, 各数据源只需实现get_sec_price_on_date
+
+import importlib
+
+from pyAlphaStrat.enums.dataSource import DataSource
+from pyAlphaStrat.enums.dfReturn import DfReturnType
+from pyAlphaStrat.enums.freq import DataFreqType
+
+# DataSource -> 数据源类的路径, 使用时才导入, 避免导入未安装的数据源package
+_marketDataHandlerDict = {
+    DataSource.WIND: 'pyAlphaStrat.utils.windMarketDataHandler.WindMarketDataHandler',
+    DataSource.TUSHARE: 'pyAlphaStrat.utils.tsMarketDataHandler.TSMarketDataHandler',
+    DataSource.LOCAL: 'pyAlphaStrat.utils.localMarketDataHandler.LocalMarketDataHandler'
+}
+
+
+def convert_price_to_return(price, is_cumul=False):
+    """
+    :param price: pd.DataFrame, index = date, col = sec ID
+    :param is_cumul: return is cumul or not
+    :return: pd.DataFrame, index = date, col = sec ID
+    """
+    ret = price.pct_change()
+    if is_cumul:
+        from empyrical import cum_returns
+        ret = ret.fillna(0)
+        ret = cum_returns(ret, starting_value=1.0)
+    else:
+        ret = ret.dropna()
+    return ret
+
+
+class MarketDataHandler(object):
+    @classmethod
+    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
+                              return_type=DfReturnType.DateIndexAndSecIDCol):
+        """
+        :param start_date: str, start date of the query period
+        :param end_date: str, end date of the query period
+        :param sec_ids: list of str, sec IDs
+        :param freq: DataFreqType
+        :param field: str, filed of data to be queried
+        :param return_type: DfReturnType
+        :return: pd.DataFrame, index = date, col = sec ID
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def get_sec_return_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
+                               return_type=DfReturnType.DateIndexAndSecIDCol, is_cumul=False):
+        """
+        :param start_date: str, start date of the query period
+        :param end_date: str, end date of the query period
+        :param sec_ids: list of str, sec IDs
+        :param field: str, filed of data to be queried
+        :param freq: DataFreqType
+        :param return_type: DfReturnType
+        :param is_cumul: return is cumul or not
+        :return: pd.DataFrame, index = date, col = sec ID
+        """
+        ret = cls.get_sec_price_on_date(start_date, end_date, sec_ids, freq, field, return_type)
+        return convert_price_to_return(ret, is_cumul)
+
+
+def get_market_data_handler(data_source, cache_path=None):
+    """
+    :param data_source: DataSource
+    :param cache_path: str, optional, 本地价格缓存文件夹, 给定时在数据源前加一层缓存
+    :return: class, MarketDataHandler的子类, 给定cache_path时为绑定该数据源的CachedMarketDataHandler子类
+    """
+    if data_source not in _marketDataHandlerDict:
+        raise NotImplementedError("data source {0} is not supported".format(data_source))
+    module_name, class_name = _marketDataHandlerDict[data_source].rsplit('.', 1)
+    ret = getattr(importlib.import_module(module_name), class_name)
+    if cache_path is not None:
+        from pyAlphaStrat.utils.priceCache import CachedMarketDataHandler
+        ret = CachedMarketDataHandler.create(ret, cache_path)
+    return ret
@@ -2,10 +2,10 @@
 
 import datetime as dt
 import pickle
+import sys
 
 import pandas as pd
 from PyFin.Utilities import pyFinAssert
-from matplotlib import font_manager
 
 
 def top(df, column=None, n=5):
@@ -47,7 +47,41 @@ def time_index_slicer(data, start_date, end_date):
     return ret
 
 
+def _set_chinese_font():
+    import matplotlib
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
+    matplotlib.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+
+
+def get_pyplot(backend=None):
+    """
+    :param backend: str, optional, matplotlib后端, 例如'Agg'; 仅在pyplot尚未被导入时生效
+    :return: module, matplotlib.pyplot
+    只在真正需要交互式绘图时才导入pyplot, 统计计算不承担导入GUI后端的开销
+    """
+    import matplotlib
+    if backend is not None and 'matplotlib.pyplot' not in sys.modules:
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    _set_chinese_font()
+    return plt
+
+
+def new_figure(figsize=(16, 6)):
+    """
+    :param figsize: tuple, optional, 图片尺寸(英寸)
+    :return: tuple, (matplotlib.figure.Figure, Axes), 绑定Agg画布, 不经过pyplot, 可在无显示环境的进程中使用
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    _set_chinese_font()
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot(111)
+
+
 def fig_style(ax, legend, x_label, y_label, legend_loc='upper right'):
+    from matplotlib import font_manager
     font = font_manager.FontProperties(family='SimHei', style='normal', size=16, weight='normal', stretch='normal')
     ax.legend(legend, prop={'size': 12}, loc=legend_loc)
     ax.title.set_font_properties(font)
@@ -70,7 +104,7 @@ def pickle_dump_data(data, pkl_name, protocol=-1):
     files = open(pkl_name, 'wb')
     pickle.dump(data, files, protocol)
     files.close()
-    return "pickle file {s} saved".format(pkl_name)
+    return "pickle file {0} saved".format(pkl_name)
 
 
 def pickle_load_data(pkl_name):
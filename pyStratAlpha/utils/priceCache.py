@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# 本地价格缓存: 按数据源和secID分别存储已下载的收盘价以及已取得数据的日期区间, 只向数据源请求缺失的区间
+# 缓存的是前复权价格, 除权除息后复权基准变化; 每次补取时多取一根相邻的已缓存K线, 与缓存不一致时该secID的缓存整体作废重取
+
+import datetime as dt
+import os
+
+import numpy as np
+import pandas as pd
+from PyFin.Utilities import pyFinAssert
+
+from pyAlphaStrat.enums.dfReturn import DfReturnType
+from pyAlphaStrat.enums.freq import DataFreqType
+from pyAlphaStrat.utils.misc import pickle_dump_data
+from pyAlphaStrat.utils.misc import pickle_load_data
+from pyAlphaStrat.utils.marketDataHandler import MarketDataHandler
+
+_oneDay = dt.timedelta(days=1)
+
+
+def merge_date_range(date_range):
+    """
+    :param date_range: list of tuple, [(start_date, end_date)], 闭区间
+    :return: list of tuple, 排序并合并重叠或相邻(相差一天)的区间
+    """
+    ret = []
+    for start_date, end_date in sorted(date_range):
+        if ret and start_date <= ret[-1][1] + _oneDay:
+            ret[-1] = (ret[-1][0], max(ret[-1][1], end_date))
+        else:
+            ret.append((start_date, end_date))
+    return ret
+
+
+def get_missing_date_range(date_range, start_date, end_date):
+    """
+    :param date_range: list of tuple, 已缓存的日期区间, see merge_date_range
+    :param start_date: datetime, 请求的开始日期
+    :param end_date: datetime, 请求的结束日期
+    :return: list of tuple, [start_date, end_date]中未被缓存覆盖的区间
+    """
+    ret = []
+    current = start_date
+    for cached_start, cached_end in merge_date_range(date_range):
+        if cached_end < current:
+            continue
+        if cached_start > end_date:
+            break
+        if cached_start > current:
+            ret.append((current, cached_start - _oneDay))
+        current = cached_end + _oneDay
+        if current > end_date:
+            break
+    if current <= end_date:
+        ret.append((current, end_date))
+    return ret
+
+
+class PriceCache(object):
+    def __init__(self, cache_path='priceCache'):
+        """
+        :param cache_path: str, optional, 缓存文件夹, 每个secID一个pkl文件
+        :return:
+        """
+        self._cachePath = cache_path
+        if not os.path.exists(cache_path):
+            os.makedirs(cache_path)
+
+    def _get_file_name(self, sec_id):
+        return os.path.join(self._cachePath, sec_id + '.pkl')
+
+    def load(self, sec_id):
+        """
+        :param sec_id: str, sec ID
+        :return: tuple, (pd.Series index = tradeDate, value = price; list of 已请求过的日期区间)
+        """
+        file_name = self._get_file_name(sec_id)
+        if not os.path.exists(file_name):
+            return pd.Series(name=sec_id, dtype=float), []
+        data = pickle_load_data(file_name)
+        return data['price'], data['dateRange']
+
+    def save(self, sec_id, price, date_range):
+        pickle_dump_data({'price': price, 'dateRange': merge_date_range(date_range)}, self._get_file_name(sec_id))
+
+    def clear(self, sec_ids=None):
+        """
+        :param sec_ids: list of str, optional, 需要清除的sec IDs, None则清除全部
+        :return:
+        """
+        if sec_ids is None:
+            sec_ids = [name[:-4] for name in os.listdir(self._cachePath) if name.endswith('.pkl')]
+        for sec_id in sec_ids:
+            file_name = self._get_file_name(sec_id)
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+
+def _get_anchor_date(price, missing_start, missing_end):
+    """
+    :param price: pd.Series, 已缓存的价格
+    :param missing_start: datetime, 缺失区间的开始日期
+    :param missing_end: datetime, 缺失区间的结束日期
+    :return: tuple, (缺失区间之前最后一个有效价格的日期, 缺失区间之后第一个有效价格的日期), 不存在时为None
+    """
+    valid_date = price.dropna().index
+    pos = valid_date.searchsorted(missing_start, side='left')
+    before = valid_date[pos - 1].to_pydatetime() if pos > 0 else None
+    pos = valid_date.searchsorted(missing_end, side='right')
+    after = valid_date[pos].to_pydatetime() if pos < len(valid_date) else None
+    return before, after
+
+
+def _is_same_bar(cached_price, fetched_price, date):
+    """
+    :return: bool, 新取得的价格在date上与缓存一致, 即复权基准未变
+    """
+    return date in fetched_price.index and np.isclose(fetched_price[date], cached_price[date], rtol=1e-6, atol=0.0)
+
+
+class CachedMarketDataHandler(MarketDataHandler):
+    """
+    与其他数据源一样以类方法调用, 由create生成绑定具体数据源和缓存文件夹的子类
+    只缓存日频、单字段close、DateIndexAndSecIDCol格式的请求, 其余请求直接转给数据源
+    """
+    _marketDataHandler = None
+    _cache = None
+
+    @classmethod
+    def create(cls, market_data_handler, cache_path='priceCache'):
+        """
+        :param market_data_handler: class, MarketDataHandler的子类, i.e. WindMarketDataHandler/TSMarketDataHandler
+        :param cache_path: str, optional, 缓存文件夹, 不同数据源存放在以数据源类名命名的子文件夹中
+        :return: class, CachedMarketDataHandler的子类
+        """
+        return type('Cached' + market_data_handler.__name__, (cls,),
+                    {'_marketDataHandler': market_data_handler,
+                     '_cache': PriceCache(os.path.join(cache_path, market_data_handler.__name__))})
+
+    @classmethod
+    def get_cache(cls):
+        """
+        :return: PriceCache, 当前数据源使用的缓存
+        """
+        return cls._cache
+
+    @classmethod
+    def _fetch(cls, start_date, end_date, sec_ids):
+        fetched = cls._marketDataHandler.get_sec_price_on_date(start_date, end_date, sec_ids)
+        if len(fetched) > 0:
+            fetched.index = pd.to_datetime(fetched.index)
+        return fetched
+
+    @staticmethod
+    def _merge_fetched(cached, fetched, sec_id, missing_start, missing_end, before=None, after=None):
+        """
+        :param cached: tuple, (已缓存的价格, 已覆盖的日期区间)
+        :param fetched: pd.DataFrame, 数据源返回的价格, 可能不含该secID或该列全部为NaN(查询失败)
+        :param sec_id: str, sec ID
+        :param missing_start: datetime, 缺失区间的开始日期
+        :param missing_end: datetime, 缺失区间的结束日期
+        :param before: datetime, optional, 一并取得的缺失区间之前的已缓存K线日期
+        :param after: datetime, optional, 一并取得的缺失区间之后的已缓存K线日期
+        :return: tuple, 合并后的(价格, 日期区间); 相邻K线与缓存不一致(复权基准已变)时返回None
+        只记录实际取得数据的区间: 缺失区间之后没有已缓存K线时, 只覆盖到最后一个有效价格
+        """
+        price, date_range = cached
+        fetched_price = fetched[sec_id].dropna() if sec_id in fetched.columns else pd.Series(dtype=float)
+        if len(fetched_price) == 0:
+            return cached
+        for anchor_date in [before, after]:
+            if anchor_date is not None and not _is_same_bar(price, fetched_price, anchor_date):
+                return None
+
+        new_price = fetched[sec_id].loc[missing_start:missing_end]
+        if after is not None:
+            covered_end = missing_end
+        elif new_price.notnull().any():
+            covered_end = new_price.last_valid_index().to_pydatetime()
+        else:
+            return cached
+        price = pd.concat([price, new_price], axis=0)
+        price = price[~price.index.duplicated(keep='last')].sort_index()
+        return price, date_range + [(missing_start, covered_end)]
+
+    @classmethod
+    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
+                              return_type=DfReturnType.DateIndexAndSecIDCol):
+        """
+        :param start_date: str/datetime, start date of the query period
+        :param end_date: str/datetime, end date of the query period
+        :param sec_ids: list of str, sec IDs
+        :param freq: DataFreqType
+        :param field: str, filed of data to be queried
+        :param return_type: DfReturnType
+        :return: pd.DataFrame, index = date, col = sec ID
+        """
+        pyFinAssert(cls._marketDataHandler is not None, ValueError,
+                    "use CachedMarketDataHandler.create to bind a data source")
+        if freq != DataFreqType.EOD or list(field) != ['close'] or return_type != DfReturnType.DateIndexAndSecIDCol:
+            return cls._marketDataHandler.get_sec_price_on_date(start_date, end_date, sec_ids, freq, field,
+                                                                return_type)
+
+        start_date = pd.to_datetime(str(start_date)).to_pydatetime()
+        end_date = pd.to_datetime(str(end_date)).to_pydatetime()
+
+        # 缺失区间向两侧各多取一根已缓存K线, 用于检查复权基准; 请求区间相同的股票合并为一次请求
+        cached = {}
+        requests = {}
+        for sec_id in sec_ids:
+            cached[sec_id] = cls._cache.load(sec_id)
+            for missing_start, missing_end in get_missing_date_range(cached[sec_id][1], start_date, end_date):
+                before, after = _get_anchor_date(cached[sec_id][0], missing_start, missing_end)
+                fetch_range = (missing_start if before is None else before, missing_end if after is None else after)
+                requests.setdefault(fetch_range, []).append((sec_id, missing_start, missing_end, before, after))
+
+        updated = set()
+        rebased = set()
+        for (fetch_start, fetch_end), items in requests.items():
+            fetched = cls._fetch(fetch_start, fetch_end, [item[0] for item in items])
+            for sec_id, missing_start, missing_end, before, after in items:
+                if sec_id in rebased:
+                    continue
+                merged = cls._merge_fetched(cached[sec_id], fetched, sec_id, missing_start, missing_end, before, after)
+                if merged is None:
+                    rebased.add(sec_id)
+                else:
+                    cached[sec_id] = merged
+                    updated.add(sec_id)
+
+        # 复权基准已变的股票丢弃全部缓存, 按新的基准重取整个请求区间
+        if rebased:
+            rebased = [sec_id for sec_id in sec_ids if sec_id in rebased]
+            fetched = cls._fetch(start_date, end_date, rebased)
+            for sec_id in rebased:
+                cached[sec_id] = cls._merge_fetched((pd.Series(name=sec_id, dtype=float), []), fetched, sec_id,
+                                                    start_date, end_date)
+                updated.add(sec_id)
+
+        for sec_id in updated:
+            cls._cache.save(sec_id, *cached[sec_id])
+
+        ret = pd.concat([cached[sec_id][0].loc[start_date:end_date] for sec_id in sec_ids], axis=1)
+        ret.columns = sec_ids
+        ret.index.name = 'tradeDate'
+        return ret
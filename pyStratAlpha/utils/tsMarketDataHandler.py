@@ -1,87 +1,74 @@
 # -*- coding: utf-8 -*-
 # ref: http://tushare.org/trading.html#id3
 
+import warnings
+
 import pandas as pd
 import tushare as ts
 from PyFin.Utilities import pyFinAssert
-from empyrical import cum_returns
-from enum import IntEnum
-from enum import unique
 
 from pyAlphaStrat.enums.dfReturn import DfReturnType
+from pyAlphaStrat.enums.freq import DataFreqType
+from pyAlphaStrat.utils.fetcher import fetch_concurrently
+from pyAlphaStrat.utils.marketDataHandler import MarketDataHandler
 
 
-@unique
-class FreqType(IntEnum):
-    MIN5 = 5
-    HOUR = 60
-    EOD = 0
-
-
-class TSMarketDataHandler(object):
+class TSMarketDataHandler(MarketDataHandler):
     def __init__(self, sec_ids, start_date, end_date, freq=None, fields=None,
                  return_type=DfReturnType.DateIndexAndSecIDCol):
         self._secID = sec_ids
         self._startDate = start_date
         self._endDate = end_date
-        self._freq = FreqType.EOD if freq is None else freq
+        self._freq = DataFreqType.EOD if freq is None else freq
         self._fields = ['open', 'high', 'low', 'close', 'volume'] if fields is None else fields
         self._returnType = return_type
 
     @classmethod
-    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=FreqType.EOD, field=['close'],
-                              return_type=DfReturnType.DateIndexAndSecIDCol):
+    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
+                              return_type=DfReturnType.DateIndexAndSecIDCol, nb_thread=8, max_calls_per_second=None,
+                              nb_retry=2, fetch_func=None):
         """
         :param start_date: str, start date of the query period
         :param end_date: str, end date of the query period
         :param sec_ids: list of str, sec IDs
-        :param freq: FreqType
+        :param freq: DataFreqType
         :param return_type: DfReturnType
         :param field: str, filed of data to be queried
+        :param nb_thread: int, optional, 并发查询的线程数
+        :param max_calls_per_second: float, optional, 对tushare每秒最多的请求次数
+        :param nb_retry: int, optional, 单个证券查询失败后的重试次数
+        :param fetch_func: callable, optional, fetch_func(sec_id, start_date, end_date) -> pd.DataFrame,
+        默认为ts.get_h_data, 可替换为本地stub
         :return: pd.DataFrame, index = date, col = sec ID
+        查询失败的证券对应列全部为NaN
         """
 
-        pyFinAssert(freq == FreqType.EOD, ValueError, "for the moment the function only accepts freq type = EOD")
+        pyFinAssert(freq == DataFreqType.EOD, ValueError, "for the moment the function only accepts freq type = EOD")
+        if return_type != DfReturnType.DateIndexAndSecIDCol:
+            raise NotImplementedError
         start_date = str(start_date) if not isinstance(start_date, basestring) else start_date
         end_date = str(end_date) if not isinstance(end_date, basestring) else end_date
+        fetch_func = ts.get_h_data if fetch_func is None else fetch_func
 
-        ret = pd.DataFrame()
+        raw_data, errors = fetch_concurrently(sec_ids,
+                                              lambda s: fetch_func(s, start_date, end_date),
+                                              nb_thread=nb_thread,
+                                              max_calls_per_second=max_calls_per_second,
+                                              nb_retry=nb_retry)
         for s in sec_ids:
-            rawData = ts.get_h_data(s, start_date, end_date)
-            if return_type == DfReturnType.DateIndexAndSecIDCol:
-                ret = pd.concat([ret, rawData[field]], axis=1)
-            else:
-                raise NotImplementedError
-
-        if return_type == DfReturnType.DateIndexAndSecIDCol:
-            ret.columns = sec_ids
-            ret.index.name = 'tradeDate'
-            ret.sort_index(ascending=True, inplace=True)
+            if s in errors:
+                warnings.warn('failed to fetch price of {0}: {1}'.format(s, errors[s]))
 
-        return ret
-
-    @classmethod
-    def get_sec_return_on_date(cls, start_date, end_date, sec_ids, freq=FreqType.EOD, field=['close'],
-                               return_type=DfReturnType.DateIndexAndSecIDCol, is_cumul=False):
-        """
-        :param start_date: str, start date of the query period
-        :param end_date: str, end date of the query period
-        :param sec_ids: list of str, sec IDs
-        :param field: str, filed of data to be queried
-        :param return_type
-        :param freq: FreqType
-        :param is_cumul: return is cumul or not
-        :return: pd.DataFrame, index = date, col = sec ID
-        """
-        ret = TSMarketDataHandler.get_sec_price_on_date(start_date, end_date, sec_ids, freq, field, return_type)
-        ret = ret.pct_change()
-        if is_cumul:
-            ret = ret.fillna(0)
-            ret = cum_returns(ret, starting_value=1.0)
+        fetched = [s for s in sec_ids if s in raw_data and raw_data[s] is not None]
+        if len(fetched) > 0:
+            ret = pd.concat([raw_data[s][field[0]] for s in fetched], axis=1, keys=fetched)
         else:
-            ret = ret.dropna()
-        return ret
+            ret = pd.DataFrame()
+        ret = ret.reindex(columns=sec_ids)
+        ret.index.name = 'tradeDate'
+        ret.sort_index(ascending=True, inplace=True)
 
+        return ret
 
 if __name__ == "__main__":
     print TSMarketDataHandler.get_sec_price_on_date(start_date='2010-10-10',
@@ -3,13 +3,13 @@
 # http://image.dajiangzhang.com/djz/download/20140928/WindMatlab.pdf
 # http://image.dajiangzhang.com/djz/download/20140928/WindAPIFAQ.pdf
 
+import numpy as np
 import pandas as pd
 from PyFin.Utilities import pyFinAssert
-from empyrical import cum_returns
-from enum import IntEnum
-from enum import unique
 
 from pyAlphaStrat.enums.dfReturn import DfReturnType
+from pyAlphaStrat.enums.freq import DataFreqType
+from pyAlphaStrat.utils.marketDataHandler import MarketDataHandler
 
 try:
     from WindPy import w
@@ -17,87 +17,83 @@ except ImportError:
     pass
 
 
-@unique
-class FreqType(IntEnum):
-    MIN5 = 5
-    HOUR = 60
-    EOD = 0
-
-
-class WindMarketDataHandler(object):
+class WindMarketDataHandler(MarketDataHandler):
     def __init__(self, sec_ids, start_date, end_date, freq=None, fields=None,
                  return_type=DfReturnType.DateIndexAndSecIDCol):
         self._secID = sec_ids
         self._startDate = start_date
         self._endDate = end_date
-        self._freq = FreqType.EOD if freq is None else freq
+        self._freq = DataFreqType.EOD if freq is None else freq
         self._fields = ['open', 'high', 'low', 'close', 'volume'] if fields is None else fields
         self._returnType = return_type
 
     @classmethod
-    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=FreqType.EOD, field=['close'],
+    def get_sec_price_on_date(cls, start_date, end_date, sec_ids, freq=DataFreqType.EOD, field=['close'],
                               return_type=DfReturnType.DateIndexAndSecIDCol):
         """
         :param start_date: str, start date of the query period
         :param end_date: str, end date of the query period
         :param sec_ids: list of str, sec IDs
-        :param freq: FreqType
+        :param freq: DataFreqType
         :param field: str, filed of data to be queried
         :param return_type: dfReturnType
         :return: pd.DataFrame, index = date, col = sec ID
+        MultiIndex下 index = [tradeDate, secID], col = fields
         """
         if not w.isconnected():
             w.start()
 
-        pyFinAssert(freq == FreqType.EOD, ValueError, "for the moment the function only accepts freq type = EOD")
+        pyFinAssert(freq == DataFreqType.EOD, ValueError, "for the moment the function only accepts freq type = EOD")
         start_date = str(start_date) if not isinstance(start_date, basestring) else start_date
         end_date = str(end_date) if not isinstance(end_date, basestring) else end_date
 
-        raw_data = w.wsd(sec_ids, field, start_date, end_date, 'PriceAdj=F', 'Fill=Previous')
-        ret = format_raw_data(raw_data, sec_ids, freq, field, return_type)
+        if return_type == DfReturnType.MultiIndex and len(sec_ids) > 1 and len(field) > 1:
+            # wsd不支持同时查询多个证券和多个字段, 因此逐个字段查询后拼接
+            ret = pd.concat([format_raw_data(w.wsd(sec_ids, [f], start_date, end_date, 'PriceAdj=F', 'Fill=Previous'),
+                                             sec_ids, freq, [f], return_type) for f in field], axis=1)
+        else:
+            raw_data = w.wsd(sec_ids, field, start_date, end_date, 'PriceAdj=F', 'Fill=Previous')
+            ret = format_raw_data(raw_data, sec_ids, freq, field, return_type)
 
         return ret
 
-    @classmethod
-    def get_sec_return_on_date(cls, start_date, end_date, sec_ids, freq=FreqType.EOD, field=['close'],
-                               return_type=DfReturnType.DateIndexAndSecIDCol, is_cumul=False):
-        """
-        :param start_date: str, start date of the query period
-        :param end_date: str, end date of the query period
-        :param sec_ids: list of str, sec IDs
-        :param field: str, filed of data to be queried
-        :param freq: FreqType
-        :param return_type
-        :param is_cumul: return is cumul or not
-        :return: pd.DataFrame, index = date, col = sec ID
-        """
-        if not w.isconnected():
-            w.start()
 
-        ret = WindMarketDataHandler.get_sec_price_on_date(start_date, end_date, sec_ids, freq, field, return_type)
-        ret = ret.pct_change()
-        if is_cumul:
-            ret = ret.fillna(0)
-            ret = cum_returns(ret, starting_value=1.0)
-        else:
-            ret = ret.dropna()
-        return ret
+def _format_raw_times(times, freq):
+    """
+    :param times: list of datetime, raw_data.Times
+    :param freq: DataFreqType
+    :return: pd.DatetimeIndex, 日频数据截断到日期
+    """
+    times = np.array(times, dtype='datetime64[us]')
+    if freq == DataFreqType.EOD:
+        times = times.astype('datetime64[D]')
+    return pd.DatetimeIndex(times, name='tradeDate')
 
 
 def format_raw_data(raw_data, sec_ids, freq, fields, return_type):
+    """
+    :param raw_data: WindData, w.wsd返回的结果, Data的每一行对应一个证券(单字段)或一个字段(单证券)
+    :param sec_ids: list of str, sec IDs
+    :param freq: DataFreqType
+    :param fields: list of str, fields of data queried
+    :param return_type: DfReturnType
+    :return: pd.DataFrame, DateIndexAndSecIDCol: index = date, col = sec ID
+                           MultiIndex: index = [tradeDate, secID], col = fields
+    """
     ret = pd.DataFrame()
     if len(raw_data.Data) > 0:
+        trade_date = _format_raw_times(raw_data.Times, freq)
+        # Wind以None表示缺失值, 转成float后为NaN
+        values = np.array(raw_data.Data, dtype=float).T
         if return_type == DfReturnType.DateIndexAndSecIDCol:
             pyFinAssert(len(fields) == 1, ValueError,
                         "length of query fields must be 1 under DateIndexAndSecIDCol return type")
-            output = {'tradeDate': raw_data.Times}
-            for secID in sec_ids:
-                output[secID] = raw_data.Data[sec_ids.index(secID)]
-            ret = pd.DataFrame(output)
-            if freq == FreqType.EOD:
-                ret['tradeDate'] = ret['tradeDate'].apply(lambda x: x.strftime('%Y-%m-%d'))
-                ret['tradeDate'] = pd.to_datetime(ret['tradeDate'])
-            ret = ret.set_index('tradeDate')
+            ret = pd.DataFrame(values, index=trade_date, columns=sec_ids)
+        elif return_type == DfReturnType.MultiIndex:
+            pyFinAssert(len(fields) == 1 or len(sec_ids) == 1, ValueError,
+                        "either sec ids or fields must be of length 1 for a single wsd query")
+            index = pd.MultiIndex.from_product([trade_date, sec_ids], names=['tradeDate', 'secID'])
+            ret = pd.DataFrame(values.reshape(len(index), len(fields)), index=index, columns=fields)
         else:
             raise NotImplementedError
 
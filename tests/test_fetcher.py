@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# 并发查询的本地stub测试: 重试, 限速, 单个证券失败的隔离, 以及失败的证券不进入价格缓存
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from pyAlphaStrat.utils.fetcher import RateLimiter
+from pyAlphaStrat.utils.fetcher import fetch_concurrently
+from pyAlphaStrat.utils.priceCache import CachedMarketDataHandler
+from pyAlphaStrat.utils.tsMarketDataHandler import TSMarketDataHandler
+
+
+class _StubFetcher(object):
+    def __init__(self, failed_sec_ids=(), nb_failure_before_success=0):
+        """
+        :param failed_sec_ids: list of str, 始终查询失败的证券
+        :param nb_failure_before_success: int, 其余证券前几次查询失败, 之后成功
+        :return:
+        模拟ts.get_h_data, 价格为 日期序号 + 证券序号 * 100
+        """
+        self._failedSecIDs = set(failed_sec_ids)
+        self._nbFailureBeforeSuccess = nb_failure_before_success
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def __call__(self, sec_id, start_date, end_date):
+        with self._lock:
+            self.calls.append((sec_id, start_date, end_date))
+            nb_call = sum(1 for call in self.calls if call[0] == sec_id)
+        if sec_id in self._failedSecIDs or nb_call <= self._nbFailureBeforeSuccess:
+            raise IOError('stub failure on {0}'.format(sec_id))
+        date = pd.bdate_range(start_date[:10], end_date[:10])
+        close = np.arange(len(date)) + int(sec_id) * 100.0
+        # ts.get_h_data的结果按日期倒序排列
+        return pd.DataFrame({'close': close}, index=pd.Index(date, name='date')).sort_index(ascending=False)
+
+
+class TestFetchConcurrently(unittest.TestCase):
+    def testRetryUntilSuccess(self):
+        attempts = {}
+
+        def fetch_func(key):
+            attempts[key] = attempts.get(key, 0) + 1
+            if attempts[key] < 3:
+                raise IOError('stub failure')
+            return key * 2
+
+        results, errors = fetch_concurrently([1, 2], fetch_func, nb_thread=2, nb_retry=2, retry_wait=0.0)
+        self.assertEqual(results, {1: 2, 2: 4})
+        self.assertEqual(errors, {})
+        self.assertEqual(attempts, {1: 3, 2: 3})
+
+    def testFailureIsIsolated(self):
+        def fetch_func(key):
+            if key == 'bad':
+                raise IOError('stub failure')
+            return key
+
+        results, errors = fetch_concurrently(['good', 'bad'], fetch_func, nb_retry=1, retry_wait=0.0)
+        self.assertEqual(results, {'good': 'good'})
+        self.assertEqual(list(errors.keys()), ['bad'])
+        self.assertTrue(isinstance(errors['bad'], IOError))
+
+    def testRateLimit(self):
+        rate_limiter = RateLimiter(max_calls_per_second=50.0)
+        start = time.time()
+        for _ in range(6):
+            rate_limiter.wait()
+        self.assertGreaterEqual(time.time() - start, 5 / 50.0 - 1e-3)
+
+        start = time.time()
+        fetch_concurrently(range(6), lambda key: key, nb_thread=3, max_calls_per_second=50.0)
+        self.assertGreaterEqual(time.time() - start, 5 / 50.0 - 1e-3)
+
+
+class TestTSMarketDataHandler(unittest.TestCase):
+    def testFailedSecurityIsNaNWithWarning(self):
+        fetch_func = _StubFetcher(failed_sec_ids=['000002'])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            ret = TSMarketDataHandler.get_sec_price_on_date('2015-01-05', '2015-01-09', ['000001', '000002'],
+                                                           nb_retry=0, fetch_func=fetch_func)
+        self.assertEqual(ret.columns.tolist(), ['000001', '000002'])
+        self.assertEqual(ret['000001'].tolist(), [100.0, 101.0, 102.0, 103.0, 104.0])
+        self.assertTrue(ret['000002'].isnull().all())
+        self.assertEqual(len(caught), 1)
+        self.assertTrue('000002' in str(caught[0].message))
+
+    def testRetryThenSuccess(self):
+        fetch_func = _StubFetcher(nb_failure_before_success=1)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            ret = TSMarketDataHandler.get_sec_price_on_date('2015-01-05', '2015-01-09', ['000001'],
+                                                           nb_retry=1, fetch_func=fetch_func)
+        self.assertEqual(ret['000001'].tolist(), [100.0, 101.0, 102.0, 103.0, 104.0])
+        self.assertEqual(len(fetch_func.calls), 2)
+        self.assertEqual(len(caught), 0)
+
+
+class TestCachedTSMarketDataHandler(unittest.TestCase):
+    def setUp(self):
+        self._cachePath = tempfile.mkdtemp()
+        self._fetchFunc = _StubFetcher(failed_sec_ids=['000002'])
+        fetch_func = self._fetchFunc
+
+        class StubTSMarketDataHandler(TSMarketDataHandler):
+            @classmethod
+            def get_sec_price_on_date(cls, start_date, end_date, sec_ids, *args, **kwargs):
+                return TSMarketDataHandler.get_sec_price_on_date(start_date, end_date, sec_ids, nb_retry=0,
+                                                                 fetch_func=fetch_func)
+
+        self._handler = CachedMarketDataHandler.create(StubTSMarketDataHandler, self._cachePath)
+
+    def tearDown(self):
+        shutil.rmtree(self._cachePath)
+
+    def testFailedSecurityIsNotCached(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self._handler.get_sec_price_on_date('2015-01-05', '2015-01-09', ['000001', '000002'])
+            del self._fetchFunc.calls[:]
+            ret = self._handler.get_sec_price_on_date('2015-01-05', '2015-01-09', ['000001', '000002'])
+
+        # 成功的证券直接从缓存读取, 失败的证券再次向数据源查询
+        self.assertEqual([call[0] for call in self._fetchFunc.calls], ['000002'])
+        self.assertEqual(self._handler.get_cache().load('000002')[1], [])
+        self.assertEqual(len(self._handler.get_cache().load('000001')[1]), 1)
+        self.assertEqual(ret['000001'].tolist(), [100.0, 101.0, 102.0, 103.0, 104.0])
+        self.assertTrue(ret['000002'].isnull().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
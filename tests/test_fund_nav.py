@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# 基金净值增量缓存的本地stub测试: 只请求缓存未覆盖的日期, 没有返回数据的区间不记为已覆盖
+
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pyAlphaStrat.analyzer.fund.category import get_fund_nav
+from pyAlphaStrat.utils.priceCache import PriceCache
+
+
+class _StubNavFetcher(object):
+    def __init__(self, last_date=None, empty_fund_ids=()):
+        """
+        :param last_date: str, optional, 已公布净值的最后日期, 之后的日期没有数据
+        :param empty_fund_ids: list of str, 没有返回数据的基金
+        :return:
+        模拟ts.get_nav_history, 累计净值为 1 + 日期序号 / 100
+        """
+        self.last_date = last_date
+        self.empty_fund_ids = set(empty_fund_ids)
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def __call__(self, fund, start_date, end_date):
+        with self._lock:
+            self.calls.append((fund, start_date, end_date))
+        if fund in self.empty_fund_ids:
+            return None
+        if self.last_date is not None:
+            end_date = min(end_date, self.last_date)
+        date = pd.bdate_range(start_date, end_date)
+        total = 1.0 + (date - pd.Timestamp('2015-01-01')).days / 100.0
+        return pd.DataFrame({'total': total}, index=pd.Index(date, name='date'))
+
+
+def _expected_nav(start_date, end_date):
+    date = pd.bdate_range(start_date, end_date)
+    return 1.0 + (date - pd.Timestamp('2015-01-01')).days / 100.0
+
+
+class TestFundNavCache(unittest.TestCase):
+    def setUp(self):
+        self._cachePath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._cachePath)
+
+    def _get_fund_nav(self, fund_id, start_date, end_date, fetch_func):
+        return get_fund_nav(fund_id, start_date, end_date, cache_path=self._cachePath, nb_thread=2, nb_retry=0,
+                            fetch_func=fetch_func)
+
+    def testOnlyMissingRangeIsRefetched(self):
+        fetch_func = _StubNavFetcher()
+        self._get_fund_nav(['A', 'B'], '2015-01-05', '2015-01-20', fetch_func)
+        self.assertEqual(sorted(fetch_func.calls), [('A', '2015-01-05', '2015-01-20'),
+                                                    ('B', '2015-01-05', '2015-01-20')])
+
+        del fetch_func.calls[:]
+        ret = self._get_fund_nav(['A', 'B'], '2015-01-01', '2015-01-30', fetch_func)
+        self.assertEqual(sorted(fetch_func.calls), [('A', '2015-01-01', '2015-01-04'),
+                                                    ('A', '2015-01-21', '2015-01-30'),
+                                                    ('B', '2015-01-01', '2015-01-04'),
+                                                    ('B', '2015-01-21', '2015-01-30')])
+        self.assertEqual(ret.columns.tolist(), ['A', 'B'])
+        np.testing.assert_array_equal(ret['A'].values, _expected_nav('2015-01-01', '2015-01-30'))
+
+        del fetch_func.calls[:]
+        ret = self._get_fund_nav(['A'], '2015-01-10', '2015-01-25', fetch_func)
+        self.assertEqual(fetch_func.calls, [])
+        np.testing.assert_array_equal(ret['A'].values, _expected_nav('2015-01-10', '2015-01-25'))
+
+    def testEmptyFetchLeavesRangeUncovered(self):
+        fetch_func = _StubNavFetcher(empty_fund_ids=['B'])
+        ret = self._get_fund_nav(['A', 'B'], '2015-01-05', '2015-01-20', fetch_func)
+        self.assertEqual(ret.columns.tolist(), ['A'])
+        self.assertEqual(PriceCache(self._cachePath).load('B')[1], [])
+
+        fetch_func.empty_fund_ids = set()
+        del fetch_func.calls[:]
+        ret = self._get_fund_nav(['A', 'B'], '2015-01-05', '2015-01-20', fetch_func)
+        self.assertEqual(fetch_func.calls, [('B', '2015-01-05', '2015-01-20')])
+        np.testing.assert_array_equal(ret['B'].values, _expected_nav('2015-01-05', '2015-01-20'))
+
+    def testUnpublishedDatesStayUncovered(self):
+        fetch_func = _StubNavFetcher(last_date='2015-01-14')
+        self._get_fund_nav(['A'], '2015-01-05', '2015-01-20', fetch_func)
+        date_range = PriceCache(self._cachePath).load('A')[1]
+        self.assertEqual([(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in date_range],
+                         [('2015-01-05', '2015-01-14')])
+
+        fetch_func.last_date = None
+        del fetch_func.calls[:]
+        ret = self._get_fund_nav(['A'], '2015-01-05', '2015-01-20', fetch_func)
+        self.assertEqual(fetch_func.calls, [('A', '2015-01-15', '2015-01-20')])
+        np.testing.assert_array_equal(ret['A'].values, _expected_nav('2015-01-05', '2015-01-20'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# 冷启动导入各子包的检查: 每个子包在新的解释器进程中导入, 导入后不应加载任何重量级第三方依赖
+# 也可直接运行本文件, 打印各子包的导入时间及被加载的重量级依赖, 有重量级依赖被加载时以非0退出
+
+import json
+import subprocess
+import sys
+import unittest
+
+_subPackages = [
+    'pyAlphaStrat',
+    'pyAlphaStrat.enums',
+    'pyAlphaStrat.utils',
+    'pyAlphaStrat.maths',
+    'pyAlphaStrat.analyzer',
+    'pyAlphaStrat.analyzer.factor',
+    'pyAlphaStrat.analyzer.fund',
+    'pyAlphaStrat.analyzer.indexComp',
+    'pyAlphaStrat.analyzer.performance',
+    'pyAlphaStrat.analyzer.portfolio',
+    'pyAlphaStrat.analyzer.technical',
+    'pyAlphaStrat.analyzer.tradability',
+    'pyAlphaStrat.strat.alpha'
+]
+
+# 只应在首次访问相关属性时才导入的重量级依赖
+_heavyModules = ['matplotlib', 'pyfolio', 'alphalens', 'sklearn', 'tushare', 'WindPy', 'empyrical']
+
+
+def measure_import(module_name):
+    """
+    :param module_name: str, 模块名
+    :return: tuple, (在新的解释器进程中导入该模块所需的秒数(冷启动), 导入后已加载的重量级依赖 list of str)
+    """
+    code = 'import json, sys, time; t = time.time(); import {0}; elapsed = time.time() - t; ' \
+           'print(json.dumps([elapsed, [m for m in {1!r} if m in sys.modules]]))'.format(module_name, _heavyModules)
+    elapsed, loaded = json.loads(subprocess.check_output([sys.executable, '-c', code]).decode('utf-8'))
+    return elapsed, [str(m) for m in loaded]
+
+
+class TestImportTime(unittest.TestCase):
+    def testNoHeavyDependencyOnImport(self):
+        for module_name in _subPackages:
+            loaded = measure_import(module_name)[1]
+            self.assertEqual(loaded, [], '{0} loads {1} on import'.format(module_name, ', '.join(loaded)))
+
+
+if __name__ == '__main__':
+    has_heavy = False
+    for name in _subPackages:
+        elapsed, loaded = measure_import(name)
+        has_heavy = has_heavy or bool(loaded)
+        sys.stdout.write('{0:40s} {1:8.3f}s {2}\n'.format(name, elapsed, ', '.join(loaded)))
+    sys.exit(1 if has_heavy else 0)
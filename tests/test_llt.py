@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# LLT批量与逐日计算的一致性测试: llt_filter与逐只证券的标量递推, 以及VectorizedSecurityLLT.push逐位相同, 状态可pickle后续算
+
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pyAlphaStrat.analyzer.technical.lltFilter import LLTState
+from pyAlphaStrat.analyzer.technical.lltFilter import VectorizedSecurityLLT
+from pyAlphaStrat.analyzer.technical.lltFilter import llt_coefficients
+from pyAlphaStrat.analyzer.technical.lltFilter import llt_filter
+
+
+def _scalar_llt(prices, window, alpha):
+    """
+    :param prices: list of float, 单只证券的价格序列, NaN表示无数据
+    :return: list of float, 逐个有效价格递推的llt, 前window个有效价格取价格本身, NaN处为NaN
+    """
+    c0, c1, c2, d1, d2 = llt_coefficients(alpha)
+    history = []
+    ret = []
+    for p in prices:
+        if np.isnan(p):
+            ret.append(np.nan)
+            continue
+        if len(history) < window:
+            llt = p
+        else:
+            (p1, l1), (p2, l2) = history[-1], history[-2]
+            llt = c0 * p + c1 * p1 - c2 * p2 + d1 * l1 - d2 * l2
+        history.append((p, llt))
+        ret.append(llt)
+    return ret
+
+
+def _make_prices(nb_date=80, nb_sec=6, seed=0):
+    rs = np.random.RandomState(seed)
+    values = 10.0 + np.cumsum(rs.randn(nb_date, nb_sec), axis=0)
+    values[rs.rand(nb_date, nb_sec) < 0.15] = np.nan
+    # 第1只证券前半段无数据, 第2只证券全部无数据
+    values[:nb_date // 2, 1] = np.nan
+    values[:, 2] = np.nan
+    return pd.DataFrame(values, index=pd.bdate_range('2015-01-05', periods=nb_date),
+                        columns=['00000{0}'.format(i) for i in range(nb_sec)])
+
+
+class TestLLTFilter(unittest.TestCase):
+    def testMatchScalarRecurrence(self):
+        prices = _make_prices()
+        for window, alpha in [(3, 2.0 / 61.0), (5, 0.2), (10, 1.0)]:
+            ret = llt_filter(prices, window, alpha)
+            self.assertTrue(ret.index.equals(prices.index))
+            self.assertTrue(ret.columns.equals(prices.columns))
+            for col in prices:
+                np.testing.assert_array_equal(ret[col].values, _scalar_llt(prices[col].tolist(), window, alpha))
+
+    def testWarmUpKeepsPrice(self):
+        prices = _make_prices()
+        ret = llt_filter(prices, window=5)
+        for col in prices:
+            valid = prices[col].dropna()
+            np.testing.assert_array_equal(ret[col][valid.index[:5]].values, valid.values[:5])
+        self.assertTrue(ret.iloc[:, 2].isnull().all())
+
+    def testSeriesAndArrayInput(self):
+        prices = _make_prices()
+        expected = llt_filter(prices)
+        series = llt_filter(prices.iloc[:, 0])
+        self.assertTrue(isinstance(series, pd.Series))
+        np.testing.assert_array_equal(series.values, expected.iloc[:, 0].values)
+        np.testing.assert_array_equal(llt_filter(prices.values), expected.values)
+
+
+class TestVectorizedSecurityLLT(unittest.TestCase):
+    @staticmethod
+    def _push_all(llt, prices):
+        """
+        :return: pd.DataFrame, 每日只push有价格的证券, 证券按首次出现的顺序加入
+        """
+        rows = []
+        for date, row in prices.iterrows():
+            rows.append(llt.push(row.dropna()))
+        return pd.DataFrame(rows, index=prices.index).reindex(columns=prices.columns)
+
+    def testMatchBatch(self):
+        prices = _make_prices()
+        expected = llt_filter(prices, window=4, alpha=0.1)
+        ret = self._push_all(VectorizedSecurityLLT(window=4, alpha=0.1), prices)
+        np.testing.assert_array_equal(ret.values, expected.values)
+
+    def testDictInput(self):
+        prices = _make_prices()
+        expected = llt_filter(prices)
+        llt = VectorizedSecurityLLT(dependency='close')
+        for date, row in prices.iterrows():
+            llt.push(dict((sec_id, {'close': price}) for sec_id, price in row.dropna().items()))
+        value = llt.value.reindex(prices.columns)
+        for col in prices:
+            last = expected[col].dropna()
+            if len(last):
+                self.assertEqual(value[col], last.values[-1])
+                self.assertEqual(llt[col], last.values[-1])
+            else:
+                self.assertTrue(np.isnan(value[col]))
+
+    def testPickleRoundTrip(self):
+        prices = _make_prices()
+        expected = llt_filter(prices)
+        nb_first = len(prices) // 3
+        llt = VectorizedSecurityLLT()
+        first = self._push_all(llt, prices.iloc[:nb_first])
+        llt = pickle.loads(pickle.dumps(llt, pickle.HIGHEST_PROTOCOL))
+        second = self._push_all(llt, prices.iloc[nb_first:])
+        np.testing.assert_array_equal(pd.concat([first, second]).values, expected.values)
+
+    def testStatePickleRoundTrip(self):
+        prices = _make_prices().values
+        expected = llt_filter(prices)
+        state = LLTState(prices.shape[1])
+        for i in range(10):
+            state.step(prices[i])
+        state = pickle.loads(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(state.nb_sec, prices.shape[1])
+        for i in range(10, len(prices)):
+            np.testing.assert_array_equal(state.step(prices[i]), expected[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
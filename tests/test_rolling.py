@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# 滚动窗口核函数测试: 批量版本与pandas rolling一致, 流式版本与批量版本逐位相同, 长序列的窗口和误差不随长度累积
+
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pyAlphaStrat.maths.rolling import RollingMax
+from pyAlphaStrat.maths.rolling import RollingMin
+from pyAlphaStrat.maths.rolling import RollingMoments
+from pyAlphaStrat.maths.rolling import RollingRank
+from pyAlphaStrat.maths.rolling import rolling_count
+from pyAlphaStrat.maths.rolling import rolling_max
+from pyAlphaStrat.maths.rolling import rolling_mean
+from pyAlphaStrat.maths.rolling import rolling_min
+from pyAlphaStrat.maths.rolling import rolling_rank
+from pyAlphaStrat.maths.rolling import rolling_std
+from pyAlphaStrat.maths.rolling import rolling_sum
+from pyAlphaStrat.maths.rolling import rolling_zscore
+
+_windows = [1, 2, 5, 13, 60, 61]
+
+
+def _make_values(nb_date=60, nb_sec=5, seed=0, has_tie=True):
+    """
+    :param has_tie: bool, optional, True时取值为0.5的整数倍以产生相同值, False时为一般浮点数(求和有舍入)
+    :return: pd.DataFrame, 含NaN, 第2列前半段无数据
+    """
+    rs = np.random.RandomState(seed)
+    values = rs.randn(nb_date, nb_sec) * 2.0 + 10.0
+    if has_tie:
+        values = np.round(values * 2.0) / 2.0
+    values[rs.rand(nb_date, nb_sec) < 0.15] = np.nan
+    values[:nb_date // 2, 2] = np.nan
+    return pd.DataFrame(values, index=pd.bdate_range('2015-01-05', periods=nb_date))
+
+
+def _mask_warm_up(expected, window):
+    """
+    :return: 窗口未满的行置为NaN, 与rolling的约定一致
+    """
+    expected = expected.copy()
+    expected.iloc[:window - 1] = np.nan
+    return expected
+
+
+def _assert_frame_close(ret, expected):
+    np.testing.assert_array_equal(np.isnan(ret.values), np.isnan(expected.values))
+    np.testing.assert_allclose(ret.values, expected.values, rtol=1e-10, atol=1e-12)
+
+
+class TestRollingBatch(unittest.TestCase):
+    def setUp(self):
+        self._values = _make_values()
+
+    def testSumCount(self):
+        for window in _windows:
+            rolling = self._values.rolling(window, min_periods=0)
+            _assert_frame_close(rolling_sum(self._values, window), _mask_warm_up(rolling.sum(), window))
+            expected = self._values.notnull().astype(float).rolling(window, min_periods=0).sum()
+            _assert_frame_close(rolling_count(self._values, window), _mask_warm_up(expected, window))
+
+    def testMeanStdZScore(self):
+        for window in _windows:
+            mean = _mask_warm_up(self._values.rolling(window, min_periods=1).mean(), window)
+            std = _mask_warm_up(self._values.rolling(window, min_periods=min(window, 2)).std(), window)
+            _assert_frame_close(rolling_mean(self._values, window), mean)
+            _assert_frame_close(rolling_std(self._values, window), std)
+            zscore = ((self._values - mean) / std).where(std > 0)
+            _assert_frame_close(rolling_zscore(self._values, window), zscore)
+
+    def testRank(self):
+        for window in _windows:
+            for pct in [False, True]:
+                expected = self._values.rolling(window, min_periods=1).apply(
+                    lambda a: pd.Series(a).rank(pct=pct).values[-1], raw=True)
+                _assert_frame_close(rolling_rank(self._values, window, pct), _mask_warm_up(expected, window))
+
+    def testMaxMin(self):
+        for window in _windows:
+            rolling = self._values.rolling(window, min_periods=1)
+            _assert_frame_close(rolling_max(self._values, window), _mask_warm_up(rolling.max(), window))
+            _assert_frame_close(rolling_min(self._values, window), _mask_warm_up(rolling.min(), window))
+
+    def testOutputType(self):
+        ret = rolling_max(self._values, 5)
+        self.assertTrue(isinstance(ret, pd.DataFrame))
+        self.assertTrue(ret.index.equals(self._values.index))
+        ret = rolling_mean(self._values[0], 5)
+        self.assertTrue(isinstance(ret, pd.Series))
+        self.assertTrue(isinstance(rolling_std(self._values.values, 5), np.ndarray))
+
+    def testInvalidWindow(self):
+        self.assertRaises(ValueError, rolling_sum, self._values, 0)
+        self.assertRaises(ValueError, RollingMoments, 0)
+
+    def testLongSeriesPrecision(self):
+        # 窗口和按块重新累加, 长序列上与精确求和的误差仍在舍入量级
+        rs = np.random.RandomState(1)
+        values = 1.0e4 + rs.randn(20000) * 0.01
+        window = 20
+        ret = rolling_sum(values, window)
+        for i in range(window - 1, len(values), 997):
+            expected = math.fsum(values[i - window + 1:i + 1])
+            self.assertLess(abs(ret[i] - expected), 1.0e-10)
+
+
+class TestRollingStreaming(unittest.TestCase):
+    def setUp(self):
+        self._values = _make_values().values
+
+    def testMoments(self):
+        values = _make_values(nb_date=200, has_tie=False).values
+        for window in _windows + [7]:
+            moments = RollingMoments(window)
+            rows = []
+            for row in values:
+                moments.update(row)
+                rows.append([moments.sum, moments.count, moments.mean, moments.std, moments.zscore])
+            rows = np.array(rows)
+            for i, func in enumerate([rolling_sum, rolling_count, rolling_mean, rolling_std, rolling_zscore]):
+                np.testing.assert_array_equal(rows[:, i], func(values, window))
+
+    def testScalarMoments(self):
+        values = _make_values(nb_date=200, has_tie=False).values[:, 0]
+        moments = RollingMoments(5)
+        mean, std = [], []
+        for x in values:
+            moments.update(float(x))
+            self.assertTrue(isinstance(moments.std, float))
+            mean.append(moments.mean)
+            std.append(moments.std)
+        np.testing.assert_array_equal(mean, rolling_mean(values, 5))
+        np.testing.assert_array_equal(std, rolling_std(values, 5))
+
+    def testRank(self):
+        for window in _windows:
+            for pct in [False, True]:
+                rank = RollingRank(window, pct)
+                rows = np.array([rank.update(row).value for row in self._values])
+                np.testing.assert_array_equal(rows, rolling_rank(self._values, window, pct))
+
+    def testMaxMin(self):
+        for window in _windows:
+            for streaming_class, func in [(RollingMax, rolling_max), (RollingMin, rolling_min)]:
+                extremum = streaming_class(window)
+                rows = np.array([extremum.update(row).value for row in self._values])
+                np.testing.assert_array_equal(rows, func(self._values, window))
+                extremum = streaming_class(window)
+                rows = [extremum.update(float(x)).value for x in self._values[:, 1]]
+                np.testing.assert_array_equal(rows, func(self._values[:, 1], window))
+
+
+if __name__ == '__main__':
+    unittest.main()